@@ -0,0 +1,236 @@
+"""Chunk counts, embed time and retrieval recall of each chunking strategy
+
+Usage: python -m benchmarks.chunking [--corpus corpus.jsonl] [--strategies character,tokens,...] [--output report.json]
+
+Every strategy chunks the same fixed corpus, the chunks are embedded with
+the real model, and each query is answered by exact search over that
+strategy's chunks, ranking documents by their best chunk. The report has
+chunks per document, tokens per chunk, how many chunks the model would
+truncate, chunking and embedding time, and recall@k / MRR per strategy.
+
+--corpus is a JSONL file of {"id": ..., "text": ... | "segments": [...],
+"queries": [...]} documents, where segments are YouTube-style
+{"text", "start", "duration"} captions and each query should retrieve its
+own document. Without it a seeded synthetic corpus of articles and
+transcripts is generated, with queries taken from random sentences.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if API_ROOT not in sys.path:
+    sys.path.insert(0, API_ROOT)
+
+from benchmarks.fakes import WORDS
+from benchmarks.run import git_commit, summarize
+from embeddings.generator import DEFAULT_MODEL_NAME, EmbeddingGenerator
+from processors.chunking import SPECIAL_TOKENS, Chunker, Tokenizer, build_chunker
+
+logger = logging.getLogger("benchmarks")
+
+STRATEGIES = ("character", "tokens", "sentences", "paragraphs", "transcript")
+RECALL_AT = (1, 5, 10)
+
+
+def synthetic_corpus(documents: int, queries_per_document: int, seed: int) -> List[Dict[str, Any]]:
+    """Articles and transcripts whose sections each draw on their own vocabulary"""
+    rng = random.Random(seed)
+    # Distinct topic words, so sections (and documents) differ in content
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vo", "zi", "pa", "do", "fe"]
+    vocabulary = sorted({
+        "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(4000)
+    })
+
+    def sentence(topic: List[str]) -> str:
+        words = [rng.choice(topic) if rng.random() < 0.6 else rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+        return " ".join(words).capitalize() + "."
+
+    corpus = []
+    for index in range(documents):
+        sections = []
+        for _ in range(rng.randint(3, 12)):
+            topic = rng.sample(vocabulary, 12)
+            sections.append([sentence(topic) for _ in range(rng.randint(4, 30))])
+        sentences = [s for section in sections for s in section]
+        queries = [
+            " ".join(word for word in rng.choice(sentences).rstrip(".").split() if rng.random() < 0.7)
+            for _ in range(queries_per_document)
+        ]
+        document: Dict[str, Any] = {"id": f"doc-{index}", "queries": queries}
+        if index % 2:
+            # Transcript: one caption per sentence, with a pause between sections
+            segments, start = [], 0.0
+            for section in sections:
+                for s in section:
+                    duration = round(len(s.split()) / 2.5, 2)
+                    segments.append({"text": s, "start": round(start, 2), "duration": duration})
+                    start += duration + rng.uniform(0, 0.5)
+                start += rng.uniform(2.5, 6)
+            document["segments"] = segments
+        else:
+            document["text"] = "\n\n".join(" ".join(section) for section in sections)
+        corpus.append(document)
+    return corpus
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chunk_document(chunker: Chunker, document: Dict[str, Any]) -> List[str]:
+    if "segments" in document:
+        return chunker.split_transcript(document["segments"])
+    return chunker.split(document["text"])
+
+
+def embed(generator: EmbeddingGenerator, texts: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    """Unit-normalized embeddings and the seconds spent encoding them"""
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(generator.generate(texts[i:i + batch_size]))
+    seconds = time.perf_counter() - start
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix, seconds
+
+
+def retrieval_scores(
+    chunk_vectors: np.ndarray,
+    chunk_documents: np.ndarray,
+    query_vectors: np.ndarray,
+    query_documents: np.ndarray,
+    documents: int
+) -> Dict[str, float]:
+    """recall@k and MRR, ranking documents by their best-matching chunk"""
+    hits = {k: 0 for k in RECALL_AT}
+    reciprocal_ranks = 0.0
+    for start in range(0, len(query_vectors), 256):
+        similarities = query_vectors[start:start + 256] @ chunk_vectors.T
+        best = np.full((len(similarities), documents), -np.inf, dtype=np.float32)
+        for row, scores in enumerate(similarities):
+            np.maximum.at(best[row], chunk_documents, scores)
+        for row, expected in enumerate(query_documents[start:start + 256]):
+            rank = int((best[row] > best[row, expected]).sum()) + 1
+            reciprocal_ranks += 1 / rank
+            for k in RECALL_AT:
+                hits[k] += rank <= k
+    total = len(query_vectors)
+    scores = {f"recall@{k}": round(hits[k] / total, 4) for k in RECALL_AT}
+    scores["mrr"] = round(reciprocal_ranks / total, 4)
+    return scores
+
+
+def run_strategy(
+    strategy: str,
+    corpus: List[Dict[str, Any]],
+    tokenizer: Tokenizer,
+    generator: EmbeddingGenerator,
+    query_vectors: np.ndarray,
+    query_documents: np.ndarray,
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    chunker = build_chunker(
+        strategy,
+        max_tokens=args.max_tokens,
+        overlap_tokens=args.overlap_tokens,
+        tokenizer=tokenizer
+    )
+    start = time.perf_counter()
+    chunked = [chunk_document(chunker, document) for document in corpus]
+    chunk_seconds = time.perf_counter() - start
+
+    chunks = [chunk for document_chunks in chunked for chunk in document_chunks]
+    chunk_documents = np.repeat(np.arange(len(corpus)), [len(document_chunks) for document_chunks in chunked])
+    tokens = tokenizer.count(chunks)
+    budget = args.max_tokens - SPECIAL_TOKENS
+    chunk_vectors, embed_seconds = embed(generator, chunks, args.batch_size)
+
+    per_document = [len(document_chunks) for document_chunks in chunked]
+    return {
+        "strategy": strategy,
+        "chunks": len(chunks),
+        "chunks_per_document": summarize(per_document),
+        "tokens_per_chunk": summarize(tokens),
+        # Chunks the model cuts off at max_tokens: their tail is never embedded
+        "truncated_chunks": sum(1 for count in tokens if count > budget),
+        "chunk_seconds": round(chunk_seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "embedded_tokens_per_s": round(sum(min(count, budget) for count in tokens) / embed_seconds, 1),
+        **retrieval_scores(chunk_vectors, chunk_documents, query_vectors, query_documents, len(corpus))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="JSONL corpus with queries; synthetic when omitted")
+    parser.add_argument("--strategies", type=lambda v: v.split(","), default=list(STRATEGIES))
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--max-tokens", type=int, default=256, help="The model's max_seq_length")
+    parser.add_argument("--overlap-tokens", type=int, default=32)
+    parser.add_argument("--documents", type=int, default=200, help="Synthetic corpus size")
+    parser.add_argument("--queries-per-document", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per encode call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    unknown = set(args.strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"Unknown strategies: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=args.log_level)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(
+        args.documents, args.queries_per_document, args.seed
+    )
+    tokenizer = Tokenizer(args.model)
+    generator = EmbeddingGenerator(args.model, backend="inline")
+    queries = [(query, index) for index, document in enumerate(corpus) for query in document.get("queries", [])]
+    if not queries:
+        parser.error("The corpus has no queries")
+    query_vectors, _ = embed(generator, [query for query, _ in queries], args.batch_size)
+    query_documents = np.asarray([index for _, index in queries])
+
+    results = []
+    for strategy in args.strategies:
+        result = run_strategy(strategy, corpus, tokenizer, generator, query_vectors, query_documents, args)
+        logger.warning(
+            f"{strategy}: {result['chunks']} chunks ({result['truncated_chunks']} truncated), "
+            f"embed {result['embed_seconds']}s, recall@5 {result['recall@5']}"
+        )
+        results.append(result)
+
+    report = {
+        "meta": {
+            "git_commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "documents": len(corpus),
+            "queries": len(queries),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "log_level")}
+        },
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare two benchmark reports
+
+Usage: python -m benchmarks.compare baseline.json candidate.json [--fail-above 10]
+
+Prints throughput and latency percentiles per endpoint and concurrency with
+the relative change. With --fail-above, exits non-zero when any p95 latency
+regressed by more than that percentage.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+METRICS = ("throughput_rps", "p50", "p95", "p99")
+
+
+def _index(report: Dict[str, Any]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    return {(result["endpoint"], result["concurrency"]): result for result in report["results"]}
+
+
+def _metric(result: Dict[str, Any], metric: str) -> Optional[float]:
+    if metric == "throughput_rps":
+        return result.get("throughput_rps")
+    return result["latency_ms"].get(metric)
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> Dict[str, Any]:
+    before, after = _index(baseline), _index(candidate)
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        row = {"endpoint": key[0], "concurrency": key[1]}
+        for metric in METRICS:
+            row[metric] = {
+                "baseline": _metric(before[key], metric),
+                "candidate": _metric(after[key], metric),
+                "change_pct": _change(_metric(before[key], metric), _metric(after[key], metric))
+            }
+        rows.append(row)
+    return {
+        "baseline": baseline["meta"].get("git_commit"),
+        "candidate": candidate["meta"].get("git_commit"),
+        "rows": rows
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--fail-above", type=float, help="Max allowed p95 regression in percent")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    result = compare(baseline, candidate)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{'endpoint':<20}{'c':>4}" + "".join(f"{metric:>24}" for metric in METRICS))
+        for row in result["rows"]:
+            cells = "".join(
+                f"{str(row[metric]['candidate']):>14} ({row[metric]['change_pct']:+.1f}%)"
+                if row[metric]["change_pct"] is not None else f"{str(row[metric]['candidate']):>24}"
+                for metric in METRICS
+            )
+            print(f"{row['endpoint']:<20}{row['concurrency']:>4}{cells}")
+
+    if args.fail_above is not None:
+        regressions = [
+            row for row in result["rows"]
+            if (row["p95"]["change_pct"] or 0) > args.fail_above
+        ]
+        if regressions:
+            print(f"{len(regressions)} p95 regressions above {args.fail_above}%", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
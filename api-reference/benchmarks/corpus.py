@@ -0,0 +1,105 @@
+"""Seeded synthetic corpus written straight into Chroma and the DocumentStore"""
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+import numpy as np
+from db.document_store import DocumentStore
+from embeddings.generator import EmbeddingGenerator
+from ingestion.dedup import hash_text
+from benchmarks.fakes import synthetic_text
+
+logger = logging.getLogger(__name__)
+
+CORPUS_MANIFEST = "corpus.json"
+
+
+def _content_id(seed: int, collection: str, document: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"benchmark/{seed}/{collection}/{document}"))
+
+
+def seed_corpus(
+    vector_store: Any,
+    document_store: DocumentStore,
+    chunks: int,
+    seed: int = 0,
+    collections: tuple = ("article", "youtube"),
+    chunks_per_document: int = 20,
+    chunk_words: int = 150,
+    dim: int = 384,
+    batch_size: int = 5000,
+    embedding_generator: Optional[EmbeddingGenerator] = None,
+    workdir: str = "."
+) -> Dict[str, List[str]]:
+    """Fill the collections with `chunks` chunks in total and return content ids per collection
+
+    Embeddings are seeded random unit vectors unless an embedding_generator
+    is given, which is realistic for latency but slow for large corpora. A
+    manifest in workdir lets later runs with the same parameters reuse it.
+    """
+    params = {
+        "chunks": chunks, "seed": seed, "collections": list(collections),
+        "chunks_per_document": chunks_per_document, "chunk_words": chunk_words,
+        "embeddings": "model" if embedding_generator is not None else "random"
+    }
+    manifest_path = os.path.join(workdir, CORPUS_MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["params"] == params:
+            logger.info(f"Reusing seeded corpus in {workdir}")
+            return manifest["content_ids"]
+        raise RuntimeError(f"{workdir} holds a corpus seeded with different parameters; use a fresh workdir")
+
+    rng = np.random.default_rng(seed)
+    per_collection = chunks // len(collections)
+    content_ids: Dict[str, List[str]] = {}
+
+    for collection_name in collections:
+        collection = vector_store.get_collection(collection_name)
+        documents = max(1, per_collection // chunks_per_document)
+        content_ids[collection_name] = []
+        batch: Dict[str, list] = {"ids": [], "documents": [], "metadatas": []}
+
+        def flush():
+            if not batch["ids"]:
+                return
+            if embedding_generator is not None:
+                embeddings = np.asarray(embedding_generator.generate(batch["documents"]), dtype=np.float32)
+            else:
+                embeddings = rng.standard_normal((len(batch["ids"]), dim)).astype(np.float32)
+                embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            collection.add(embeddings=embeddings.tolist(), **batch)
+            for values in batch.values():
+                values.clear()
+
+        for document in range(documents):
+            content_id = _content_id(seed, collection_name, document)
+            content_ids[collection_name].append(content_id)
+            url = f"https://benchmark.invalid/{collection_name}/{document}"
+            document_store.put(content_id, collection_name, {
+                "content_id": content_id,
+                "canonical_url": url,
+                "source_url": url,
+                "title": f"Benchmark {collection_name} {document}",
+                "author": "Benchmark",
+                "content_type": collection_name
+            })
+            for index in range(chunks_per_document):
+                text = synthetic_text(seed * 1_000_003 + document * chunks_per_document + index, chunk_words)
+                batch["ids"].append(f"{content_id}_{index}")
+                batch["documents"].append(text)
+                batch["metadatas"].append({
+                    "content_id": content_id,
+                    "chunk_index": index,
+                    "chunk_hash": hash_text(text)
+                })
+                if len(batch["ids"]) >= batch_size:
+                    flush()
+        flush()
+        logger.info(f"Seeded {collection_name}: {documents} documents, {documents * chunks_per_document} chunks")
+
+    with open(manifest_path, "w") as f:
+        json.dump({"params": params, "content_ids": content_ids}, f)
+    return content_ids
@@ -0,0 +1,203 @@
+"""Memory and throughput of the shared embedding server versus in-process models
+
+Usage: python -m benchmarks.embedding_server [--workers 4] [--requests 200] [--output report.json]
+
+Each mode starts --workers processes standing in for uvicorn workers. In
+"inprocess" mode every worker loads its own model (EMBEDDING_BACKEND=thread);
+in "remote" mode one embedding server owns the model and workers use the
+client backend. Workers load first, then run the same closed-loop encode
+load at the same time. The report has aggregate texts/s, request latency
+and the peak RSS of every process involved.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if API_ROOT not in sys.path:
+    sys.path.insert(0, API_ROOT)
+
+from benchmarks.fakes import WORDS
+from benchmarks.run import git_commit, summarize
+
+logger = logging.getLogger("benchmarks")
+
+MODES = ("inprocess", "remote")
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak resident set size of this process, or of pid (Linux only)"""
+    if pid is None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_server(socket_path: str, max_batch_size: int):
+    from embeddings.generator import EmbeddingGenerator
+    from embeddings.server import EmbeddingServer
+
+    generator = EmbeddingGenerator(backend="thread")
+    asyncio.run(EmbeddingServer(socket_path, generator, max_batch_size).serve())
+
+
+async def encode_load(generator, requests: int, concurrency: int, batch: int, seed: int) -> Dict[str, Any]:
+    from embeddings.batcher import EmbeddingBatcher
+
+    # Same front end as the API: concurrent callers share batches in the worker
+    batcher = EmbeddingBatcher(generator)
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    remaining = requests
+
+    async def caller():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40))) for _ in range(batch)]
+            start = time.perf_counter()
+            await batcher.generate(texts)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await batcher.close()
+    return {"seconds": elapsed, "latencies": latencies}
+
+
+def run_worker(index: int, mode: str, socket_path: str, args: argparse.Namespace, barrier, results):
+    from embeddings.generator import EmbeddingGenerator
+
+    start = time.perf_counter()
+    if mode == "remote":
+        generator = EmbeddingGenerator(backend="remote", socket_path=socket_path)
+    else:
+        generator = EmbeddingGenerator(backend="thread")
+    # Remote workers wait for the server to load its model
+    asyncio.run(generator.warm_up(server_timeout_seconds=600))
+    load_seconds = time.perf_counter() - start
+
+    barrier.wait()
+    outcome = asyncio.run(encode_load(generator, args.requests, args.concurrency, args.batch, args.seed + index))
+    generator.close()
+    results.put({
+        "worker": index,
+        "load_seconds": round(load_seconds, 2),
+        "seconds": outcome["seconds"],
+        "latencies": outcome["latencies"],
+        "peak_rss_mb": peak_rss_mb()
+    })
+
+
+def run_mode(mode: str, args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    socket_path = os.path.join(workdir, f"embeddings-{mode}.sock")
+    server = None
+    if mode == "remote":
+        server = context.Process(target=run_server, args=(socket_path, args.max_batch_size), daemon=True)
+        server.start()
+
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    workers = [
+        context.Process(target=run_worker, args=(i, mode, socket_path, args, barrier, results))
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    server_rss = None
+    if server is not None:
+        server_rss = peak_rss_mb(server.pid)
+        server.terminate()
+        server.join()
+
+    latencies = [latency for outcome in outcomes for latency in outcome["latencies"]]
+    texts = len(latencies) * args.batch
+    wall_seconds = max(outcome["seconds"] for outcome in outcomes)
+    worker_rss = [outcome["peak_rss_mb"] for outcome in sorted(outcomes, key=lambda o: o["worker"])]
+    return {
+        "mode": mode,
+        "workers": args.workers,
+        "texts": texts,
+        "throughput_texts_per_s": round(texts / wall_seconds, 1) if wall_seconds else None,
+        "latency_ms": summarize(latencies),
+        "worker_load_seconds": [outcome["load_seconds"] for outcome in outcomes],
+        "worker_peak_rss_mb": worker_rss,
+        "server_peak_rss_mb": server_rss,
+        "total_peak_rss_mb": round(sum(worker_rss) + (server_rss or 0), 1) if all(worker_rss) else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=list(MODES))
+    parser.add_argument("--workers", type=int, default=4, help="Simulated uvicorn workers")
+    parser.add_argument("--requests", type=int, default=200, help="Encode calls per worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent callers per worker")
+    parser.add_argument("--batch", type=int, default=8, help="Texts per encode call")
+    parser.add_argument("--max-batch-size", type=int, default=128, help="Server-side batch limit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(sorted(unknown))}")
+    logging.basicConfig(level=args.log_level)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes:
+            result = run_mode(mode, args, workdir)
+            logger.warning(
+                f"{mode}: {result['throughput_texts_per_s']} texts/s, "
+                f"p95 {result['latency_ms']['p95']}ms, {result['total_peak_rss_mb']} MB total RSS"
+            )
+            results.append(result)
+
+    report = {
+        "meta": {
+            "git_commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "log_level")}
+        },
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Local stand-ins for the external services the API talks to
+
+- StubLLMClient: deterministic LLMClient with configurable latency,
+  registered with LLMFactory by the benchmark runner
+- FakeServices: one local HTTP server serving static article pages and a
+  YouTube Data API compatible /youtube/v3/videos endpoint
+- FakeTranscriptApi: drop-in for YouTubeTranscriptApi(http_client=...).fetch
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+from llm.base import LLMClient
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "vector index query embedding latency throughput cache batch python async "
+    "tutorial section chunk model token stream retry pool worker scheduler "
+    "database request response benchmark memory thread process network search"
+).split()
+
+
+def synthetic_text(seed: int, words: int) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+
+class StubLLMClient(LLMClient):
+    """Returns a fixed-shape tutorial (or plain notes for map prompts) after a delay"""
+
+    def __init__(self, api_key: str = "", model: str = "stub", latency_ms: float = 200, stream_chunks: int = 20):
+        self.model = model
+        self.latency_seconds = latency_ms / 1000
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+
+    def _completion(self, prompt: str) -> str:
+        if "Summarize this part" in prompt:
+            return synthetic_text(len(prompt), 120)
+        return json.dumps({
+            "sections": [
+                {"type": "summary", "title": "Overview", "content": synthetic_text(1, 80)},
+                {"type": "key_points", "title": "Key Points", "content": synthetic_text(2, 60)},
+                {
+                    "type": "code_example",
+                    "title": "Code Examples",
+                    "content": "print('hello')",
+                    "metadata": {"language": "python"}
+                },
+                {
+                    "type": "practice",
+                    "title": "Practice Exercises",
+                    "content": synthetic_text(3, 40),
+                    "metadata": {"difficulty": "beginner"}
+                },
+                {"type": "notes", "title": "Additional Notes", "content": synthetic_text(4, 30)}
+            ]
+        })
+
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        return self._completion(prompt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        text = self._completion(prompt)
+        step = max(1, len(text) // self.stream_chunks)
+        for start in range(0, len(text), step):
+            await asyncio.sleep(self.latency_seconds / self.stream_chunks)
+            yield text[start:start + step]
+
+
+class FakeTranscript:
+    def __init__(self, segments: List[Dict[str, object]]):
+        self.segments = segments
+
+    def to_raw_data(self) -> List[Dict[str, object]]:
+        return self.segments
+
+
+class FakeTranscriptApi:
+    """Replaces YouTubeTranscriptApi; transcripts are derived from the video id"""
+
+    words = 1500
+
+    def __init__(self, http_client=None):
+        self.http_client = http_client
+
+    def fetch(self, video_id: str) -> FakeTranscript:
+        text = synthetic_text(zlib.crc32(video_id.encode()), self.words).split(". ")
+        return FakeTranscript([{"text": line, "start": i * 4.0, "duration": 4.0} for i, line in enumerate(text)])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    article_words = 1500
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, content_type: str, body: str):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.startswith("/articles/"):
+            article_id = parts.path.rsplit("/", 1)[-1]
+            seed = int(article_id) if article_id.isdigit() else zlib.crc32(article_id.encode())
+            paragraphs = synthetic_text(seed, self.article_words).split(". ")
+            body = "".join(f"<p>{paragraph}.</p>" for paragraph in paragraphs)
+            self._send(200, "text/html", (
+                f"<html><head><title>Benchmark article {article_id}</title>"
+                f'<meta name="author" content="Benchmark">'
+                f'<meta property="article:published_time" content="2024-01-01T00:00:00Z">'
+                f"</head><body><article>{body}</article></body></html>"
+            ))
+        elif parts.path == "/youtube/v3/videos":
+            video_id = parse_qs(parts.query).get("id", [""])[0]
+            self._send(200, "application/json", json.dumps({
+                "items": [{
+                    "id": video_id,
+                    "snippet": {
+                        "title": f"Benchmark video {video_id}",
+                        "channelTitle": "Benchmark",
+                        "publishedAt": "2024-01-01T00:00:00Z"
+                    },
+                    "contentDetails": {"duration": "PT10M"},
+                    "statistics": {"viewCount": "1000"}
+                }]
+            }))
+        else:
+            self._send(404, "text/plain", "not found")
+
+
+class FakeServices:
+    """Static article site and fake YouTube Data API on one local port"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, article_words: int = 1500):
+        handler = type("Handler", (_Handler,), {"article_words": article_words})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def youtube_videos_api(self) -> str:
+        return f"{self.base_url}/youtube/v3/videos"
+
+    def article_url(self, article_id: int) -> str:
+        return f"{self.base_url}/articles/{article_id}"
+
+    def __enter__(self) -> "FakeServices":
+        self.thread.start()
+        logger.info(f"Fake services listening on {self.base_url}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
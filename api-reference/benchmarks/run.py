@@ -0,0 +1,363 @@
+"""Load and latency benchmark for the API, run against local stand-ins
+
+Usage: python -m benchmarks.run [--chunks 10000] [--concurrency 1,8,32] [--output report.json]
+
+The app from main.py is served by uvicorn in this process. The LLM provider
+is a registered StubLLMClient, article scraping hits a local static site, and
+YouTube metadata and transcripts come from local fakes. All state (Chroma,
+SQLite stores, caches) lives under --workdir, so runs never touch real data.
+The report is JSON keyed by endpoint and concurrency; diff two reports with
+python -m benchmarks.compare.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+
+API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if API_ROOT not in sys.path:
+    sys.path.insert(0, API_ROOT)
+
+from benchmarks.fakes import WORDS, FakeServices, FakeTranscriptApi, StubLLMClient
+
+logger = logging.getLogger("benchmarks")
+
+ENDPOINTS = ("search_single", "search_multi", "content_submit", "tutorial_generate")
+
+# Endpoints that start a background task, polled until it finishes
+TASK_STATUS_PATHS = {
+    "content_submit": "/api/content/task/{task_id}",
+    "tutorial_generate": "/api/tutorial/status/{task_id}"
+}
+
+# Where services.py keeps each store, pointed into --workdir for a run
+STORE_PATHS = {
+    "TASK_STORE_PATH": "tasks.db",
+    "DOCUMENT_STORE_PATH": "documents.db",
+    "TUTORIAL_STORE_PATH": "tutorials.db",
+    "LLM_CACHE_PATH": "llm_cache.db",
+    "BULK_JOB_STORE_PATH": "bulk_jobs.db",
+    "MIGRATION_STORE_PATH": "migrations.db",
+    "ANN_INDEX_PATH": "ann_index",
+    "RELATED_INDEX_PATH": "related_index",
+    "EMBEDDING_SOCKET": "embeddings.sock"
+}
+
+
+def use_workdir_stores(workdir: str):
+    """Point every store the services open at a path inside workdir"""
+    for variable, name in STORE_PATHS.items():
+        os.environ[variable] = os.path.join(workdir, name)
+
+
+def check_vector_store_directory(vector_store: Any, workdir: str):
+    """Fail unless the VectorStore's Chroma client is in-memory or persists inside workdir
+
+    VectorStore() takes no path, so its relative persist directory is only
+    pinned by the working directory; this refuses to seed a real store.
+    """
+    client = getattr(vector_store, "client", None)
+    if client is None:
+        client = getattr(vector_store.get_collection("article"), "_client", None)
+    try:
+        settings = client.get_settings()
+    except AttributeError:
+        raise RuntimeError("Cannot tell where the vector store persists; refusing to seed it")
+    if not getattr(settings, "is_persistent", True):
+        return
+    directory = os.path.realpath(settings.persist_directory)
+    if os.path.commonpath([directory, os.path.realpath(workdir)]) != os.path.realpath(workdir):
+        raise RuntimeError(f"Vector store persists to {directory}, outside the benchmark workdir {workdir}")
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    value = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+    return round(value, 2)
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(latencies_ms)
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "max": round(values[-1], 2) if values else None
+    }
+
+
+class RequestFactory:
+    """Seeded request payloads, so every run issues the same sequence"""
+
+    def __init__(self, seed: int, services: FakeServices, content_ids: Dict[str, List[str]]):
+        self.rng = random.Random(seed)
+        self.services = services
+        self.content_ids = content_ids
+        self.submitted = 0
+
+    def query(self) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(2, 6)))
+
+    def build(self, endpoint: str) -> Dict[str, Any]:
+        collection = self.rng.choice(sorted(self.content_ids))
+        if endpoint == "search_single":
+            return {
+                "method": "GET",
+                "url": "/api/search/single",
+                "params": {"query": self.query(), "collection": collection, "limit": 5}
+            }
+        if endpoint == "search_multi":
+            return {
+                "method": "GET",
+                "url": "/api/search/multi",
+                "params": {"query": self.query(), "collections": sorted(self.content_ids), "merged_limit": 5}
+            }
+        if endpoint == "content_submit":
+            # Unique URLs so deduplication never short-circuits the pipeline
+            self.submitted += 1
+            if self.submitted % 2:
+                body = {"url": self.services.article_url(self.submitted), "content_type": "article"}
+            else:
+                body = {"url": f"https://www.youtube.com/watch?v=bench{self.submitted:06d}", "content_type": "youtube"}
+            return {"method": "POST", "url": "/api/content/submit", "json": body}
+        if endpoint == "tutorial_generate":
+            return {
+                "method": "POST",
+                "url": "/api/tutorial/generate",
+                "json": {"content_id": self.rng.choice(self.content_ids[collection]), "content_type": collection}
+            }
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def wait_for_task(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    task_id: str,
+    poll_interval: float,
+    timeout: float
+) -> Optional[str]:
+    """Poll a background task until it leaves "processing"; returns its final status"""
+    path = TASK_STATUS_PATHS[endpoint].format(task_id=task_id)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        response = await client.get(path)
+        if response.status_code == 200 and response.json()["status"] != "processing":
+            return response.json()["status"]
+        await asyncio.sleep(poll_interval)
+    return None
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    concurrency: int,
+    requests: int,
+    build: Callable[[str], Dict[str, Any]],
+    wait_for_completion: bool,
+    poll_interval: float,
+    task_timeout: float
+) -> Dict[str, Any]:
+    """Closed-loop load: `concurrency` workers issue `requests` requests in total"""
+    latencies: List[float] = []
+    completions: List[float] = []
+    status_codes: Dict[str, int] = {}
+    task_outcomes: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            request = build(endpoint)
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                code = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, code = None, type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+            if wait_for_completion and endpoint in TASK_STATUS_PATHS and response is not None and response.is_success:
+                outcome = await wait_for_task(
+                    client, endpoint, response.json()["task_id"], poll_interval, task_timeout
+                )
+                task_outcomes[outcome or "timeout"] = task_outcomes.get(outcome or "timeout", 0) + 1
+                if outcome == "completed":
+                    completions.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(count for code, count in status_codes.items() if not code.startswith("2")),
+        "status_codes": status_codes,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else None,
+        "latency_ms": summarize(latencies)
+    }
+    if task_outcomes:
+        result["tasks"] = task_outcomes
+        result["completion_ms"] = summarize(completions)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=API_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import uvicorn
+    from llm.factory import LLMFactory
+    from processors import content_processor
+
+    with FakeServices(article_words=args.document_words) as services:
+        # Stand-ins must be in place before main.py builds its services
+        LLMFactory.register("stub", functools.partial(StubLLMClient, latency_ms=args.llm_latency_ms))
+        os.environ["LLM_PROVIDER"] = "stub"
+        content_processor.YOUTUBE_VIDEOS_API = services.youtube_videos_api
+        content_processor.YouTubeTranscriptApi = FakeTranscriptApi
+        FakeTranscriptApi.words = args.document_words
+
+        import main
+        from benchmarks.corpus import seed_corpus
+        logging.getLogger().setLevel(args.log_level)
+        await asyncio.to_thread(check_vector_store_directory, main.services.vector_store, args.workdir)
+
+        start = time.perf_counter()
+        content_ids = await asyncio.to_thread(
+            seed_corpus,
+            main.services.vector_store,
+            main.services.document_store,
+            args.chunks,
+            seed=args.seed,
+            embedding_generator=main.services.embedding_generator if args.model_embeddings else None
+        )
+        seed_seconds = round(time.perf_counter() - start, 1)
+
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=args.port, log_level="warning"))
+        serve_task = asyncio.create_task(server.serve())
+        while not server.started:
+            if serve_task.done():
+                serve_task.result()
+            await asyncio.sleep(0.05)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        # Measure warm services only: wait for the model warm-up and ingestion start
+        while not main.services.ready:
+            if main.services.startup_error:
+                raise RuntimeError(f"Service startup failed: {main.services.startup_error}")
+            await asyncio.sleep(0.1)
+
+        factory = RequestFactory(args.seed, services, content_ids)
+        results = []
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}",
+                timeout=args.request_timeout,
+                limits=httpx.Limits(max_connections=max(args.concurrency) * 2)
+            ) as client:
+                for endpoint in args.endpoints:
+                    if args.warmup:
+                        await run_level(client, endpoint, 1, args.warmup, factory.build, False, args.poll_interval, args.task_timeout)
+                    for concurrency in args.concurrency:
+                        result = await run_level(
+                            client, endpoint, concurrency, args.requests, factory.build,
+                            not args.no_wait, args.poll_interval, args.task_timeout
+                        )
+                        logger.warning(
+                            f"{endpoint} c={concurrency}: {result['throughput_rps']} req/s, "
+                            f"p50 {result['latency_ms']['p50']}ms, p99 {result['latency_ms']['p99']}ms"
+                        )
+                        results.append(result)
+        finally:
+            server.should_exit = True
+            await serve_task
+
+    return {
+        "meta": {
+            "git_commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed_seconds": seed_seconds,
+            "startup": main.services.status(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "log_level")}
+        },
+        "results": results
+    }
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workdir", default="./benchmark-data", help="Holds the corpus and all app state")
+    parser.add_argument("--chunks", type=int, default=10000, help="Synthetic corpus size (10k-1M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-embeddings", action="store_true", help="Embed the corpus with the real model")
+    parser.add_argument("--endpoints", type=lambda v: v.split(","), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--document-words", type=int, default=1500, help="Words per fake article and transcript")
+    parser.add_argument("--no-wait", action="store_true", help="Do not poll background tasks to completion")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--task-timeout", type=float, default=300)
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    output = os.path.abspath(args.output) if args.output else None
+    args.workdir = os.path.abspath(args.workdir)
+    os.makedirs(args.workdir, exist_ok=True)
+    use_workdir_stores(args.workdir)
+    # Chroma's relative persist directory resolves here; run() checks that it did
+    os.chdir(args.workdir)
+    logging.basicConfig(level=args.log_level)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
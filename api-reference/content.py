@@ -1,11 +1,32 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterator
 from pydantic import BaseModel, HttpUrl
 from typing_extensions import Literal
 import uuid
+import json
+import asyncio
+import httpx
+import requests
 from processors.content_processor import ContentProcessor
+from processors.chunking import Chunker
+from processors.browser_pool import BrowserPool
 from db.vector_store import VectorStore
-from embeddings.generator import EmbeddingGenerator
+from embeddings.batcher import EmbeddingBatcher
+from search.semantic_search import SemanticSearch
+from db.task_store import TaskStore
+from db.document_store import DocumentStore
+from ingestion.scheduler import IngestionJob, IngestionScheduler, QueueFullError
+from ingestion.bulk import BulkIngestor, normalize_item
+from ingestion.migration import RouteWriter
+from db.bulk_job_store import BulkJobStore
+from ingestion.dedup import (
+    ChunkEmbeddingCache,
+    build_document_metadata,
+    canonicalize_url,
+    chunk_metadatas,
+    stored_chunk_embeddings
+)
 import os
 from dotenv import load_dotenv
 from config import settings
@@ -16,20 +37,23 @@ load_dotenv()
 
 router = APIRouter()
 
-# In-memory task storage (replace with proper database in production)
-tasks = {}
-
 logger = logging.getLogger(__name__)
 
 class URLSubmission(BaseModel):
     url: HttpUrl
     content_type: Literal["article", "youtube"]
+    priority: Literal["interactive", "bulk"] = "interactive"
+    # Re-scrape a URL that was already ingested, re-embedding only changed chunks
+    refresh: bool = False
 
 class TaskStatus(BaseModel):
     task_id: str
     status: str
     content_id: Optional[str] = None
     error: Optional[str] = None
+    stage: Optional[str] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    queue: Optional[Dict[str, Any]] = None
 
 class ContentMetadataResponse(BaseModel):
     title: str
@@ -44,111 +68,330 @@ class ProcessedContent(BaseModel):
     content_id: str
     metadata: ContentMetadataResponse
     chunks: List[str]
+    # Set when the page was limited and more chunks follow
+    next_cursor: Optional[str] = None
+
+class BulkSubmission(BaseModel):
+    urls: List[HttpUrl] = []
+    # {"url": ...} or pre-extracted {"text": ..., "title": ..., "source_url": ...}
+    items: List[Dict[str, Any]] = []
+    content_type: Optional[Literal["article", "youtube"]] = None
+    refresh: bool = False
+    # Resubmitting with the same job_id resumes that job instead of starting over
+    job_id: Optional[str] = None
+
+class BulkJobStatus(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    items: Dict[str, int]
+    chunks: int
+    error: Optional[str] = None
+    recent_errors: List[Dict[str, Any]] = []
 
 def generate_task_id() -> str:
     return str(uuid.uuid4())
 
-async def process_content_task(
-    url: str | HttpUrl,
-    content_type: str,
-    task_id: str,
+EXPORT_BATCH_SIZE = 500
+
+def iter_collection(
+    collection,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    include_embeddings: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """Yield a collection's chunks page by page, holding one page in memory at a time"""
+    include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+    offset = 0
+    while True:
+        page = collection.get(limit=batch_size, offset=offset, include=include)
+        if not page or not page["ids"]:
+            return
+        yield page
+        if len(page["ids"]) < batch_size:
+            return
+        offset += len(page["ids"])
+
+async def export_ndjson(
+    collection,
+    document_store: DocumentStore,
+    batch_size: int,
+    include_embeddings: bool
+) -> AsyncIterator[bytes]:
+    """One JSON line per chunk, with document metadata merged back in"""
+    pages = iter_collection(collection, batch_size, include_embeddings)
+    while True:
+        # Chroma and SQLite reads block, so fetch each page off the event loop
+        page = await asyncio.to_thread(next, pages, None)
+        if page is None:
+            return
+        metadatas = await asyncio.to_thread(document_store.hydrate, page["metadatas"])
+        lines = []
+        for i, chunk_id in enumerate(page["ids"]):
+            record = {"id": chunk_id, "document": page["documents"][i], "metadata": metadatas[i]}
+            if include_embeddings:
+                embedding = page["embeddings"][i]
+                record["embedding"] = embedding.tolist() if hasattr(embedding, "tolist") else list(embedding)
+            lines.append(json.dumps(record))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+def build_ingestion_scheduler(
     vector_store: VectorStore,
-    embedding_generator: EmbeddingGenerator
-):
-    """Background task for content processing"""
-    logger.debug(f"Starting content processing task {task_id} for URL: {url}")
-    tasks[task_id] = {"status": "processing"}
-    
-    try:
-        async with ContentProcessor(youtube_api_key=settings.YOUTUBE_API_KEY) as processor:
-            logger.debug("Created ContentProcessor instance")
-            
-            # Convert URL to string if it's a HttpUrl object
-            url_str = str(url)
-            
-            # Process content
-            metadata, chunks = await processor.process_content(url_str, content_type)
-            logger.debug(f"Successfully processed content, got {len(chunks)} chunks")
-            
-            # Generate embeddings
-            embeddings = processor.generate_embeddings(chunks)
-            logger.debug("Generated embeddings")
-            
-            # Store in vector store
-            collection = vector_store.get_collection(content_type)
-            logger.debug(f"Storing in {content_type} collection")
-            
+    embedding_batcher: EmbeddingBatcher,
+    semantic_search: SemanticSearch,
+    task_store: TaskStore,
+    document_store: DocumentStore,
+    browser_pool: Optional[BrowserPool] = None,
+    http_client: Optional[httpx.AsyncClient] = None,
+    transcript_session: Optional[requests.Session] = None,
+    chunk_cache: Optional[ChunkEmbeddingCache] = None,
+    chunker: Optional[Chunker] = None,
+    route_writer: Optional[RouteWriter] = None,
+    fetch_workers: int = 4,
+    embed_workers: int = 2,
+    store_workers: int = 2,
+    max_queue_size: int = 100
+) -> IngestionScheduler:
+    """Build the fetch -> embed -> store ingestion pipeline"""
+    chunk_cache = chunk_cache or ChunkEmbeddingCache()
+
+    async def fetch_stage(job: IngestionJob):
+        logger.debug(f"Starting content processing task {job.task_id} for URL: {job.url}")
+        async with ContentProcessor(
+            youtube_api_key=settings.YOUTUBE_API_KEY,
+            browser_pool=browser_pool,
+            http_client=http_client,
+            transcript_session=transcript_session,
+            chunker=chunker
+        ) as processor:
+            metadata, chunks = await processor.process_content(job.url, job.content_type)
+        logger.debug(f"Successfully processed content, got {len(chunks)} chunks")
+        job.payload["metadata"] = metadata
+        job.payload["chunks"] = chunks
+
+    async def embed_stage(job: IngestionJob):
+        chunks = job.payload["chunks"]
+        known: Dict[str, List[float]] = {}
+        existing_id = job.payload.get("content_id")
+        if existing_id:
+            collection = vector_store.get_collection(job.content_type)
+            job.payload["stored_hashes"], known = await asyncio.to_thread(
+                stored_chunk_embeddings, collection, existing_id
+            )
+
+        # Only chunks with unseen hashes are encoded (batched with concurrent requests)
+        embeddings, hashes, encoded = await chunk_cache.embed(
+            chunks, embedding_batcher.generate, known, embedding_batcher.embedding_generator.model_name
+        )
+        job.payload["embeddings"] = embeddings
+        job.payload["chunk_hashes"] = hashes
+        logger.debug(f"Generated embeddings for {encoded} of {len(chunks)} chunks")
+
+    async def store_stage(job: IngestionJob):
+        metadata = job.payload["metadata"]
+        chunks = job.payload["chunks"]
+        collection = vector_store.get_collection(job.content_type)
+        logger.debug(f"Storing in {job.content_type} collection")
+
+        hashes = job.payload["chunk_hashes"]
+        stored_hashes = job.payload.get("stored_hashes", [])
+        content_id = job.payload.get("content_id")
+        if content_id and stored_hashes == hashes:
+            logger.info(f"Content {content_id} is unchanged, skipping store")
+            return
+
+        if not content_id:
+            # Generate a content ID
+            content_id = str(uuid.uuid4())
+            logger.info(f"Generated content ID: {content_id}")
+
+        # Document metadata is stored once; chunks only reference it
+        metadata_dict = build_document_metadata(content_id, job.payload["canonical_url"], hashes, metadata)
+        logger.debug(f"Updated metadata with content_id: {metadata_dict}")
+        chunk_ids = [f"{content_id}_{i}" for i in range(len(chunks))]
+        # Drop chunks left over from a longer previous version
+        stale_ids = [f"{content_id}_{i}" for i in range(len(chunks), len(stored_hashes))]
+
+        try:
+            await asyncio.to_thread(
+                collection.upsert,
+                documents=chunks,
+                embeddings=job.payload["embeddings"],
+                metadatas=chunk_metadatas(content_id, hashes),
+                ids=chunk_ids
+            )
+            if stale_ids:
+                await asyncio.to_thread(collection.delete, ids=stale_ids)
+            # Written last, so a URL only maps to a document once its chunks are stored
+            generation = await asyncio.to_thread(document_store.put, content_id, job.content_type, metadata_dict)
+        except Exception as e:
+            logger.error(f"Error storing content with ID {content_id}: {str(e)}", exc_info=True)
+            raise
+
+        logger.info(f"Successfully stored content with ID {content_id} in vector store")
+        job.payload["content_id"] = content_id
+        if route_writer is not None:
             try:
-                # Generate a content ID
-                content_id = str(uuid.uuid4())
-                logger.info(f"Generated content ID: {content_id}")
-                
-                # Update metadata to include content_id
-                metadata_dict = {
-                    "content_id": content_id,
-                    "title": metadata.title or "",
-                    "author": metadata.author or "Unknown",
-                    "source_url": str(metadata.source_url),
-                    "content_type": metadata.content_type,
-                    "duration": metadata.duration or "",
-                    "published_date": metadata.published_date or "",
-                    "view_count": metadata.view_count or 0
-                }
-                logger.debug(f"Updated metadata with content_id: {metadata_dict}")
-                
-                # Store in vector store
-                collection.add(
-                    documents=chunks,
-                    embeddings=embeddings,
-                    metadatas=[metadata_dict] * len(chunks),
-                    ids=[f"{content_id}_{i}" for i in range(len(chunks))]
+                await route_writer.write(
+                    job.content_type, chunk_ids, chunks, chunk_metadatas(content_id, hashes), stale_ids
                 )
-                logger.info(f"Successfully stored content with ID {content_id} in vector store")
-                
             except Exception as e:
-                logger.error(f"Error storing content with ID {content_id}: {str(e)}", exc_info=True)
-                raise
-            
-            # Update task status
-            tasks[task_id] = {
-                "status": "completed",
-                "content_id": content_id,
-                "metadata": metadata_dict,
-                "chunks": chunks
-            }
-            logger.info(f"Updated task {task_id} with content_id {content_id}")
-            
-    except Exception as e:
-        logger.error(f"Error in process_content_task: {str(e)}", exc_info=True)
-        tasks[task_id] = {
+                # The migration's next reconcile pass copies what this write missed
+                logger.error(f"Error writing content {content_id} to its migration target: {str(e)}", exc_info=True)
+        try:
+            await asyncio.to_thread(
+                semantic_search.update_index,
+                job.content_type,
+                chunk_ids,
+                job.payload["embeddings"],
+                stale_ids,
+                generation
+            )
+        except Exception as e:
+            # The chunks are stored either way; only the in-process indexes miss this write
+            logger.error(f"Error indexing content {content_id}: {str(e)}", exc_info=True)
+        semantic_search.invalidate_collection(job.content_type)
+
+    async def record_stage(job: IngestionJob):
+        await task_store.aset(job.task_id, {
+            "status": "processing",
+            "stage": job.stage,
+            "stage_timings": job.stage_timings
+        })
+
+    async def record_completion(job: IngestionJob):
+        # Chunks stay in the vector store, referenced by content_id
+        await task_store.aset(job.task_id, {
+            "status": "completed",
+            "content_id": job.payload["content_id"],
+            "collection": job.content_type,
+            "stage_timings": job.stage_timings
+        })
+        logger.info(f"Updated task {job.task_id} with content_id {job.payload['content_id']}")
+
+    async def record_failure(job: IngestionJob, error: Exception):
+        await task_store.aset(job.task_id, {
             "status": "failed",
-            "error": str(e)
-        }
+            "error": str(error),
+            "stage": job.stage,
+            "stage_timings": job.stage_timings
+        })
+
+    return IngestionScheduler(
+        stages=[
+            ("fetch", fetch_stage, fetch_workers),
+            ("embed", embed_stage, embed_workers),
+            ("store", store_stage, store_workers)
+        ],
+        max_queue_size=max_queue_size,
+        on_stage_start=record_stage,
+        on_complete=record_completion,
+        on_failure=record_failure
+    )
+
+# Shared service instances are created once in main
+def get_vector_store(request: Request) -> VectorStore:
+    return request.app.state.services.vector_store
+
+def get_task_store(request: Request) -> TaskStore:
+    return request.app.state.services.content_task_store
+
+def get_document_store(request: Request) -> DocumentStore:
+    return request.app.state.services.document_store
+
+def _started_services(request: Request):
+    """The services, or 503 while they are still starting (or shutting down)"""
+    services = request.app.state.services
+    if not services.ready:
+        raise HTTPException(status_code=503, detail="Ingestion is starting", headers={"Retry-After": "5"})
+    return services
+
+def get_ingestion_scheduler(request: Request) -> IngestionScheduler:
+    return _started_services(request).ingestion_scheduler
+
+def get_ready_scheduler(request: Request) -> Optional[IngestionScheduler]:
+    """The ingestion scheduler once services are ready, else None; never answers 503"""
+    services = request.app.state.services
+    return services.ingestion_scheduler if services.ready else None
+
+def get_bulk_ingestor(request: Request) -> BulkIngestor:
+    return _started_services(request).bulk_ingestor
+
+def get_bulk_job_store(request: Request) -> BulkJobStore:
+    return request.app.state.services.bulk_job_store
+
+# How long a read waits for search to warm up before answering 503
+SEARCH_WARM_TIMEOUT_SECONDS = 10
 
-# Move VectorStore initialization to a dependency
-def get_vector_store():
-    return VectorStore()
+async def get_semantic_search(request: Request) -> SemanticSearch:
+    """SemanticSearch once it is warm; reads resolve migrated collections through it"""
+    services = request.app.state.services
+    if not await services.wait_for_search(SEARCH_WARM_TIMEOUT_SECONDS):
+        raise HTTPException(status_code=503, detail="Search is warming up", headers={"Retry-After": "5"})
+    return services.semantic_search
 
 @router.post("/submit", response_model=TaskStatus)
 async def submit_content(
     submission: URLSubmission,
-    background_tasks: BackgroundTasks,
-    vector_store: VectorStore = Depends(get_vector_store)
+    task_store: TaskStore = Depends(get_task_store),
+    document_store: DocumentStore = Depends(get_document_store),
+    scheduler: IngestionScheduler = Depends(get_ingestion_scheduler)
 ):
     """Submit content for processing"""
     try:
         task_id = str(uuid.uuid4())
         print(f"Task ID: {task_id}")
-        background_tasks.add_task(
-            process_content_task,
-            str(submission.url),  # Convert to string here
+        url = str(submission.url)  # Convert to string here
+        canonical_url = canonicalize_url(url, submission.content_type)
+        existing_id = await asyncio.to_thread(
+            document_store.find_by_url,
             submission.content_type,
-            task_id,
-            vector_store,
-            EmbeddingGenerator()
+            canonical_url,
+            url
         )
-        return TaskStatus(task_id=task_id, status="processing")
-        
+
+        if existing_id and not submission.refresh:
+            logger.info(f"{canonical_url} already ingested as {existing_id}")
+            await task_store.aset(task_id, {
+                "status": "completed",
+                "content_id": existing_id,
+                "collection": submission.content_type
+            })
+            return TaskStatus(task_id=task_id, status="completed", content_id=existing_id)
+
+        submitted_id = scheduler.submit(IngestionJob(
+            task_id=task_id,
+            url=url,
+            content_type=submission.content_type,
+            priority=submission.priority,
+            key=f"{submission.content_type}:{canonical_url}",
+            payload={"canonical_url": canonical_url, "content_id": existing_id}
+        ))
+        if submitted_id != task_id:
+            # The same document is already queued or being processed
+            logger.info(f"{canonical_url} is already being ingested by task {submitted_id}")
+            task = await task_store.aget(submitted_id) or {}
+            return TaskStatus(
+                task_id=submitted_id,
+                status="processing",
+                stage=task.get("stage", "queued"),
+                queue=scheduler.stats()
+            )
+        await task_store.aset(task_id, {"status": "processing", "stage": "queued"})
+        return TaskStatus(
+            task_id=task_id,
+            status="processing",
+            stage="queued",
+            queue=scheduler.stats()
+        )
+
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         return TaskStatus(
             task_id=str(uuid.uuid4()),
@@ -157,27 +400,114 @@ async def submit_content(
         )
 
 @router.get("/task/{task_id}", response_model=TaskStatus)
-async def get_task_status(task_id: str):
-    """Get content processing task status"""
-    if task_id not in tasks:
+async def get_task_status(
+    task_id: str,
+    task_store: TaskStore = Depends(get_task_store),
+    scheduler: Optional[IngestionScheduler] = Depends(get_ready_scheduler)
+):
+    """Get content processing task status
+
+    Only the task store is needed; queue stats are added once ingestion is running.
+    """
+    task = await task_store.aget(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
-        
-    task = tasks[task_id]
+
     return TaskStatus(
         task_id=task_id,
         status=task["status"],
         content_id=task.get("content_id"),
-        error=task.get("error")
+        error=task.get("error"),
+        stage=task.get("stage"),
+        stage_timings=task.get("stage_timings"),
+        queue=scheduler.stats() if scheduler is not None else None
+    )
+
+@router.post("/bulk", response_model=BulkJobStatus)
+async def submit_bulk(
+    submission: BulkSubmission,
+    ingestor: BulkIngestor = Depends(get_bulk_ingestor),
+    job_store: BulkJobStore = Depends(get_bulk_job_store)
+):
+    """Import many URLs or pre-extracted documents as one resumable job"""
+    try:
+        items = [
+            normalize_item(raw, submission.content_type)
+            for raw in [str(url) for url in submission.urls] + submission.items
+        ]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not items:
+        raise HTTPException(status_code=422, detail="No urls or items given")
+
+    job_id = submission.job_id or str(uuid.uuid4())
+    await asyncio.to_thread(job_store.create, job_id, items, {"refresh": submission.refresh})
+    # A resubmitted job id may already be running in another worker
+    if await ingestor.claim(job_id):
+        ingestor.start(job_id)
+    return BulkJobStatus(**await asyncio.to_thread(job_store.get, job_id))
+
+@router.get("/bulk/{job_id}", response_model=BulkJobStatus)
+async def get_bulk_status(job_id: str, job_store: BulkJobStore = Depends(get_bulk_job_store)):
+    """Get bulk import progress"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    return BulkJobStatus(**job)
+
+@router.post("/bulk/{job_id}/resume", response_model=BulkJobStatus)
+async def resume_bulk(
+    job_id: str,
+    retry_failed: bool = False,
+    ingestor: BulkIngestor = Depends(get_bulk_ingestor),
+    job_store: BulkJobStore = Depends(get_bulk_job_store)
+):
+    """Resume an interrupted bulk import, optionally retrying failed items"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    if not await ingestor.claim(job_id):
+        raise HTTPException(status_code=409, detail="Bulk job is running in another worker")
+    ingestor.start(job_id, retry_failed=retry_failed)
+    return BulkJobStatus(**job)
+
+@router.get("/collections/{collection}/export")
+async def export_collection(
+    collection: Literal["article", "youtube", "tutorial"],
+    include_embeddings: bool = False,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=5000),
+    vector_store: VectorStore = Depends(get_vector_store),
+    document_store: DocumentStore = Depends(get_document_store),
+    semantic_search: SemanticSearch = Depends(get_semantic_search)
+):
+    """Stream every chunk of a collection as NDJSON"""
+    source = await asyncio.to_thread(vector_store.get_collection, semantic_search.read_collection(collection))
+    return StreamingResponse(
+        export_ndjson(source, document_store, batch_size, include_embeddings),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{collection}.ndjson"'}
     )
 
 @router.get("/{task_id}", response_model=ProcessedContent)
-async def get_processed_content(task_id: str):
-    """Get the processed content for a completed task"""
-    if task_id not in tasks:
-        logger.debug(f"Task {task_id} not found in tasks")
+async def get_processed_content(
+    task_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    task_store: TaskStore = Depends(get_task_store),
+    vector_store: VectorStore = Depends(get_vector_store),
+    document_store: DocumentStore = Depends(get_document_store),
+    semantic_search: SemanticSearch = Depends(get_semantic_search)
+):
+    """Get the processed content for a completed task
+
+    Without a limit every chunk is returned. With one, chunks are returned in
+    pages; pass next_cursor back as cursor to fetch the following page.
+    """
+    task = await task_store.aget(task_id)
+    if task is None:
+        logger.debug(f"Task {task_id} not found in task store")
         raise HTTPException(status_code=404, detail="Content not found")
         
-    task = tasks[task_id]
     logger.debug(f"Found task: {task}")
     
     if task["status"] != "completed":
@@ -186,11 +516,52 @@ async def get_processed_content(task_id: str):
             status_code=400, 
             detail=f"Content processing not completed. Status: {task['status']}"
         )
-    
+
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        start = -1
+    if start < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Load the chunks referenced by the task from the collection that serves its reads
+    content_id = task["content_id"]
+    collection = await asyncio.to_thread(
+        vector_store.get_collection, semantic_search.read_collection(task["collection"])
+    )
+    if limit is None:
+        stored = await asyncio.to_thread(collection.get, where={"content_id": content_id}, include=["documents"])
+    else:
+        # Chunk ids are content_id_<index>, so a page is a direct id lookup;
+        # one extra id tells whether another page follows
+        stored = await asyncio.to_thread(
+            collection.get,
+            ids=[f"{content_id}_{i}" for i in range(start, start + limit + 1)],
+            include=["documents"]
+        )
+    document = await asyncio.to_thread(document_store.get, content_id)
+    if document is None or not stored or (not stored["ids"] and start == 0):
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    ordered = sorted(
+        zip(stored["ids"], stored["documents"]),
+        key=lambda item: int(item[0].rsplit("_", 1)[1])
+    )
+    next_cursor = None
+    if limit is not None and len(ordered) > limit:
+        ordered = ordered[:limit]
+        next_cursor = str(start + limit)
+    metadata = {
+        key: value
+        for key, value in document.items()
+        if key in ContentMetadataResponse.model_fields
+    }
+
     response = ProcessedContent(
-        content_id=task["content_id"],
-        metadata=ContentMetadataResponse(**task["metadata"]),
-        chunks=task["chunks"]
+        content_id=content_id,
+        metadata=ContentMetadataResponse(**metadata),
+        chunks=[chunk for _, chunk in ordered],
+        next_cursor=next_cursor
     )
     logger.debug(f"Returning response: {response.model_dump_json(indent=2)}")
-    return response 
\ No newline at end of file
+    return response
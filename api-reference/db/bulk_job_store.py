@@ -0,0 +1,161 @@
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from db.lease import LeaseColumns
+
+logger = logging.getLogger(__name__)
+
+# Item states; only "pending" items are picked up when a job runs or resumes
+PENDING, COMPLETED, SKIPPED, FAILED = "pending", "completed", "skipped", "failed"
+
+
+class BulkJobStore(LeaseColumns):
+    """Parent bulk-import jobs and the state of every item they contain
+
+    Each item is stored with its input, so an interrupted import can be
+    resumed from the store alone, picking up the items still pending. A job
+    runs in whichever process holds its lease.
+    """
+
+    _lease_table, _lease_key = "bulk_jobs", "job_id"
+
+    def __init__(self, path: str = "./bulk_jobs.db"):
+        self.path = path
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self):
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bulk_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    error TEXT,
+                    owner TEXT,
+                    heartbeat REAL
+                )
+                """
+            )
+            self._add_lease_columns(connection)
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bulk_items (
+                    job_id TEXT NOT NULL,
+                    item_index INTEGER NOT NULL,
+                    item TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    content_id TEXT,
+                    chunks INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    PRIMARY KEY (job_id, item_index)
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_bulk_items_status ON bulk_items (job_id, status)"
+            )
+
+    def create(self, job_id: str, items: Iterable[Dict[str, Any]], options: Dict[str, Any]) -> bool:
+        """Register a job and its items; returns False if the job already exists"""
+        now = time.time()
+        with self._connect() as connection:
+            inserted = connection.execute(
+                "INSERT OR IGNORE INTO bulk_jobs (job_id, status, options, created_at, updated_at) "
+                "VALUES (?, 'running', ?, ?, ?)",
+                (job_id, json.dumps(options), now, now)
+            ).rowcount
+            if not inserted:
+                return False
+            connection.executemany(
+                "INSERT INTO bulk_items (job_id, item_index, item, status) VALUES (?, ?, ?, ?)",
+                ((job_id, index, json.dumps(item), PENDING) for index, item in enumerate(items))
+            )
+        return True
+
+    def pending(self, job_id: str, retry_failed: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        statuses = (PENDING, FAILED) if retry_failed else (PENDING,)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT item_index, item FROM bulk_items WHERE job_id = ? "
+                f"AND status IN ({','.join('?' * len(statuses))}) ORDER BY item_index",
+                (job_id, *statuses)
+            ).fetchall()
+        return [(index, json.loads(item)) for index, item in rows]
+
+    def record(self, job_id: str, results: Iterable[Tuple[int, str, Optional[str], int, Optional[str]]]):
+        """Record (item_index, status, content_id, chunks, error) for a batch of items"""
+        with self._connect() as connection:
+            connection.executemany(
+                "UPDATE bulk_items SET status = ?, content_id = ?, chunks = ?, error = ? "
+                "WHERE job_id = ? AND item_index = ?",
+                (
+                    (status, content_id, chunks, error, job_id, index)
+                    for index, status, content_id, chunks, error in results
+                )
+            )
+            connection.execute("UPDATE bulk_jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE bulk_jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status with item counts per state"""
+        with self._connect() as connection:
+            job = connection.execute(
+                "SELECT status, options, created_at, updated_at, error FROM bulk_jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            counts = dict(connection.execute(
+                "SELECT status, COUNT(*) FROM bulk_items WHERE job_id = ? GROUP BY status",
+                (job_id,)
+            ).fetchall())
+            chunks = connection.execute(
+                "SELECT COALESCE(SUM(chunks), 0) FROM bulk_items WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()[0]
+            errors = connection.execute(
+                "SELECT item_index, error FROM bulk_items WHERE job_id = ? AND status = ? "
+                "ORDER BY item_index LIMIT 20",
+                (job_id, FAILED)
+            ).fetchall()
+
+        return {
+            "job_id": job_id,
+            "status": job[0],
+            "options": json.loads(job[1]),
+            "created_at": job[2],
+            "updated_at": job[3],
+            "error": job[4],
+            "total": sum(counts.values()),
+            "items": {state: counts.get(state, 0) for state in (PENDING, COMPLETED, SKIPPED, FAILED)},
+            "chunks": chunks,
+            "recent_errors": [{"index": index, "error": error} for index, error in errors]
+        }
+
+    def running_jobs(self) -> List[str]:
+        """Jobs that were still running when the process stopped"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT job_id FROM bulk_jobs WHERE status = 'running'").fetchall()
+        return [row[0] for row in rows]
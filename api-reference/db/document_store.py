@@ -0,0 +1,233 @@
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from search.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Keys kept on every chunk; everything else lives once per document
+CHUNK_METADATA_KEYS = ("content_id", "chunk_index", "chunk_hash")
+
+# Document metadata that search filters on, each with an expression index
+FILTER_FIELDS = ("author", "content_type", "published_date")
+
+
+class DocumentStore:
+    """Document-level metadata stored once per content_id
+
+    Chunks in Chroma only carry a slim reference (content_id, chunk_index,
+    chunk_hash). Title, author, URLs and the rest are kept here and merged
+    back into chunk metadata through an in-memory cache when results are
+    returned. Each collection also has a write generation, shared by every
+    worker process, which in-process indexes use to notice writes made
+    elsewhere.
+    """
+
+    def __init__(
+        self,
+        path: str = "./documents.db",
+        cache_size: int = 4096,
+        cache_ttl_seconds: Optional[float] = 300
+    ):
+        self.path = path
+        self.cache = TTLCache(cache_size, cache_ttl_seconds)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self):
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    content_id TEXT PRIMARY KEY,
+                    collection TEXT NOT NULL,
+                    canonical_url TEXT,
+                    source_url TEXT,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_url ON documents (collection, canonical_url)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_source_url ON documents (collection, source_url)"
+            )
+            # Search filters; the expressions must match find_content_ids() for SQLite to use them
+            for field in FILTER_FIELDS:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_documents_{field} "
+                    f"ON documents (collection, json_extract(metadata, '$.{field}'))"
+                )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collection_generations (
+                    collection TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+                """
+            )
+
+    @staticmethod
+    def _bump_generation(connection: sqlite3.Connection, collection: str) -> int:
+        connection.execute(
+            "INSERT INTO collection_generations (collection, generation) VALUES (?, 1) "
+            "ON CONFLICT (collection) DO UPDATE SET generation = generation + 1",
+            (collection,)
+        )
+        # Same transaction, so this is the value our own increment produced
+        row = connection.execute(
+            "SELECT generation FROM collection_generations WHERE collection = ?",
+            (collection,)
+        ).fetchone()
+        return row[0]
+
+    def bump_generation(self, collection: str) -> int:
+        """Record a write to a collection that stores no document row; returns its new generation"""
+        with self._connect() as connection:
+            return self._bump_generation(connection, collection)
+
+    def generation(self, collection: str) -> int:
+        """Number of writes recorded for a collection by every process so far"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT generation FROM collection_generations WHERE collection = ?",
+                (collection,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def put(self, content_id: str, collection: str, metadata: Dict[str, Any]) -> int:
+        return self.put_many([(content_id, collection, metadata)])[collection]
+
+    def put_many(self, documents: Iterable[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, int]:
+        """Store (content_id, collection, metadata) tuples in one transaction
+
+        Writers store document rows after their chunks, so the same
+        transaction bumps the write generation of every collection written;
+        returns the new generation of each.
+        """
+        rows = []
+        for content_id, collection, metadata in documents:
+            document = {key: value for key, value in metadata.items() if key not in CHUNK_METADATA_KEYS}
+            document["content_id"] = content_id
+            rows.append((content_id, collection, document))
+        if not rows:
+            return {}
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO documents (content_id, collection, canonical_url, source_url, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        content_id,
+                        collection,
+                        document.get("canonical_url"),
+                        document.get("source_url"),
+                        json.dumps(document)
+                    )
+                    for content_id, collection, document in rows
+                )
+            )
+            generations = {
+                collection: self._bump_generation(connection, collection)
+                for collection in dict.fromkeys(collection for _, collection, _ in rows)
+            }
+        for content_id, _, document in rows:
+            self.cache.set(content_id, document)
+        return generations
+
+    def get(self, content_id: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([content_id]).get(content_id)
+
+    def get_many(self, content_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for content_id in dict.fromkeys(content_ids):
+            document = self.cache.get(content_id)
+            if document is None:
+                missing.append(content_id)
+            else:
+                found[content_id] = document
+
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            with self._connect() as connection:
+                rows = connection.execute(
+                    f"SELECT content_id, metadata FROM documents WHERE content_id IN ({placeholders})",
+                    missing
+                ).fetchall()
+            for content_id, metadata in rows:
+                document = json.loads(metadata)
+                self.cache.set(content_id, document)
+                found[content_id] = document
+        return found
+
+    def find_by_url(self, collection: str, canonical_url: str, source_url: str) -> Optional[str]:
+        """Return the content_id already stored for a URL, if any"""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT content_id FROM documents WHERE collection = ? AND (canonical_url = ? OR source_url = ?) LIMIT 1",
+                (collection, canonical_url, source_url)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_content_ids(
+        self,
+        collection: str,
+        author: Optional[str] = None,
+        content_type: Optional[str] = None,
+        published_after: Optional[str] = None,
+        published_before: Optional[str] = None
+    ) -> List[str]:
+        """content_ids of documents in a collection matching every given filter"""
+        clauses = ["collection = ?"]
+        params: List[Any] = [collection]
+        if author is not None:
+            clauses.append("json_extract(metadata, '$.author') = ?")
+            params.append(author)
+        if content_type is not None:
+            clauses.append("json_extract(metadata, '$.content_type') = ?")
+            params.append(content_type)
+        if published_after is not None:
+            clauses.append("json_extract(metadata, '$.published_date') >= ?")
+            params.append(published_after)
+        if published_before is not None:
+            # Documents without a date are stored with "" and never match a date range
+            clauses.append("json_extract(metadata, '$.published_date') <= ? AND json_extract(metadata, '$.published_date') != ''")
+            params.append(published_before)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT content_id FROM documents WHERE {' AND '.join(clauses)}",
+                params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, content_id: str):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM documents WHERE content_id = ?", (content_id,))
+        self.cache.invalidate(lambda key: key == content_id)
+
+    def hydrate(self, metadatas: List[Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Merge document metadata back into slim chunk metadata"""
+        documents = self.get_many(
+            metadata["content_id"] for metadata in metadatas if metadata and metadata.get("content_id")
+        )
+        return [
+            {**documents.get((metadata or {}).get("content_id"), {}), **(metadata or {})}
+            for metadata in metadatas
+        ]
+
+    @staticmethod
+    def slim(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: metadata[key] for key in CHUNK_METADATA_KEYS if key in metadata}
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed job stays reserved without a heartbeat
+DEFAULT_LEASE_SECONDS = 60
+
+
+class LeaseHeldError(RuntimeError):
+    """Raised when another live process holds a job's lease"""
+
+
+def default_owner() -> str:
+    """Lease owner id of this process; API workers and containers each get their own"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseColumns:
+    """Owner and heartbeat columns that let one process at a time run a stored job
+
+    Mixed into a SQLite store with a _connect() context manager; the store
+    sets _lease_table and _lease_key to its job table and primary key.
+    """
+
+    _lease_table: str
+    _lease_key: str
+
+    def _add_lease_columns(self, connection: sqlite3.Connection):
+        columns = {row[1] for row in connection.execute(f"PRAGMA table_info({self._lease_table})")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE {self._lease_table} ADD COLUMN {column} {kind}")
+
+    def claim(self, key: str, owner: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Take the lease if it is free, expired or already ours"""
+        now = time.time()
+        with self._connect() as connection:
+            return bool(connection.execute(
+                f"UPDATE {self._lease_table} SET owner = ?, heartbeat = ? "
+                f"WHERE {self._lease_key} = ? AND (owner IS NULL OR owner = ? OR heartbeat < ?)",
+                (owner, now, key, owner, now - lease_seconds)
+            ).rowcount)
+
+    def heartbeat(self, key: str, owner: str) -> bool:
+        """Extend our lease; False once another process has taken it over"""
+        with self._connect() as connection:
+            return bool(connection.execute(
+                f"UPDATE {self._lease_table} SET heartbeat = ? WHERE {self._lease_key} = ? AND owner = ?",
+                (time.time(), key, owner)
+            ).rowcount)
+
+    def release(self, key: str, owner: str):
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE {self._lease_table} SET owner = NULL, heartbeat = NULL "
+                f"WHERE {self._lease_key} = ? AND owner = ?",
+                (key, owner)
+            )
+
+
+@asynccontextmanager
+async def held_lease(store: LeaseColumns, key: str, owner: str, lease_seconds: float) -> AsyncIterator[None]:
+    """Hold a job's lease for the block, heartbeating it; the block is cancelled if the lease is lost"""
+    if not await asyncio.to_thread(store.claim, key, owner, lease_seconds):
+        raise LeaseHeldError(f"{key} is running in another process")
+    holder = asyncio.current_task()
+    lost = False
+
+    async def keep_alive():
+        nonlocal lost
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(store.heartbeat, key, owner):
+                    lost = True
+                    logger.error(f"Lost the lease on {key} to another process, stopping")
+                    holder.cancel()
+                    return
+            except Exception as e:
+                # A missed heartbeat is retried; the lease only lapses after lease_seconds
+                logger.warning(f"Heartbeat for {key} failed: {str(e)}")
+
+    heartbeat = asyncio.create_task(keep_alive())
+    try:
+        yield
+    finally:
+        heartbeat.cancel()
+        if not lost:
+            await asyncio.to_thread(store.release, key, owner)
@@ -0,0 +1,106 @@
+"""Move document-level metadata off every chunk into the DocumentStore
+
+Usage: python -m db.migrate_document_metadata [collection ...] [--batch-size N]
+
+Safe to re-run: chunks that are already slim are skipped.
+"""
+import argparse
+import logging
+from typing import Any, Dict, List
+from db.vector_store import VectorStore
+from db.document_store import CHUNK_METADATA_KEYS, DocumentStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTIONS = ["article", "youtube"]
+
+
+def _extra_keys(metadata: Dict[str, Any]) -> List[str]:
+    return [key for key in (metadata or {}) if key not in CHUNK_METADATA_KEYS]
+
+
+def _all_ids(collection, batch_size: int) -> List[str]:
+    """Every chunk id, read up front so rewriting chunks cannot shift the pages"""
+    ids: List[str] = []
+    while True:
+        batch = collection.get(include=[], limit=batch_size, offset=len(ids))
+        if not batch["ids"]:
+            return ids
+        ids.extend(batch["ids"])
+
+
+def migrate_collection(
+    vector_store: VectorStore,
+    document_store: DocumentStore,
+    collection_name: str,
+    batch_size: int = 500
+) -> Dict[str, int]:
+    collection = vector_store.get_collection(collection_name)
+    seen_documents = set()
+    migrated_chunks = 0
+    chunk_ids = _all_ids(collection, batch_size)
+
+    for start in range(0, len(chunk_ids), batch_size):
+        batch = collection.get(
+            ids=chunk_ids[start:start + batch_size],
+            include=["metadatas", "documents", "embeddings"]
+        )
+
+        rewrite: Dict[str, List[Any]] = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
+        for chunk_id, document, embedding, metadata in zip(
+            batch["ids"], batch["documents"], batch["embeddings"], batch["metadatas"]
+        ):
+            metadata = metadata or {}
+            if not _extra_keys(metadata):
+                continue
+
+            content_id = metadata.get("content_id") or chunk_id.rsplit("_", 1)[0]
+            if content_id not in seen_documents:
+                document_store.put(content_id, collection_name, metadata)
+                seen_documents.add(content_id)
+
+            slim = DocumentStore.slim(metadata)
+            slim["content_id"] = content_id
+            slim.setdefault("chunk_index", int(chunk_id.rsplit("_", 1)[1]))
+            rewrite["ids"].append(chunk_id)
+            rewrite["documents"].append(document)
+            rewrite["embeddings"].append(embedding)
+            rewrite["metadatas"].append(slim)
+
+        if rewrite["ids"]:
+            # The whole record is written rather than None-valued keys, which
+            # some Chroma versions reject
+            collection.upsert(**rewrite)
+            # Versions that merge metadata on upsert keep the old keys; those
+            # chunks are deleted and added back with only the slim metadata
+            stored = collection.get(ids=rewrite["ids"], include=["metadatas"])
+            merged = {chunk_id for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]) if _extra_keys(metadata)}
+            if merged:
+                rows = [i for i, chunk_id in enumerate(rewrite["ids"]) if chunk_id in merged]
+                collection.delete(ids=[rewrite["ids"][i] for i in rows])
+                collection.add(**{key: [values[i] for i in rows] for key, values in rewrite.items()})
+            migrated_chunks += len(rewrite["ids"])
+        logger.info(
+            f"{collection_name}: scanned {min(start + batch_size, len(chunk_ids))} chunks, migrated {migrated_chunks}"
+        )
+
+    return {"documents": len(seen_documents), "chunks": migrated_chunks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collections", nargs="*", default=DEFAULT_COLLECTIONS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--document-store", default="./documents.db")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    vector_store = VectorStore()
+    document_store = DocumentStore(args.document_store)
+    for collection_name in args.collections:
+        result = migrate_collection(vector_store, document_store, collection_name, args.batch_size)
+        logger.info(f"Migrated {collection_name}: {result}")
+
+
+if __name__ == "__main__":
+    main()
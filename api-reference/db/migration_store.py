@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from db.lease import LeaseColumns
+
+# A migration copies into its target ("running"), then serves reads from it
+# and keeps it in step with the source ("switched") until it is replaced
+RUNNING, SWITCHED, FAILED = "running", "switched", "failed"
+# A switched migration superseded by a newer one for the same collection
+REPLACED = "replaced"
+
+# Phases of a running migration, checkpointed with the source offset reached
+COPY, CATCH_UP, FOLLOW = "copy", "catch_up", "follow"
+
+
+class MigrationStore(LeaseColumns):
+    """Re-embedding migrations, their checkpoints and the collection routes they switch
+
+    A route maps a collection name to the Chroma collection and embedding
+    model that serve its reads. Routes live here rather than in a single
+    process, so every API worker picks up a switch. A migration runs in
+    whichever process holds its lease.
+    """
+
+    _lease_table, _lease_key = "migrations", "migration_id"
+
+    def __init__(self, path: str = "./migrations.db"):
+        self.path = path
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self):
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS migrations (
+                    migration_id TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    cursor INTEGER NOT NULL DEFAULT 0,
+                    passes INTEGER NOT NULL DEFAULT 0,
+                    pass_changes INTEGER NOT NULL DEFAULT 0,
+                    embedded INTEGER NOT NULL DEFAULT 0,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    switched_at REAL,
+                    error TEXT,
+                    owner TEXT,
+                    heartbeat REAL
+                )
+                """
+            )
+            self._add_lease_columns(connection)
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS collection_routes (
+                    collection TEXT PRIMARY KEY,
+                    target TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    migration_id TEXT NOT NULL,
+                    switched_at REAL NOT NULL
+                )
+                """
+            )
+
+    def create(self, migration_id: str, source: str, target: str, model_name: str, options: Dict[str, Any]) -> bool:
+        """Register a migration; returns False if it already exists"""
+        now = time.time()
+        with self._connect() as connection:
+            return bool(connection.execute(
+                "INSERT OR IGNORE INTO migrations "
+                "(migration_id, source, target, model_name, options, status, phase, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (migration_id, source, target, model_name, json.dumps(options), RUNNING, COPY, now, now)
+            ).rowcount)
+
+    def checkpoint(
+        self,
+        migration_id: str,
+        phase: str,
+        cursor: int,
+        passes: int,
+        pass_changes: int,
+        embedded: int = 0,
+        deleted: int = 0
+    ):
+        """Record how far the migration got; embedded and deleted are added to the totals"""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE migrations SET phase = ?, cursor = ?, passes = ?, pass_changes = ?, "
+                "embedded = embedded + ?, deleted = deleted + ?, updated_at = ? WHERE migration_id = ?",
+                (phase, cursor, passes, pass_changes, embedded, deleted, time.time(), migration_id)
+            )
+
+    def set_status(self, migration_id: str, status: str, error: Optional[str] = None):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE migrations SET status = ?, error = ?, updated_at = ? WHERE migration_id = ?",
+                (status, error, time.time(), migration_id)
+            )
+
+    def switch(self, migration_id: str):
+        """Point the source collection's reads at the migration target, in one transaction"""
+        now = time.time()
+        with self._connect() as connection:
+            source, target, model_name = connection.execute(
+                "SELECT source, target, model_name FROM migrations WHERE migration_id = ?",
+                (migration_id,)
+            ).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO collection_routes (collection, target, model_name, migration_id, switched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, target, model_name, migration_id, now)
+            )
+            # A migration replaced by this one no longer needs to follow its source
+            connection.execute(
+                "UPDATE migrations SET status = ?, updated_at = ? "
+                "WHERE source = ? AND status = ? AND migration_id != ?",
+                (REPLACED, now, source, SWITCHED, migration_id)
+            )
+            connection.execute(
+                "UPDATE migrations SET status = ?, phase = ?, cursor = 0, switched_at = ?, updated_at = ? "
+                "WHERE migration_id = ?",
+                (SWITCHED, FOLLOW, now, now, migration_id)
+            )
+
+    def get(self, migration_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute("SELECT * FROM migrations WHERE migration_id = ?", (migration_id,)).fetchone()
+        if row is None:
+            return None
+        migration = dict(row)
+        migration["options"] = json.loads(migration["options"])
+        return migration
+
+    def active(self) -> List[str]:
+        """Migrations to resume after a restart: still copying, or following a switched source"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT migration_id FROM migrations WHERE status IN (?, ?) ORDER BY created_at",
+                (RUNNING, SWITCHED)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def routes(self) -> Dict[str, Tuple[str, str]]:
+        """collection -> (target collection, embedding model) for every switched collection"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT collection, target, model_name FROM collection_routes").fetchall()
+        return {collection: (target, model_name) for collection, target, model_name in rows}
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStore(ABC):
+    """Storage for background task state, shared by every worker process
+
+    Routes and scheduler callbacks use aget/aset, which keep store I/O off
+    the event loop.
+    """
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def set(self, task_id: str, data: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def delete(self, task_id: str):
+        pass
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        pass
+
+    async def aget(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, task_id)
+
+    async def aset(self, task_id: str, data: Dict[str, Any]):
+        await asyncio.to_thread(self.set, task_id, data)
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+class InMemoryTaskStore(TaskStore):
+    """Single-process task store with TTL eviction (for tests and local runs)"""
+
+    def __init__(self, ttl_seconds: float = 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._tasks: Dict[str, tuple] = {}
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._tasks.get(task_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.time():
+            del self._tasks[task_id]
+            return None
+        return data
+
+    def set(self, task_id: str, data: Dict[str, Any]):
+        self._tasks[task_id] = (time.time() + self.ttl_seconds, data)
+
+    def delete(self, task_id: str):
+        self._tasks.pop(task_id, None)
+
+    # Nothing blocks here, so skip the worker thread
+    async def aget(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self.get(task_id)
+
+    async def aset(self, task_id: str, data: Dict[str, Any]):
+        self.set(task_id, data)
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        expired = [task_id for task_id, (expires_at, _) in self._tasks.items() if expires_at < now]
+        for task_id in expired:
+            del self._tasks[task_id]
+        return len(expired)
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite-backed task store, safe to share between uvicorn worker processes"""
+
+    def __init__(
+        self,
+        path: str = "./tasks.db",
+        namespace: str = "content",
+        ttl_seconds: float = 24 * 3600,
+        evict_every: int = 100
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self._writes = 0
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Short-lived connections keep the store usable from any thread or process
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self):
+        with self._connect() as connection:
+            # WAL is a property of the database file, so setting it once is enough
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    namespace TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, task_id)
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_expires_at ON tasks (expires_at)"
+            )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT data FROM tasks WHERE namespace = ? AND task_id = ? AND expires_at >= ?",
+                (self.namespace, task_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, task_id: str, data: Dict[str, Any]):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tasks (namespace, task_id, data, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, task_id, json.dumps(data), time.time() + self.ttl_seconds)
+            )
+
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict_expired()
+
+    def delete(self, task_id: str):
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM tasks WHERE namespace = ? AND task_id = ?",
+                (self.namespace, task_id)
+            )
+
+    def evict_expired(self) -> int:
+        with self._connect() as connection:
+            removed = connection.execute(
+                "DELETE FROM tasks WHERE expires_at < ?",
+                (time.time(),)
+            ).rowcount
+        if removed:
+            logger.debug(f"Evicted {removed} expired tasks")
+        return removed
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+from search.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TutorialStore:
+    """Finished tutorials stored whole, as zlib-compressed JSON
+
+    Chroma keeps the tutorial embedding for search; the full tutorial lives
+    here. Reads return the serialized JSON and its strong ETag from a bounded
+    in-memory cache, so routes can answer without re-validating the model.
+    Tutorials are immutable: regenerating one stores it under a new ID.
+    """
+
+    def __init__(
+        self,
+        path: str = "./tutorials.db",
+        cache_size: int = 256,
+        cache_ttl_seconds: Optional[float] = 3600
+    ):
+        self.path = path
+        self.cache = TTLCache(cache_size, cache_ttl_seconds)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self):
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tutorials (
+                    tutorial_id TEXT PRIMARY KEY,
+                    content_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    etag TEXT NOT NULL,
+                    body BLOB NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tutorials_content_id ON tutorials (content_id)"
+            )
+
+    @staticmethod
+    def etag_for(body: bytes) -> str:
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    def put(self, tutorial_id: str, content_id: str, body: bytes) -> str:
+        """Store a tutorial's JSON and return its ETag"""
+        etag = self.etag_for(body)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tutorials (tutorial_id, content_id, created_at, etag, body) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (tutorial_id, content_id, time.time(), etag, zlib.compress(body))
+            )
+        self.cache.set(tutorial_id, (etag, body))
+        return etag
+
+    def get_cached(self, tutorial_id: str) -> Optional[Tuple[str, bytes]]:
+        """(etag, JSON) if the tutorial is in memory; never touches SQLite"""
+        return self.cache.get(tutorial_id)
+
+    def get(self, tutorial_id: str) -> Optional[Tuple[str, bytes]]:
+        cached = self.cache.get(tutorial_id)
+        if cached is not None:
+            return cached
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT etag, body FROM tutorials WHERE tutorial_id = ?",
+                (tutorial_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        stored = (row[0], zlib.decompress(row[1]))
+        self.cache.set(tutorial_id, stored)
+        return stored
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from embeddings.generator import EmbeddingGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embedding requests into a single encode batch
+
+    Up to max_concurrent_batches batches (by default the generator's
+    max_workers) are encoded at once; while all of them are busy, new
+    requests keep collecting into the next batch.
+    """
+
+    def __init__(
+        self,
+        embedding_generator: EmbeddingGenerator,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_concurrent_batches: Optional[int] = None
+    ):
+        self.embedding_generator = embedding_generator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max_concurrent_batches or embedding_generator.max_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def _ensure_worker(self):
+        """Start the batching worker on the running event loop if needed"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+    async def generate(self, texts: List[str]) -> List[List[float]]:
+        """Queue texts for encoding and wait for their embeddings"""
+        if not texts:
+            return []
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        slots = self._slots
+        while True:
+            # Wait for a free encode slot first, so requests batch up meanwhile
+            await slots.acquire()
+            batch: List[Tuple[List[str], asyncio.Future]] = []
+            try:
+                batch.append(await self._queue.get())
+                batch_size = len(batch[0][0])
+                deadline = loop.time() + self.max_wait
+
+                # Keep collecting until the batch is full or the wait window closes
+                while batch_size < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    batch.append(item)
+                    batch_size += len(item[0])
+            except asyncio.CancelledError:
+                slots.release()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Embedding batcher closed"))
+                raise
+
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(lambda done: (self._flushes.discard(done), slots.release()))
+
+    async def _flush(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        logger.debug(f"Encoding batch of {len(texts)} texts from {len(batch)} requests")
+
+        try:
+            embeddings = await self.embedding_generator.agenerate(texts)
+        except Exception as e:
+            logger.error(f"Error encoding embedding batch: {str(e)}", exc_info=True)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for request_texts, future in batch:
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pending batcher requests plus the generator's encode measurements"""
+        return {
+            "pending_requests": self._queue.qsize() if self._queue is not None else 0,
+            "encoding_batches": len(self._flushes),
+            **self.embedding_generator.stats()
+        }
+
+    async def close(self):
+        """Stop the worker, let batches being encoded finish and fail any requests still waiting"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher closed"))
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional
+from embeddings.remote import EmbeddingClient, EmbeddingServerError
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+ExecutionBackend = Literal["inline", "thread", "process", "remote"]
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Model owned by a process-pool worker (loaded once per worker by the initializer)
+_worker_model: Optional["SentenceTransformer"] = None
+
+
+def _load_model(model_name: str) -> "SentenceTransformer":
+    # Imported on first use: torch dominates the API's import time
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _init_worker(model_name: str):
+    global _worker_model
+    _worker_model = _load_model(model_name)
+
+
+def _encode_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_model.encode(texts).tolist()
+
+
+class EmbeddingGenerator:
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        backend: ExecutionBackend = "inline",
+        max_workers: int = 1,
+        socket_path: str = "./embeddings.sock"
+    ):
+        if backend not in ("inline", "thread", "process", "remote"):
+            raise ValueError(f"Unknown embedding backend: {backend}")
+
+        # The remote backend verifies model_name against the server, or adopts the server's
+        self._model_name = model_name if backend == "remote" else model_name or DEFAULT_MODEL_NAME
+        self._dimension: Optional[int] = None
+        self.backend = backend
+        self.max_workers = max_workers
+        self.model: Optional["SentenceTransformer"] = None
+        self._executor: Optional[Executor] = None
+        self._client: Optional[EmbeddingClient] = None
+
+        if backend == "remote":
+            # The shared embedding server (embeddings/server.py) owns the model
+            self._client = EmbeddingClient(socket_path, model_name)
+        elif backend == "process":
+            # Workers own the model, so the API process does not load a copy
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(self._model_name,)
+            )
+        else:
+            self.model = _load_model(self._model_name)
+            if backend == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="embedding"
+                )
+
+        # Encode measurements
+        self.in_flight = 0
+        self.encode_count = 0
+        self.encode_seconds = 0.0
+        self.encoded_texts = 0
+
+    @property
+    def model_name(self) -> Optional[str]:
+        """Model the vectors come from; for the remote backend the server's, once it has said hello"""
+        return self._client.model_name if self._client is not None else self._model_name
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Vector size, known after the first encode (or the server's hello)"""
+        return self._client.dimension if self._client is not None else self._dimension
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts).tolist()
+
+    @property
+    def queue_depth(self) -> int:
+        """Encode calls waiting for a free worker, not counting those being encoded"""
+        if self.backend in ("thread", "process"):
+            return max(0, self.in_flight - self.max_workers)
+        # Inline calls run as they arrive; the embedding server batches remote ones
+        return 0
+
+    def _record(self, texts: List[str], embeddings: List[List[float]], elapsed: float):
+        self._dimension = len(embeddings[0]) if embeddings else self._dimension
+        self.encode_count += 1
+        self.encode_seconds += elapsed
+        self.encoded_texts += len(texts)
+        logger.debug(
+            f"Encoded {len(texts)} texts in {elapsed * 1000:.1f}ms "
+            f"({self.backend} backend, queue depth {self.queue_depth})"
+        )
+
+    def generate(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts synchronously on the calling thread"""
+        if not texts:
+            return []
+
+        start = time.perf_counter()
+        if self.backend == "process":
+            embeddings = self._executor.submit(_encode_in_worker, texts).result()
+        elif self.backend == "remote":
+            embeddings = self._client.generate(texts)
+        else:
+            embeddings = self._encode(texts)
+        self._record(texts, embeddings, time.perf_counter() - start)
+        return embeddings
+
+    async def agenerate(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts without blocking the event loop"""
+        if not texts:
+            return []
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if self.backend == "inline":
+                embeddings = self._encode(texts)
+            elif self.backend == "remote":
+                embeddings = await self._client.agenerate(texts)
+            else:
+                func = _encode_in_worker if self.backend == "process" else self._encode
+                loop = asyncio.get_running_loop()
+                embeddings = await loop.run_in_executor(self._executor, func, texts)
+        finally:
+            self.in_flight -= 1
+
+        self._record(texts, embeddings, time.perf_counter() - start)
+        return embeddings
+
+    async def warm_up(self, server_timeout_seconds: float = 30):
+        """Run one encode per worker so the first real request does not pay for lazy init"""
+        if self.backend == "remote":
+            # The server may still be loading its model; wait for it rather than fail startup.
+            # A server running another model raises EmbeddingModelMismatchError right away.
+            deadline = time.monotonic() + server_timeout_seconds
+            while True:
+                try:
+                    await self.agenerate(["warm up"])
+                    logger.info(f"Embedding server runs {self.model_name} ({self.dimension} dimensions)")
+                    return
+                except EmbeddingServerError:
+                    if time.monotonic() >= deadline:
+                        raise
+                    await asyncio.sleep(0.5)
+        workers = self.max_workers if self.backend == "process" else 1
+        await asyncio.gather(*(self.agenerate(["warm up"]) for _ in range(workers)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and cumulative encode timings"""
+        return {
+            "backend": self.backend,
+            "model": self.model_name,
+            "dimension": self.dimension,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "encode_count": self.encode_count,
+            "encoded_texts": self.encoded_texts,
+            "encode_seconds": round(self.encode_seconds, 4),
+            "avg_encode_ms": round(
+                self.encode_seconds / self.encode_count * 1000, 2
+            ) if self.encode_count else 0.0
+        }
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,242 @@
+"""Client and wire format for the shared embedding server (embeddings/server.py)
+
+Frames on the Unix socket, all integers big-endian:
+
+hello:    payload_len u32 | UTF-8 JSON {"model": name, "dimension": dim, "models": {name: dim, ...}}
+request:  request_id u32 | payload_len u32 | model_len u32 | UTF-8 model
+          | count u32 | count x text_len u32 | UTF-8 texts
+response: request_id u32 | status u8 | payload_len u32 | payload
+          status 0: count u32 | dim u32 | count x dim float32 (little-endian)
+          status 1: UTF-8 error message
+
+The server sends hello once on every new connection, before any response,
+so a client knows which models it can ask for before it sends texts.
+"model" is the server's default, used for requests with an empty model,
+and "models" lists every model it serves with its vector dimension.
+Requests are multiplexed by request_id, so one connection per process
+carries every concurrent encode call.
+"""
+import asyncio
+import itertools
+import json
+import socket
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+REQUEST_HEADER = struct.Struct("!II")
+RESPONSE_HEADER = struct.Struct("!IBI")
+U32 = struct.Struct("!I")
+MATRIX_HEADER = struct.Struct("!II")
+STATUS_OK, STATUS_ERROR = 0, 1
+VECTOR_DTYPE = np.dtype("<f4")
+
+# Frames larger than this are rejected rather than buffered
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class EmbeddingServerError(RuntimeError):
+    """The embedding server could not be reached or failed a request"""
+
+
+class EmbeddingModelMismatchError(RuntimeError):
+    """The embedding server runs a different model (or dimension) than the client expects"""
+
+
+def encode_texts(texts: List[str]) -> bytes:
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = struct.pack(f"!{len(encoded) + 1}I", len(encoded), *map(len, encoded))
+    return lengths + b"".join(encoded)
+
+
+def decode_texts(payload: bytes) -> List[str]:
+    (count,) = U32.unpack_from(payload)
+    lengths = struct.unpack_from(f"!{count}I", payload, U32.size)
+    offset = U32.size * (count + 1)
+    texts = []
+    for length in lengths:
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    return texts
+
+
+def encode_vectors(embeddings: np.ndarray) -> bytes:
+    embeddings = np.ascontiguousarray(embeddings, dtype=VECTOR_DTYPE)
+    count, dim = embeddings.shape if embeddings.size else (len(embeddings), 0)
+    return MATRIX_HEADER.pack(count, dim) + embeddings.tobytes()
+
+
+def decode_vectors(payload: bytes) -> List[List[float]]:
+    count, dim = MATRIX_HEADER.unpack_from(payload)
+    matrix = np.frombuffer(payload, dtype=VECTOR_DTYPE, count=count * dim, offset=MATRIX_HEADER.size)
+    return matrix.reshape(count, dim).tolist()
+
+
+def hello_frame(model_name: str, models: Dict[str, int]) -> bytes:
+    """Hello announcing the default model_name and the dimension of every served model"""
+    hello = {"model": model_name, "dimension": models[model_name], "models": models}
+    payload = json.dumps(hello).encode("utf-8")
+    return U32.pack(len(payload)) + payload
+
+
+def request_frame(request_id: int, texts: List[str], model_name: str = "") -> bytes:
+    model = model_name.encode("utf-8")
+    payload = U32.pack(len(model)) + model + encode_texts(texts)
+    return REQUEST_HEADER.pack(request_id, len(payload)) + payload
+
+
+def decode_request(payload: bytes) -> Tuple[str, List[str]]:
+    """The requested model ("" for the server's default) and the texts to encode"""
+    (length,) = U32.unpack_from(payload)
+    return payload[U32.size:U32.size + length].decode("utf-8"), decode_texts(payload[U32.size + length:])
+
+
+def response_frame(request_id: int, status: int, payload: bytes) -> bytes:
+    return RESPONSE_HEADER.pack(request_id, status, len(payload)) + payload
+
+
+def _read_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EmbeddingServerError("Embedding server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class EmbeddingClient:
+    """Talks to the embedding server over a Unix socket
+
+    The async path keeps one connection per event loop and matches
+    responses to callers by request_id; the sync path opens a short-lived
+    blocking connection per call. Every connection starts with the server's
+    hello: without a model_name the client adopts the first server's
+    default model and its dimension, and from then on (or with one) a server
+    that does not serve that model at that dimension is refused with
+    EmbeddingModelMismatchError. Requests name the model, so clients for
+    different models can share one server.
+    """
+
+    def __init__(self, socket_path: str, model_name: Optional[str] = None, timeout_seconds: float = 60):
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.dimension: Optional[int] = None
+        self.timeout_seconds = timeout_seconds
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    def _check_hello(self, payload: bytes):
+        try:
+            hello: Dict[str, Any] = json.loads(payload)
+            models = {
+                name: int(dimension)
+                for name, dimension in hello.get("models", {hello["model"]: hello["dimension"]}).items()
+            }
+            model_name = self.model_name or hello["model"]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise EmbeddingServerError(f"Invalid hello from the embedding server: {str(e)}")
+        if model_name not in models:
+            raise EmbeddingModelMismatchError(
+                f"Embedding server at {self.socket_path} serves {', '.join(models)}, not {model_name}"
+            )
+        if self.dimension is not None and models[model_name] != self.dimension:
+            raise EmbeddingModelMismatchError(
+                f"Embedding server at {self.socket_path} returns {models[model_name]}-dimensional vectors "
+                f"for {model_name}, expected {self.dimension}"
+            )
+        self.model_name, self.dimension = model_name, models[model_name]
+
+    async def _connection(self) -> asyncio.StreamWriter:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (tests, benchmarks) cannot reuse the old streams
+            self._loop, self._writer, self._reader_task = loop, None, None
+            self._pending = {}
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                try:
+                    reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=MAX_FRAME_BYTES)
+                except OSError as e:
+                    raise EmbeddingServerError(f"Cannot reach embedding server at {self.socket_path}: {str(e)}")
+                try:
+                    (length,) = U32.unpack(await asyncio.wait_for(reader.readexactly(U32.size), self.timeout_seconds))
+                    self._check_hello(await asyncio.wait_for(reader.readexactly(length), self.timeout_seconds))
+                except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError) as e:
+                    writer.close()
+                    raise EmbeddingServerError(f"No hello from the embedding server: {str(e)}")
+                except BaseException:
+                    writer.close()
+                    raise
+                self._writer = writer
+                self._reader_task = asyncio.create_task(self._read_responses(reader, writer))
+        return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        error: BaseException = EmbeddingServerError("Embedding server closed the connection")
+        try:
+            while True:
+                header = await reader.readexactly(RESPONSE_HEADER.size)
+                request_id, status, length = RESPONSE_HEADER.unpack(header)
+                payload = await reader.readexactly(length)
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue  # The caller timed out or was cancelled
+                if status == STATUS_OK:
+                    future.set_result(decode_vectors(payload))
+                else:
+                    future.set_exception(EmbeddingServerError(payload.decode("utf-8", "replace")))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = EmbeddingServerError(f"Embedding server connection lost: {str(e)}")
+        finally:
+            # Fail every call still waiting on this connection; the next call reconnects
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            writer.close()
+
+    async def agenerate(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        writer = await self._connection()
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        writer.write(request_frame(request_id, texts, self.model_name))
+        try:
+            await writer.drain()
+            return await asyncio.wait_for(future, self.timeout_seconds)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def generate(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout_seconds)
+                sock.connect(self.socket_path)
+                (length,) = U32.unpack(_read_exact(sock, U32.size))
+                self._check_hello(_read_exact(sock, length))
+                sock.sendall(request_frame(0, texts, self.model_name))
+                _, status, length = RESPONSE_HEADER.unpack(_read_exact(sock, RESPONSE_HEADER.size))
+                payload = _read_exact(sock, length)
+        except OSError as e:
+            raise EmbeddingServerError(f"Embedding server call failed: {str(e)}")
+        if status != STATUS_OK:
+            raise EmbeddingServerError(payload.decode("utf-8", "replace"))
+        return decode_vectors(payload)
+
+    def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = self._reader_task = None
@@ -0,0 +1,172 @@
+"""Shared embedding server: one process owns the model for every API worker
+
+Usage: python -m embeddings.server [--socket ./embeddings.sock] [--model MODEL] [--extra-model MODEL ...]
+                                   [--max-batch-size 128]
+
+API workers started with EMBEDDING_BACKEND=remote send encode requests
+over the Unix socket (framing in embeddings/remote.py). Requests from all
+connections go through one EmbeddingBatcher, so concurrent calls from
+different workers share encode batches. Each connection opens with the
+model names and vector dimensions, which clients verify or adopt.
+--extra-model loads further models next to the default one, e.g. the
+target of a re-embedding migration, each with its own batcher; requests
+name the model they want.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Set
+import numpy as np
+from embeddings.batcher import EmbeddingBatcher
+from embeddings.generator import DEFAULT_MODEL_NAME, EmbeddingGenerator
+from embeddings.remote import (
+    MAX_FRAME_BYTES,
+    REQUEST_HEADER,
+    STATUS_ERROR,
+    STATUS_OK,
+    decode_request,
+    encode_vectors,
+    hello_frame,
+    response_frame
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _socket_in_use(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+class EmbeddingServer:
+    def __init__(
+        self,
+        socket_path: str,
+        embedding_generator: EmbeddingGenerator,
+        max_batch_size: int = 128,
+        max_wait_ms: float = 5.0,
+        extra_generators: Optional[List[EmbeddingGenerator]] = None
+    ):
+        self.socket_path = socket_path
+        # The default model answers requests that do not name one
+        self.embedding_generator = embedding_generator
+        self.generators: Dict[str, EmbeddingGenerator] = {
+            generator.model_name: generator for generator in [embedding_generator, *(extra_generators or [])]
+        }
+        self.batchers: Dict[str, EmbeddingBatcher] = {
+            model_name: EmbeddingBatcher(generator, max_batch_size, max_wait_ms)
+            for model_name, generator in self.generators.items()
+        }
+        self.connections = 0
+        self.requests = 0
+
+    async def _respond(self, request_id: int, payload: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        try:
+            model_name, texts = decode_request(payload)
+            batcher = self.batchers.get(model_name or self.embedding_generator.model_name)
+            if batcher is None:
+                raise ValueError(f"Model {model_name} is not served here")
+            embeddings = await batcher.generate(texts)
+            frame = response_frame(request_id, STATUS_OK, encode_vectors(np.asarray(embeddings)))
+        except Exception as e:
+            logger.error(f"Encode request {request_id} failed: {str(e)}", exc_info=True)
+            frame = response_frame(request_id, STATUS_ERROR, str(e).encode("utf-8"))
+        async with lock:
+            writer.write(frame)
+            await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+        try:
+            # Tell the client which model it is talking to before it sends anything
+            writer.write(hello_frame(
+                self.embedding_generator.model_name,
+                {model_name: generator.dimension for model_name, generator in self.generators.items()}
+            ))
+            await writer.drain()
+            while True:
+                header = await reader.readexactly(REQUEST_HEADER.size)
+                request_id, length = REQUEST_HEADER.unpack(header)
+                if length > MAX_FRAME_BYTES:
+                    async with lock:
+                        writer.write(response_frame(request_id, STATUS_ERROR, b"Request too large"))
+                        await writer.drain()
+                    break
+                payload = await reader.readexactly(length)
+                self.requests += 1
+                # Answer out of order, so one large request does not hold up the rest
+                task = asyncio.create_task(self._respond(request_id, payload, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self.socket_path):
+            if _socket_in_use(self.socket_path):
+                raise RuntimeError(f"An embedding server is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)  # Left behind by a server that did not shut down cleanly
+
+        start = time.perf_counter()
+        await asyncio.gather(*(generator.warm_up() for generator in self.generators.values()))
+        server = await asyncio.start_unix_server(self._handle, self.socket_path, limit=MAX_FRAME_BYTES)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(
+            f"Embedding server for {', '.join(self.generators)} listening on {self.socket_path} "
+            f"(ready in {time.perf_counter() - start:.1f}s)"
+        )
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for batcher in self.batchers.values():
+                await batcher.close()
+            for generator in self.generators.values():
+                generator.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SOCKET", "./embeddings.sock"))
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument(
+        "--extra-model", action="append", default=[], help="Another model to serve, e.g. a migration target"
+    )
+    parser.add_argument("--max-batch-size", type=int, default=128)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="Batches encoded at once")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    # Encode threads keep the loop free; the batcher runs one batch per thread at most
+    generator = EmbeddingGenerator(args.model, backend="thread", max_workers=args.workers)
+    extra_generators = [
+        EmbeddingGenerator(model_name, backend="thread", max_workers=args.workers)
+        for model_name in args.extra_model if model_name != args.model
+    ]
+    server = EmbeddingServer(args.socket, generator, args.max_batch_size, args.max_wait_ms, extra_generators)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import logging
+from typing import List
+from llm.base import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def group_into_windows(chunks: List[str], window_tokens: int) -> List[str]:
+    """Pack consecutive chunks into windows of at most window_tokens"""
+    windows: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for chunk in chunks:
+        chunk_tokens = estimate_tokens(chunk)
+        if current and current_tokens + chunk_tokens > window_tokens:
+            windows.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += chunk_tokens
+
+    if current:
+        windows.append("\n\n".join(current))
+    return windows
+
+
+def spread_select(items: List[str], count: int) -> List[str]:
+    """Pick count items spread evenly across the list, keeping their order"""
+    if count >= len(items):
+        return items
+    if count <= 1:
+        return items[:1]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+class TokenBudgetExceeded(Exception):
+    pass
+
+
+class TokenBudget:
+    """Caps the estimated prompt + completion tokens spent on one tutorial
+
+    A call reserves its prompt plus the most completion tokens it may
+    produce before it is sent, so concurrent calls cannot overshoot the cap
+    together; the reservation is settled once the completion is known.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.max_tokens - self.used)
+
+    def reserve(self, prompt: str, completion_tokens: int = 0):
+        tokens = estimate_tokens(prompt) + completion_tokens
+        if tokens > self.remaining:
+            raise TokenBudgetExceeded(
+                f"LLM token budget exhausted ({self.used}/{self.max_tokens} used, {tokens} requested)"
+            )
+        self.used += tokens
+
+    def record_completion(self, completion: str, reserved_tokens: int = 0):
+        """Charge the completion in place of the completion tokens reserved for it"""
+        self.used += estimate_tokens(completion) - reserved_tokens
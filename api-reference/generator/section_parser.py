@@ -0,0 +1,96 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalSectionParser:
+    """Incrementally extracts elements of the top-level "sections" array
+
+    Text is fed as it streams from the LLM. Each section object is returned
+    as soon as its closing brace arrives, without waiting for the rest of
+    the response. Braces inside JSON strings are ignored.
+    """
+
+    def __init__(self, key: str = "sections"):
+        self.key = key
+        self.buffer = ""
+        self.pos = 0
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start: Optional[int] = None
+        self.last_string: Optional[str] = None
+        self.item_start: Optional[int] = None
+        self.in_target = False
+        self.sections_found = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume more text and return any sections completed by it"""
+        self.buffer += text
+        completed: List[Dict[str, Any]] = []
+
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self.last_string = self.buffer[self.string_start + 1:self.pos]
+            elif char == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif char in "{[":
+                if char == "[" and self.stack == ["{"] and self.last_string == self.key:
+                    self.in_target = True
+                elif char == "{" and self.in_target and len(self.stack) == 2:
+                    self.item_start = self.pos
+                self.stack.append(char)
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if char == "}" and self.in_target and len(self.stack) == 2 and self.item_start is not None:
+                    section = self._parse_item(self.buffer[self.item_start:self.pos + 1])
+                    if section is not None:
+                        completed.append(section)
+                    self.item_start = None
+                elif char == "]" and self.in_target and len(self.stack) == 1:
+                    self.in_target = False
+
+            self.pos += 1
+
+        self._compact()
+        return completed
+
+    def _parse_item(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            section = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed tutorial section: {str(e)}")
+            return None
+        if not isinstance(section, dict):
+            return None
+        self.sections_found += 1
+        return section
+
+    def _compact(self):
+        """Drop text that no pending section or string still needs"""
+        if self.item_start is not None:
+            keep_from = self.item_start
+        elif self.in_string:
+            keep_from = self.string_start
+        else:
+            keep_from = self.pos
+
+        if keep_from:
+            self.buffer = self.buffer[keep_from:]
+            self.pos -= keep_from
+            if self.item_start is not None:
+                self.item_start -= keep_from
+            if self.string_start is not None:
+                self.string_start -= keep_from
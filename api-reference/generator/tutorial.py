@@ -1,14 +1,30 @@
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from db.vector_store import VectorStore
 from embeddings.generator import EmbeddingGenerator
+from db.document_store import DocumentStore
+from db.tutorial_store import TutorialStore
+from search.semantic_search import SemanticSearch
+from generators.section_parser import IncrementalSectionParser
+from llm.cache import bypass_cache
+from observability.metrics import record_span, span
+from generators.map_reduce import (
+    TokenBudget,
+    TokenBudgetExceeded,
+    estimate_tokens,
+    group_into_windows,
+    spread_select
+)
 from app_types.tutorial import TutorialSectionType
 import uuid
-import json
-import re
+import asyncio
+import logging
+import time
 from typing import Literal
 
+logger = logging.getLogger(__name__)
+
 
 class TutorialSection(BaseModel):
     id: str
@@ -23,6 +39,9 @@ class TutorialMetadata(BaseModel):
     source_url: str
     content_type: Literal["article", "youtube"]
     generated_date: datetime
+    generation_stats: Optional[Dict[str, Any]] = None
+    # Set once the tutorial has been stored
+    tutorial_id: Optional[str] = None
 
 class ProcessedTutorial(BaseModel):
     metadata: TutorialMetadata
@@ -33,16 +52,31 @@ class TutorialGenerator:
         self,
         llm_client,
         vector_store: VectorStore,
-        embedding_generator: EmbeddingGenerator
+        embedding_generator: EmbeddingGenerator,
+        document_store: Optional[DocumentStore] = None,
+        window_tokens: int = 3000,
+        map_concurrency: int = 4,
+        max_total_tokens: int = 60000,
+        summary_tokens: int = 600,
+        semantic_search: Optional[SemanticSearch] = None,
+        tutorial_store: Optional[TutorialStore] = None
     ):
         self.llm = llm_client
         self.vector_store = vector_store
         self.embedding_generator = embedding_generator
+        self.document_store = document_store
+        # Map-reduce settings for content longer than one window
+        self.window_tokens = window_tokens
+        self.map_concurrency = map_concurrency
+        self.max_total_tokens = max_total_tokens
+        self.summary_tokens = summary_tokens
+        self.semantic_search = semantic_search
+        self.tutorial_store = tutorial_store
     
-    async def _generate_tutorial_content(self, content: str, metadata: dict) -> ProcessedTutorial:
-        """Generate tutorial content using LLM"""
+    def _build_prompt(self, content: str) -> str:
+        """Prompt asking the LLM for a sectioned tutorial as JSON"""
         # Updated prompt for structured output
-        prompt = f"""
+        return f"""
         Create a comprehensive tutorial based on the following content. Format your response as a JSON object with specific sections.
         
         Content to process:
@@ -92,68 +126,92 @@ class TutorialGenerator:
         - Include relevant metadata for code and practice sections
         - Keep the content focused and well-structured
         """
-        
-        # Get LLM response
-        tutorial_text = await self.llm.generate(prompt)
-        
-        # Parse the LLM response
+
+    def _build_map_prompt(self, window: str, part: int, total: int) -> str:
+        """Prompt summarizing one window of a long document"""
+        return f"""
+        You are preparing notes for a tutorial. This is part {part} of {total} of a longer piece of content.
+        Summarize this part in at most {self.summary_tokens} tokens of plain text, keeping:
+        - The main concepts and how they connect
+        - Any code samples verbatim, with their language
+        - Concrete steps, facts or examples worth turning into exercises
+
+        Content:
+        {window}
+        """
+
+    def _build_metadata(self, metadata: dict) -> TutorialMetadata:
+        return TutorialMetadata(
+            title=metadata.get("title", "Tutorial"),
+            content_id=metadata.get("id"),
+            source_url=metadata.get("url"),
+            content_type=metadata.get("type"),
+            generated_date=datetime.utcnow()
+        )
+
+    def _build_section(self, section: Dict[str, Any]) -> Optional[TutorialSection]:
         try:
-            # Extract JSON from the response (in case LLM includes additional text)
-            json_match = re.search(r'\{[\s\S]*\}', tutorial_text)
-            if not json_match:
-                raise ValueError("No JSON found in LLM response")
-            
-            tutorial_data = json.loads(json_match.group())
-            
-            # Create ProcessedTutorial object
-            tutorial = ProcessedTutorial(
-                metadata=TutorialMetadata(
-                    title=metadata.get("title", "Tutorial"),
-                    content_id=metadata.get("id"),
-                    source_url=metadata.get("url"),
-                    content_type=metadata.get("type"),
-                    generated_date=datetime.utcnow()
-                ),
-                sections=[
-                    TutorialSection(
-                        id=str(uuid.uuid4()),
-                        type=section["type"],
-                        title=section["title"],
-                        content=section["content"],
-                        metadata=section.get("metadata")
-                    )
-                    for section in tutorial_data["sections"]
-                ]
-            )
-            
-            return tutorial
-            
-        except (json.JSONDecodeError, KeyError) as e:
-            # Fallback to basic structure if parsing fails
-            return ProcessedTutorial(
-                metadata=TutorialMetadata(
-                    title=metadata.get("title", "Tutorial"),
-                    content_id=metadata.get("id"),
-                    source_url=metadata.get("url"),
-                    content_type=metadata.get("type"),
-                    generated_date=datetime.utcnow()
-                ),
-                sections=[
-                    TutorialSection(
-                        id=str(uuid.uuid4()),
-                        type="summary",
-                        title="Overview",
-                        content=tutorial_text[:1000]  # Use first 1000 chars as summary
-                    )
-                ]
+            return TutorialSection(
+                id=str(uuid.uuid4()),
+                type=section["type"],
+                title=section["title"],
+                content=section["content"],
+                metadata=section.get("metadata")
             )
-    
-    async def generate_tutorial(
+        except (KeyError, ValidationError) as e:
+            logger.warning(f"Skipping invalid tutorial section: {str(e)}")
+            return None
+
+    def _fallback_tutorial(self, metadata: dict, tutorial_text: str) -> ProcessedTutorial:
+        """Basic structure used when no sections could be parsed"""
+        return ProcessedTutorial(
+            metadata=self._build_metadata(metadata),
+            sections=[
+                TutorialSection(
+                    id=str(uuid.uuid4()),
+                    type="summary",
+                    title="Overview",
+                    content=tutorial_text[:1000]  # Use first 1000 chars as summary
+                )
+            ]
+        )
+
+    async def _llm_call(
         self,
-        content_id: str,
-        collection_name: str
+        prompt: str,
+        budget: Optional[TokenBudget] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        if budget is not None:
+            budget.reserve(prompt, max_tokens or 0)
+        with span("llm-generate"):
+            text = await self.llm.generate(prompt, max_tokens=max_tokens)
+        if budget is not None:
+            budget.record_completion(text, max_tokens or 0)
+        return text
+
+    async def _generate_tutorial_content(
+        self,
+        content: str,
+        metadata: dict,
+        budget: Optional[TokenBudget] = None
     ) -> ProcessedTutorial:
-        """Generate a tutorial from stored content"""
+        """Generate tutorial content using LLM"""
+        # Get LLM response
+        tutorial_text = await self._llm_call(self._build_prompt(content), budget)
+
+        # Parse the sections out of the response (the LLM may add text around the JSON)
+        parser = IncrementalSectionParser()
+        sections = [
+            section for section in map(self._build_section, parser.feed(tutorial_text))
+            if section is not None
+        ]
+        if not sections:
+            return self._fallback_tutorial(metadata, tutorial_text)
+
+        return ProcessedTutorial(metadata=self._build_metadata(metadata), sections=sections)
+
+    def _load_content(self, content_id: str, collection_name: str) -> Tuple[str, dict]:
         # Get content from vector store
         content_data = self.vector_store.get_by_id(collection_name, content_id)
         
@@ -162,26 +220,218 @@ class TutorialGenerator:
         
         content = content_data["documents"][0]
         metadata = content_data["metadatas"][0]
-        
-        # Generate tutorial
-        tutorial = await self._generate_tutorial_content(content, metadata)
-        
+        if self.document_store is not None:
+            metadata = self.document_store.hydrate([metadata])[0]
+        return content, metadata
+
+    def _load_chunks(self, content_id: str, collection_name: str) -> Tuple[List[str], dict]:
+        """Load every chunk of a document in order, plus its metadata"""
+        stored = self.vector_store.get_collection(collection_name).get(
+            where={"content_id": content_id},
+            include=["documents", "metadatas"]
+        )
+        if not stored or not stored["ids"]:
+            content, metadata = self._load_content(content_id, collection_name)
+            return [content], metadata
+
+        ordered = sorted(
+            zip(stored["ids"], stored["documents"], stored["metadatas"]),
+            key=lambda item: int(item[0].rsplit("_", 1)[1])
+        )
+        metadata = ordered[0][2]
+        if self.document_store is not None:
+            metadata = self.document_store.hydrate([metadata])[0]
+        return [document for _, document, _ in ordered], metadata
+
+    async def _prepare_content(
+        self,
+        content_id: str,
+        collection_name: str
+    ) -> Tuple[str, dict, TokenBudget, Dict[str, Any]]:
+        """Return the text for the final tutorial prompt
+
+        Content that fits in one window is used as-is. Longer content is
+        mapped: windows are summarized concurrently under a semaphore, and
+        the notes are collapsed again until they fit in one window.
+        """
+        stats: Dict[str, Any] = {}
+        start = time.perf_counter()
+        # Chroma and SQLite reads block; a long transcript is a large read
+        chunks, metadata = await asyncio.to_thread(self._load_chunks, content_id, collection_name)
+        stats["load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        budget = TokenBudget(self.max_total_tokens)
+        windows = group_into_windows(chunks, self.window_tokens)
+        stats["chunks"] = len(chunks)
+        stats["windows"] = len(windows)
+        if len(windows) <= 1:
+            return "\n\n".join(chunks), metadata, budget, stats
+
+        # Leave room for the reduce call; sample windows evenly if the rest doesn't fit
+        reduce_reserve = self.window_tokens * 2
+        per_window = self.window_tokens + self.summary_tokens + estimate_tokens(self._build_map_prompt("", 1, 1))
+        affordable = max(1, (self.max_total_tokens - reduce_reserve) // per_window)
+        if affordable < len(windows):
+            logger.warning(
+                f"Token budget covers {affordable} of {len(windows)} windows for {content_id}, sampling evenly"
+            )
+            windows = spread_select(windows, affordable)
+        stats["mapped_windows"] = len(windows)
+
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize(part: int, window: str, total: int) -> Optional[str]:
+            """Notes for one window, or None once the budget cannot cover the call"""
+            async with semaphore:
+                try:
+                    return await self._llm_call(
+                        self._build_map_prompt(window, part, total), budget, self.summary_tokens
+                    )
+                except TokenBudgetExceeded as e:
+                    logger.warning(f"Skipped part {part} of {total} for {content_id}: {str(e)}")
+                    return None
+
+        start = time.perf_counter()
+        mapped = await asyncio.gather(
+            *(summarize(i + 1, window, len(windows)) for i, window in enumerate(windows))
+        )
+        notes = [note for note in mapped if note is not None]
+        if not notes:
+            raise TokenBudgetExceeded(f"LLM token budget too small to summarize any part of {content_id}")
+        stats["map_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        stats["skipped_windows"] = len(mapped) - len(notes)
+
+        # Collapse the notes until they fit in a single reduce prompt
+        start = time.perf_counter()
+        while estimate_tokens("\n\n".join(notes)) > self.window_tokens and len(notes) > 1:
+            groups = group_into_windows(notes, self.window_tokens)
+            if len(groups) >= len(notes):
+                break
+            collapsed = await asyncio.gather(
+                *(summarize(i + 1, group, len(groups)) for i, group in enumerate(groups))
+            )
+            # A group the budget could not cover keeps its uncollapsed notes
+            notes = [note if note is not None else group for note, group in zip(collapsed, groups)]
+            if any(note is None for note in collapsed):
+                # Reduce over the notes we already have rather than failing
+                logger.warning(f"Stopped collapsing notes for {content_id}: token budget exhausted")
+                break
+        stats["collapse_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        content = "\n\n".join(f"Notes for part {i + 1}:\n{note}" for i, note in enumerate(notes))
+        return content, metadata, budget, stats
+
+    async def _store_tutorial(self, tutorial: ProcessedTutorial) -> str:
+        """Embed and persist a finished tutorial, returning its ID"""
         # Generate embedding for the entire tutorial
         tutorial_text = f"{tutorial.metadata.title} " + " ".join(
             f"{section.title} {section.content}" for section in tutorial.sections
         )
-        tutorial_embedding = self.embedding_generator.generate([tutorial_text])[0]
+        tutorial_embedding = (await self.embedding_generator.agenerate([tutorial_text]))[0]
         
         # Store tutorial using the new schema
         tutorial_id = str(uuid.uuid4())
-        self.vector_store.add_tutorial(
+        tutorial.metadata.tutorial_id = tutorial_id
+        # A blocking Chroma write, like every other store call
+        await asyncio.to_thread(
+            self.vector_store.add_tutorial,
             tutorial_id=tutorial_id,
             tutorial_data=tutorial.dict(),
             embeddings=tutorial_embedding
         )
+        generation = None
+        if self.document_store is not None:
+            # Tutorials have no document row, so their write generation is bumped here
+            generation = await asyncio.to_thread(self.document_store.bump_generation, "tutorial")
+        if self.semantic_search is not None:
+            try:
+                # Through search, so the related-content index and routed collections see it too
+                await asyncio.to_thread(
+                    self.semantic_search.update_index, "tutorial", [tutorial_id], [tutorial_embedding],
+                    generation=generation
+                )
+            except Exception as e:
+                # The tutorial is stored either way; only the in-process indexes miss this write
+                logger.error(f"Error indexing tutorial {tutorial_id}: {str(e)}", exc_info=True)
+        if self.tutorial_store is not None:
+            # The whole tutorial, so it can be served later without regenerating
+            await asyncio.to_thread(
+                self.tutorial_store.put,
+                tutorial_id,
+                tutorial.metadata.content_id,
+                tutorial.model_dump_json().encode("utf-8")
+            )
+        return tutorial_id
+
+    async def generate_tutorial(
+        self,
+        content_id: str,
+        collection_name: str,
+        force_regenerate: bool = False
+    ) -> ProcessedTutorial:
+        """Generate a tutorial from all of the stored content"""
+        # force_regenerate skips cached LLM responses for every call below
+        with bypass_cache(force_regenerate):
+            content, metadata, budget, stats = await self._prepare_content(content_id, collection_name)
+
+            # Generate tutorial
+            start = time.perf_counter()
+            tutorial = await self._generate_tutorial_content(content, metadata, budget)
+        stats["reduce_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        stats["llm_tokens"] = budget.used
+        tutorial.metadata.generation_stats = stats
+        logger.info(f"Generated tutorial for {content_id}: {stats}")
+
+        await self._store_tutorial(tutorial)
         
         return tutorial
 
+    async def stream_tutorial(
+        self,
+        content_id: str,
+        collection_name: str,
+        force_regenerate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Generate a tutorial, yielding each section as soon as it is parsed
+
+        Yields ("section", TutorialSection) events while the LLM streams,
+        then a single ("complete", {"tutorial_id", "tutorial"}) event once the
+        tutorial has been stored.
+        """
+        with bypass_cache(force_regenerate):
+            content, metadata, budget, stats = await self._prepare_content(content_id, collection_name)
+            prompt = self._build_prompt(content)
+            budget.reserve(prompt)
+            llm_stream = self.llm.stream(prompt)
+
+        parser = IncrementalSectionParser()
+        sections: List[TutorialSection] = []
+        received: List[str] = []
+        start = time.perf_counter()
+        async for delta in llm_stream:
+            received.append(delta)
+            for section_data in parser.feed(delta):
+                section = self._build_section(section_data)
+                if section is not None:
+                    sections.append(section)
+                    yield "section", section
+
+        if sections:
+            tutorial = ProcessedTutorial(metadata=self._build_metadata(metadata), sections=sections)
+        else:
+            tutorial = self._fallback_tutorial(metadata, "".join(received))
+            yield "section", tutorial.sections[0]
+
+        budget.record_completion("".join(received))
+        elapsed = time.perf_counter() - start
+        record_span("llm-generate", elapsed)
+        stats["reduce_ms"] = round(elapsed * 1000, 1)
+        stats["llm_tokens"] = budget.used
+        tutorial.metadata.generation_stats = stats
+
+        tutorial_id = await self._store_tutorial(tutorial)
+        yield "complete", {"tutorial_id": tutorial_id, "tutorial": tutorial}
+
     def validate_section_types(self, tutorial: ProcessedTutorial) -> bool:
         """Validate that all section types are valid"""
         valid_types = {'summary', 'key_points', 'code_example', 'practice', 'notes'}
@@ -0,0 +1,521 @@
+"""Bulk ingestion of URL lists and JSONL files of pre-extracted text
+
+Usage: python -m ingestion.bulk INPUT [--content-type article|youtube] [--job-id ID] [--refresh]
+
+INPUT is either a text file with one URL per line, or a .jsonl file whose
+lines are {"url": ...} or {"text": ..., "title": ..., "source_url": ...}
+objects. Re-running the same file resumes the import where it stopped.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+import requests
+from db.bulk_job_store import COMPLETED, FAILED, SKIPPED, BulkJobStore
+from db.lease import DEFAULT_LEASE_SECONDS, default_owner, held_lease
+from db.document_store import DocumentStore
+from db.vector_store import VectorStore
+from ingestion.dedup import (
+    ChunkEmbeddingCache,
+    build_document_metadata,
+    canonicalize_url,
+    chunk_metadatas,
+    hash_text,
+    stored_chunk_embeddings
+)
+from ingestion.migration import RouteWriter
+from processors.browser_pool import BrowserPool
+from processors.chunking import Chunker
+from processors.content_processor import YOUTUBE_ID_PATTERN, ContentMetadata, ContentProcessor
+from search.semantic_search import SemanticSearch
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = ("article", "youtube")
+TEXT_METADATA_KEYS = ("title", "author", "duration", "published_date", "view_count")
+
+
+def normalize_item(raw: Any, default_content_type: Optional[str] = None) -> Dict[str, Any]:
+    """Validate one bulk item and fill in its content type"""
+    if isinstance(raw, str):
+        raw = {"url": raw}
+    if not isinstance(raw, dict) or not (raw.get("url") or raw.get("text")):
+        raise ValueError("Each item needs a url or a text field")
+
+    item = dict(raw)
+    if item.get("url"):
+        item["url"] = str(item["url"]).strip()
+    content_type = item.get("content_type") or default_content_type
+    if not content_type:
+        url = item.get("url") or item.get("source_url") or ""
+        content_type = "youtube" if YOUTUBE_ID_PATTERN.search(url) else "article"
+    if content_type not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    item["content_type"] = content_type
+    return item
+
+
+def read_items(path: str, default_content_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read a URL list, or a JSONL file when its lines are JSON objects"""
+    items = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                raw = json.loads(line) if line.startswith("{") else line
+                items.append(normalize_item(raw, default_content_type))
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: {str(e)}")
+    return items
+
+
+@dataclass
+class BulkDocument:
+    """One item moving through the fetch -> embed -> store stages"""
+    index: int
+    content_type: str
+    status: str = COMPLETED
+    error: Optional[str] = None
+    content_id: Optional[str] = None
+    canonical_url: Optional[str] = None
+    metadata: Optional[ContentMetadata] = None
+    chunks: List[str] = field(default_factory=list)
+    stored_hashes: List[str] = field(default_factory=list)
+    known: Dict[str, List[float]] = field(default_factory=dict)
+    hashes: List[str] = field(default_factory=list)
+    embeddings: List[List[float]] = field(default_factory=list)
+
+
+class BulkIngestor:
+    """Streams many documents through fetch, embed and store stages at once
+
+    Fetching runs on several workers while earlier documents are embedded and
+    stored. Embedding and Chroma writes are batched across documents, and item
+    outcomes are recorded per store batch, so a job interrupted at any point
+    resumes with only the items that were not yet stored. A job only runs
+    while this process holds its lease in the job store, so several API
+    workers never run the same job.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        document_store: DocumentStore,
+        job_store: BulkJobStore,
+        encode: Callable[[List[str]], Awaitable[List[List[float]]]],
+        model_name: Optional[str] = None,
+        chunk_cache: Optional[ChunkEmbeddingCache] = None,
+        semantic_search: Optional[SemanticSearch] = None,
+        route_writer: Optional[RouteWriter] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        transcript_session: Optional[requests.Session] = None,
+        youtube_api_key: Optional[str] = None,
+        chunker: Optional[Chunker] = None,
+        fetch_workers: int = 8,
+        embed_batch_size: int = 256,
+        store_batch_size: int = 1024,
+        queue_size: int = 64,
+        owner: Optional[str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ):
+        self.vector_store = vector_store
+        self.document_store = document_store
+        self.job_store = job_store
+        self.encode = encode
+        # Model behind encode; keys the shared chunk embedding cache
+        self.model_name = model_name
+        self.chunk_cache = chunk_cache or ChunkEmbeddingCache()
+        self.semantic_search = semantic_search
+        self.route_writer = route_writer
+        self.browser_pool = browser_pool
+        self.http_client = http_client
+        self.transcript_session = transcript_session
+        self.youtube_api_key = youtube_api_key
+        self.chunker = chunker
+        self.fetch_workers = fetch_workers
+        self.embed_batch_size = embed_batch_size
+        self.store_batch_size = store_batch_size
+        self.queue_size = queue_size
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def is_running(self, job_id: str) -> bool:
+        return job_id in self._tasks
+
+    async def claim(self, job_id: str) -> bool:
+        """Take the job's lease; False while another live process holds it"""
+        return await asyncio.to_thread(self.job_store.claim, job_id, self.owner, self.lease_seconds)
+
+    def start(self, job_id: str, retry_failed: bool = False) -> bool:
+        """Run a job created in the job store in the background
+
+        Claim the job first; run() stops if another process holds its lease.
+        Returns False if the job is already running in this process.
+        """
+        if job_id in self._tasks:
+            return False
+        task = asyncio.create_task(self.run(job_id, retry_failed))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda done: self._finished(job_id, done))
+        return True
+
+    def _finished(self, job_id: str, task: asyncio.Task):
+        self._tasks.pop(job_id, None)
+        if not task.cancelled():
+            task.exception()  # Already logged and recorded on the job by run()
+
+    async def close(self):
+        """Stop running jobs; they stay "running" in the store and resume later"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def run(self, job_id: str, retry_failed: bool = False) -> Dict[str, Any]:
+        """Process the job's pending items; raises LeaseHeldError if another process runs it"""
+        async with held_lease(self.job_store, job_id, self.owner, self.lease_seconds):
+            return await self._run(job_id, retry_failed)
+
+    async def _run(self, job_id: str, retry_failed: bool) -> Dict[str, Any]:
+        job = await asyncio.to_thread(self.job_store.get, job_id)
+        if job is None:
+            raise KeyError(f"Unknown bulk job: {job_id}")
+        refresh = job["options"].get("refresh", False)
+        pending = await asyncio.to_thread(self.job_store.pending, job_id, retry_failed)
+        await asyncio.to_thread(self.job_store.set_status, job_id, "running")
+        logger.info(f"Bulk job {job_id}: {len(pending)} of {job['total']} items to process")
+
+        start = time.perf_counter()
+        processor = ContentProcessor(
+            youtube_api_key=self.youtube_api_key,
+            browser_pool=self.browser_pool,
+            http_client=self.http_client,
+            transcript_session=self.transcript_session,
+            chunker=self.chunker
+        )
+        items: asyncio.Queue = asyncio.Queue()
+        for entry in pending:
+            items.put_nowait(entry)
+        fetched: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        try:
+            async with AsyncExitStack() as stack:
+                if any(item.get("url") for _, item in pending):
+                    # Text-only imports only need the splitter, not a browser
+                    await stack.enter_async_context(processor)
+
+                embedder = asyncio.create_task(self._embed_stage(fetched, embedded))
+                storer = asyncio.create_task(self._store_stage(job_id, embedded))
+                fetchers = [
+                    asyncio.create_task(self._fetch_worker(processor, items, fetched, refresh))
+                    for _ in range(min(self.fetch_workers, max(1, len(pending))))
+                ]
+                try:
+                    await asyncio.gather(*fetchers)
+                    await fetched.put(None)
+                    await embedder
+                    await storer
+                except BaseException:
+                    for task in (*fetchers, embedder, storer):
+                        task.cancel()
+                    raise
+        except asyncio.CancelledError:
+            logger.info(f"Bulk job {job_id} interrupted; it resumes from the pending items")
+            raise
+        except Exception as e:
+            logger.error(f"Bulk job {job_id} failed: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self.job_store.set_status, job_id, "failed", str(e))
+            raise
+
+        await asyncio.to_thread(self.job_store.set_status, job_id, "completed")
+        progress = await asyncio.to_thread(self.job_store.get, job_id)
+        logger.info(f"Bulk job {job_id} finished in {time.perf_counter() - start:.1f}s: {progress['items']}")
+        return progress
+
+    async def _fetch_worker(
+        self,
+        processor: ContentProcessor,
+        items: asyncio.Queue,
+        fetched: asyncio.Queue,
+        refresh: bool
+    ):
+        while True:
+            try:
+                index, item = items.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            document = BulkDocument(index=index, content_type=item["content_type"])
+            try:
+                await self._fetch(processor, item, document, refresh)
+            except Exception as e:
+                logger.warning(f"Bulk item {index} failed: {str(e)}")
+                document.status, document.error = FAILED, str(e)
+            await fetched.put(document)
+
+    async def _fetch(self, processor: ContentProcessor, item: Dict[str, Any], document: BulkDocument, refresh: bool):
+        content_type = item["content_type"]
+        if item.get("url"):
+            source_url = item["url"]
+            document.canonical_url = canonicalize_url(source_url, content_type)
+        else:
+            # Pre-extracted text is keyed by its source URL, or by its hash without one
+            source_url = item.get("source_url") or f"text:{hash_text(item['text'])}"
+            document.canonical_url = (
+                canonicalize_url(source_url, content_type) if item.get("source_url") else source_url
+            )
+
+        existing_id = await asyncio.to_thread(
+            self.document_store.find_by_url, content_type, document.canonical_url, source_url
+        )
+        if existing_id and not refresh:
+            document.status, document.content_id = SKIPPED, existing_id
+            return
+
+        if item.get("url"):
+            document.metadata, document.chunks = await processor.process_content(source_url, content_type)
+        else:
+            document.metadata = ContentMetadata(
+                source_url=source_url,
+                content_type=content_type,
+                **{key: item[key] for key in TEXT_METADATA_KEYS if item.get(key) is not None}
+            )
+            document.chunks = processor.chunk_text(item["text"])
+            if not document.chunks:
+                raise ValueError("Item text is empty")
+
+        if existing_id:
+            document.content_id = existing_id
+            collection = self.vector_store.get_collection(content_type)
+            document.stored_hashes, document.known = await asyncio.to_thread(
+                stored_chunk_embeddings, collection, existing_id
+            )
+
+    async def _drain(self, queue: asyncio.Queue, batch_chunks: int) -> Tuple[List[BulkDocument], bool]:
+        """Wait for one document, then take whatever else is ready up to batch_chunks"""
+        documents: List[BulkDocument] = []
+        chunks = 0
+        done = False
+        document = await queue.get()
+        while True:
+            if document is None:
+                done = True
+                break
+            documents.append(document)
+            chunks += len(document.chunks)
+            if chunks >= batch_chunks or queue.empty():
+                break
+            document = queue.get_nowait()
+        return documents, done
+
+    async def _embed_stage(self, fetched: asyncio.Queue, embedded: asyncio.Queue):
+        while True:
+            documents, done = await self._drain(fetched, self.embed_batch_size)
+            to_embed = [document for document in documents if document.status == COMPLETED]
+            if to_embed:
+                # One encode call for the chunks of every document in the batch
+                chunks = [chunk for document in to_embed for chunk in document.chunks]
+                known = {key: value for document in to_embed for key, value in document.known.items()}
+                embeddings, hashes, encoded = await self.chunk_cache.embed(
+                    chunks, self.encode, known, self.model_name
+                )
+                offset = 0
+                for document in to_embed:
+                    end = offset + len(document.chunks)
+                    document.embeddings, document.hashes = embeddings[offset:end], hashes[offset:end]
+                    offset = end
+                logger.debug(f"Embedded {len(chunks)} chunks from {len(to_embed)} documents ({encoded} encoded)")
+            for document in documents:
+                await embedded.put(document)
+            if done:
+                await embedded.put(None)
+                return
+
+    async def _store_stage(self, job_id: str, embedded: asyncio.Queue):
+        while True:
+            documents, done = await self._drain(embedded, self.store_batch_size)
+            if documents:
+                written = await asyncio.to_thread(self._store_batch, job_id, documents)
+                if self.route_writer is not None:
+                    await self._write_routes(written)
+                if self.semantic_search is not None:
+                    await self._update_search(written)
+            if done:
+                return
+
+    async def _write_routes(self, written: Dict[str, Dict[str, list]]):
+        """Mirror stored writes into the migration target of switched collections"""
+        for content_type, batch in written.items():
+            try:
+                await self.route_writer.write(
+                    content_type, batch["ids"], batch["documents"], batch["metadatas"], batch["stale"]
+                )
+            except Exception as e:
+                # The migration's next reconcile pass copies what this write missed
+                logger.error(f"Error writing a bulk batch to the target of {content_type}: {str(e)}", exc_info=True)
+
+    async def _update_search(self, written: Dict[str, Dict[str, list]]):
+        """Apply stored writes to the in-process indexes, then drop cached results, on the event loop"""
+        for content_type, batch in written.items():
+            try:
+                await asyncio.to_thread(
+                    self.semantic_search.update_index,
+                    content_type, batch["ids"], batch["embeddings"], batch["stale"], batch["generation"]
+                )
+            except Exception as e:
+                # The chunks are stored either way; only the in-process indexes miss this write
+                logger.error(f"Error indexing a bulk batch in {content_type}: {str(e)}", exc_info=True)
+            self.semantic_search.invalidate_collection(content_type)
+
+    def _store_batch(self, job_id: str, documents: List[BulkDocument]) -> Dict[str, Dict[str, list]]:
+        """Write a batch of documents with one upsert per collection, then record outcomes
+
+        Document rows are written only after their collection's chunks are
+        stored, so a failed write leaves nothing that marks the documents
+        as ingested and a retry processes them again. Returns the ids,
+        documents, embeddings, metadatas and stale ids written to each
+        collection, and the write generation the write bumped it to.
+        """
+        writes: Dict[str, Dict[str, list]] = {}
+
+        for document in documents:
+            if document.status != COMPLETED:
+                continue
+            if document.content_id and document.stored_hashes == document.hashes:
+                continue  # Refreshed but unchanged
+            document.content_id = document.content_id or str(uuid.uuid4())
+            batch = writes.setdefault(document.content_type, {
+                "ids": [], "documents": [], "embeddings": [], "metadatas": [], "stale": [], "rows": [], "members": []
+            })
+            batch["ids"].extend(f"{document.content_id}_{i}" for i in range(len(document.chunks)))
+            batch["documents"].extend(document.chunks)
+            batch["embeddings"].extend(document.embeddings)
+            batch["metadatas"].extend(chunk_metadatas(document.content_id, document.hashes))
+            batch["stale"].extend(
+                f"{document.content_id}_{i}" for i in range(len(document.chunks), len(document.stored_hashes))
+            )
+            batch["rows"].append((
+                document.content_id,
+                document.content_type,
+                build_document_metadata(document.content_id, document.canonical_url, document.hashes, document.metadata)
+            ))
+            batch["members"].append(document)
+
+        written: Dict[str, Dict[str, list]] = {}
+        for content_type, batch in writes.items():
+            try:
+                collection = self.vector_store.get_collection(content_type)
+                # Chroma caps the size of a single write
+                for start in range(0, len(batch["ids"]), self.store_batch_size):
+                    end = start + self.store_batch_size
+                    collection.upsert(**{
+                        key: batch[key][start:end] for key in ("ids", "documents", "embeddings", "metadatas")
+                    })
+                if batch["stale"]:
+                    collection.delete(ids=batch["stale"])
+                # Also bumps the collection's write generation, which API workers watch
+                generation = self.document_store.put_many(batch["rows"])[content_type]
+            except Exception as e:
+                logger.error(f"Bulk job {job_id}: storing a batch in {content_type} failed: {str(e)}", exc_info=True)
+                for document in batch["members"]:
+                    document.status, document.error = FAILED, f"Store failed: {str(e)}"
+                continue
+            written[content_type] = {
+                key: batch[key] for key in ("ids", "documents", "embeddings", "metadatas", "stale")
+            }
+            written[content_type]["generation"] = generation
+
+        self.job_store.record(job_id, [
+            (document.index, document.status, document.content_id, len(document.chunks), document.error)
+            for document in documents
+        ])
+        return written
+
+
+def file_job_id(path: str) -> str:
+    """Stable job id for an input file, so re-running it resumes the same job"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"file-{digest.hexdigest()[:16]}"
+
+
+async def _run_cli(args: argparse.Namespace):
+    from config import settings
+    from services import ServiceContainer
+
+    items = read_items(args.input, args.content_type)
+    job_id = args.job_id or file_job_id(args.input)
+    services = ServiceContainer()
+    needs_browser = any(item.get("url") and item["content_type"] == "article" for item in items)
+    try:
+        if needs_browser:
+            await services.browser_pool.start()
+        # The remote backend only knows its model once the server has said hello
+        await services.embedding_generator.warm_up()
+        ingestor = BulkIngestor(
+            services.vector_store,
+            services.document_store,
+            services.bulk_job_store,
+            services.embedding_generator.agenerate,
+            model_name=services.embedding_generator.model_name,
+            chunk_cache=services.chunk_cache,
+            route_writer=services.route_writer,
+            browser_pool=services.browser_pool if needs_browser else None,
+            http_client=services.http_client,
+            transcript_session=services.transcript_session,
+            youtube_api_key=settings.YOUTUBE_API_KEY,
+            chunker=services.chunker,
+            fetch_workers=args.fetch_workers,
+            embed_batch_size=args.embed_batch_size,
+            store_batch_size=args.store_batch_size
+        )
+        if not services.bulk_job_store.create(job_id, items, {"refresh": args.refresh}):
+            logger.info(f"Resuming bulk job {job_id}")
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(args.progress_interval)
+                progress = await asyncio.to_thread(services.bulk_job_store.get, job_id)
+                logger.info(f"{job_id}: {progress['items']} ({progress['chunks']} chunks)")
+
+        reporter = asyncio.create_task(report_progress())
+        try:
+            progress = await ingestor.run(job_id, retry_failed=args.retry_failed)
+        finally:
+            reporter.cancel()
+        print(json.dumps(progress, indent=2))
+    finally:
+        await services.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="URL list or .jsonl file")
+    parser.add_argument("--content-type", choices=CONTENT_TYPES, help="Default for items without one")
+    parser.add_argument("--job-id", help="Defaults to a hash of the input file")
+    parser.add_argument("--refresh", action="store_true", help="Re-ingest URLs that are already stored")
+    parser.add_argument("--retry-failed", action="store_true", help="Also retry items that failed before")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--embed-batch-size", type=int, default=256)
+    parser.add_argument("--store-batch-size", type=int, default=1024)
+    parser.add_argument("--progress-interval", type=float, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    main()
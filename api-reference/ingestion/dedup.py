@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import numpy as np
+from processors.content_processor import ContentMetadata, extract_video_id
+from search.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid",
+    "igshid", "_hsenc", "_hsmi", "ref_src", "yclid"
+}
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str, content_type: str) -> str:
+    """Normalize a URL so the same document always maps to the same key"""
+    if content_type == "youtube":
+        # youtu.be, /embed, /shorts and watch URLs with extra params all collapse to one form
+        return f"https://www.youtube.com/watch?v={extract_video_id(url)}"
+
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = urlencode(sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ))
+    return urlunsplit((scheme, host, path or "/", query, ""))
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def build_document_metadata(
+    content_id: str,
+    canonical_url: str,
+    chunk_hashes: List[str],
+    metadata: ContentMetadata
+) -> Dict[str, Any]:
+    """Document-level metadata stored once per content_id in the DocumentStore"""
+    return {
+        "content_id": content_id,
+        "canonical_url": canonical_url,
+        "content_hash": hash_text("".join(chunk_hashes)),
+        "title": metadata.title or "",
+        "author": metadata.author or "Unknown",
+        "source_url": str(metadata.source_url),
+        "content_type": metadata.content_type,
+        "duration": metadata.duration or "",
+        "published_date": metadata.published_date or "",
+        "view_count": metadata.view_count or 0
+    }
+
+
+def chunk_metadatas(content_id: str, chunk_hashes: List[str]) -> List[Dict[str, Any]]:
+    """Slim per-chunk metadata referencing the document"""
+    return [
+        {"content_id": content_id, "chunk_index": i, "chunk_hash": chunk_hash}
+        for i, chunk_hash in enumerate(chunk_hashes)
+    ]
+
+
+def stored_chunk_embeddings(collection, content_id: str) -> Tuple[List[str], Dict[str, List[float]]]:
+    """Return the stored chunk hashes in chunk order and a hash -> embedding map"""
+    stored = collection.get(
+        where={"content_id": content_id},
+        include=["embeddings", "metadatas"]
+    )
+    if not stored or not stored["ids"]:
+        return [], {}
+
+    ordered = sorted(
+        zip(stored["ids"], stored["metadatas"], stored["embeddings"]),
+        key=lambda item: int(item[0].rsplit("_", 1)[1])
+    )
+    hashes = [metadata.get("chunk_hash", "") for _, metadata, _ in ordered]
+    embeddings = {
+        metadata["chunk_hash"]: list(embedding)
+        for _, metadata, embedding in ordered
+        if metadata.get("chunk_hash")
+    }
+    return hashes, embeddings
+
+
+class ChunkEmbeddingCache:
+    """Reuses embeddings for chunks whose text hash has been seen before
+
+    Entries are keyed by (model name, text hash), so a vector is only reused
+    for the model that produced it. They are float32 arrays: as lists of
+    Python floats a 384-dimension embedding takes about 12 KB, as an array 1.5 KB.
+    """
+
+    def __init__(self, max_size: int = 50_000, ttl_seconds: Optional[float] = None):
+        self.cache = TTLCache(max_size, ttl_seconds)
+
+    async def embed(
+        self,
+        chunks: List[str],
+        encode: Callable[[List[str]], Awaitable[List[List[float]]]],
+        known: Optional[Dict[str, List[float]]] = None,
+        model_name: Optional[str] = None
+    ) -> Tuple[List[List[float]], List[str], int]:
+        """Embed chunks, encoding only those not found in known or the cache
+
+        model_name is the model encode runs; without one the cache is
+        bypassed, since its entries could not be told apart from another
+        model's. Returns the embeddings, the chunk hashes and how many chunks
+        were encoded.
+        """
+        hashes = [hash_text(chunk) for chunk in chunks]
+        embeddings: List[Optional[List[float]]] = []
+        missing: Dict[str, str] = {}
+
+        for chunk, chunk_hash in zip(chunks, hashes):
+            embedding = (known or {}).get(chunk_hash)
+            if embedding is None and model_name is not None:
+                cached = self.cache.get((model_name, chunk_hash))
+                embedding = cached.tolist() if cached is not None else None
+            if embedding is None:
+                missing.setdefault(chunk_hash, chunk)
+            embeddings.append(embedding)
+
+        if missing:
+            encoded = await encode(list(missing.values()))
+            if model_name is not None:
+                for chunk_hash, embedding in zip(missing.keys(), encoded):
+                    self.cache.set((model_name, chunk_hash), np.asarray(embedding, dtype=np.float32))
+            lookup = dict(zip(missing.keys(), encoded))
+            embeddings = [
+                embedding if embedding is not None else lookup[chunk_hash]
+                for embedding, chunk_hash in zip(embeddings, hashes)
+            ]
+
+        logger.debug(f"Encoded {len(missing)} of {len(chunks)} chunks, reused the rest")
+        return embeddings, hashes, len(missing)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,387 @@
+"""Re-embed a collection into a shadow collection, then switch reads over to it
+
+Usage: python -m ingestion.migration COLLECTION --model MODEL [--chunks-per-second N] [--cpu-fraction F]
+
+Every chunk is read back from the source collection and encoded again with
+the new model, under a throughput and CPU budget, into a target collection
+that search does not read yet. Progress is checkpointed per batch, so an
+interrupted migration resumes where it stopped. Reconcile passes then copy
+whatever ingestion changed in the source meanwhile; once a pass finds
+(almost) nothing left to do, the collection's route is switched and search
+reads the target. From then on ingestion writes both collections through
+a RouteWriter, and the migration keeps following the source as a backstop
+for writes that missed the target.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from db.lease import DEFAULT_LEASE_SECONDS, default_owner, held_lease
+from db.migration_store import CATCH_UP, COPY, FAILED, FOLLOW, RUNNING, SWITCHED, MigrationStore
+from db.vector_store import VectorStore
+from embeddings.generator import EmbeddingGenerator
+from llm.manager import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Chroma collection names: 3-63 characters, alphanumeric at both ends
+MAX_COLLECTION_NAME = 63
+
+
+def target_collection_name(source: str, model_name: str) -> str:
+    """Shadow collection for source re-embedded with model_name"""
+    slug = re.sub(r"[^a-z0-9]+", "-", model_name.lower()).strip("-")
+    return f"{source}--{slug}"[:MAX_COLLECTION_NAME].rstrip("-_.")
+
+
+class Throttle:
+    """Keeps a background job within a throughput and CPU budget
+
+    admit() holds a batch back until the chunks-per-second budget allows it
+    (0 disables the limit). pace() sleeps after each encode so the encoder is
+    busy at most cpu_fraction of the time.
+    """
+
+    def __init__(self, chunks_per_second: float = 0, cpu_fraction: float = 1.0):
+        if not 0 < cpu_fraction <= 1:
+            raise ValueError("cpu_fraction must be in (0, 1]")
+        self.chunks = TokenBucket(chunks_per_second * 60)
+        self.cpu_fraction = cpu_fraction
+        self.throttled_seconds = 0.0
+
+    async def admit(self, count: int):
+        start = time.perf_counter()
+        await self.chunks.acquire(count)
+        self.throttled_seconds += time.perf_counter() - start
+
+    async def pace(self, busy_seconds: float):
+        if self.cpu_fraction < 1:
+            idle = busy_seconds * (1 / self.cpu_fraction - 1)
+            self.throttled_seconds += idle
+            await asyncio.sleep(idle)
+
+
+class RouteWriter:
+    """Mirrors ingestion writes into the target of every switched collection
+
+    Ingestion keeps writing the source collection with the serving model.
+    Once a migration has switched a collection's reads, write() stores the
+    same chunks in the target as well, encoded with the target's model, so
+    search sees them without waiting for the migration's next reconcile
+    pass. Routes are read from the MigrationStore on every write, so a
+    switch made by another process applies immediately.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        migration_store: MigrationStore,
+        embedding_generator_for: Callable[[str], EmbeddingGenerator],
+        batch_size: int = 1024
+    ):
+        self.vector_store = vector_store
+        self.migration_store = migration_store
+        self.embedding_generator_for = embedding_generator_for
+        self.batch_size = batch_size
+
+    async def write(
+        self,
+        collection: str,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        stale_ids: Sequence[str] = ()
+    ) -> Optional[str]:
+        """Write chunks just stored in collection to its migration target; returns the target, if any"""
+        route = (await asyncio.to_thread(self.migration_store.routes)).get(collection)
+        if route is None:
+            return None
+        target_name, model_name = route
+        embedding_generator = await asyncio.to_thread(self.embedding_generator_for, model_name)
+        target = await asyncio.to_thread(self.vector_store.get_collection, target_name)
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            embeddings = await embedding_generator.agenerate(list(documents[start:end]))
+            await asyncio.to_thread(
+                target.upsert,
+                ids=list(ids[start:end]),
+                documents=list(documents[start:end]),
+                metadatas=list(metadatas[start:end]),
+                embeddings=embeddings
+            )
+        if stale_ids:
+            await asyncio.to_thread(target.delete, ids=list(stale_ids))
+        return target_name
+
+
+class CollectionMigrator:
+    """Runs re-embedding migrations recorded in a MigrationStore
+
+    Chroma reads and writes run in worker threads and encodes go through the
+    target model's EmbeddingGenerator; on_switch is awaited on the event loop
+    with (collection, target, model_name) when a migration switches its route.
+    A migration only runs while this process holds its lease in the store.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        migration_store: MigrationStore,
+        embedding_generator_for: Callable[[str], EmbeddingGenerator],
+        on_switch: Optional[Callable[[str, str, str], Awaitable[Any]]] = None,
+        follow_seconds: float = 300,
+        owner: Optional[str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ):
+        self.vector_store = vector_store
+        self.migration_store = migration_store
+        self.embedding_generator_for = embedding_generator_for
+        self.on_switch = on_switch
+        self.follow_seconds = follow_seconds
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def is_running(self, migration_id: str) -> bool:
+        return migration_id in self._tasks
+
+    async def claim(self, migration_id: str) -> bool:
+        """Take the migration's lease; False while another live process holds it"""
+        return await asyncio.to_thread(self.migration_store.claim, migration_id, self.owner, self.lease_seconds)
+
+    def start(self, migration_id: str) -> bool:
+        """Run a migration created in the store in the background
+
+        Claim it first; run() stops if another process holds its lease.
+        Returns False if it is already running in this process.
+        """
+        if migration_id in self._tasks:
+            return False
+        task = asyncio.create_task(self.run(migration_id))
+        self._tasks[migration_id] = task
+        task.add_done_callback(lambda done: self._finished(migration_id, done))
+        return True
+
+    def _finished(self, migration_id: str, task: asyncio.Task):
+        self._tasks.pop(migration_id, None)
+        if not task.cancelled():
+            task.exception()  # Already logged and recorded on the migration by run()
+
+    async def close(self):
+        """Stop running migrations; they resume from their checkpoint later"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def run(self, migration_id: str, follow: bool = True) -> Dict[str, Any]:
+        """Copy, catch up, switch and (with follow) keep following; raises LeaseHeldError if running elsewhere"""
+        async with held_lease(self.migration_store, migration_id, self.owner, self.lease_seconds):
+            return await self._run(migration_id, follow)
+
+    async def _run(self, migration_id: str, follow: bool) -> Dict[str, Any]:
+        migration = await asyncio.to_thread(self.migration_store.get, migration_id)
+        if migration is None:
+            raise KeyError(f"Unknown migration: {migration_id}")
+        options = migration["options"]
+        # A failed migration resumes from its last checkpoint
+        status = SWITCHED if migration["phase"] == FOLLOW else RUNNING
+        await asyncio.to_thread(self.migration_store.set_status, migration_id, status)
+        source = await asyncio.to_thread(self.vector_store.get_collection, migration["source"])
+        target = await asyncio.to_thread(self.vector_store.get_collection, migration["target"])
+        # Loading a new model blocks, so keep it off the event loop
+        embedding_generator = await asyncio.to_thread(self.embedding_generator_for, migration["model_name"])
+        throttle = Throttle(options.get("chunks_per_second", 0), options.get("cpu_fraction", 1.0))
+        batch_size = options.get("batch_size", 128)
+        logger.info(
+            f"Migration {migration_id}: {migration['source']} -> {migration['target']} "
+            f"({migration['model_name']}), {migration['phase']} from offset {migration['cursor']}"
+        )
+
+        async def reembed(ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+            await throttle.admit(len(ids))
+            start = time.perf_counter()
+            embeddings = await embedding_generator.agenerate(documents)
+            await throttle.pace(time.perf_counter() - start)
+            await asyncio.to_thread(
+                target.upsert, ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings
+            )
+
+        try:
+            phase, cursor = migration["phase"], migration["cursor"]
+            passes, pass_changes = migration["passes"], migration["pass_changes"]
+            if phase == COPY:
+                while True:
+                    page = await asyncio.to_thread(
+                        source.get, include=["documents", "metadatas"], limit=batch_size, offset=cursor
+                    )
+                    if not page["ids"]:
+                        break
+                    await reembed(page["ids"], page["documents"], page["metadatas"])
+                    cursor += len(page["ids"])
+                    await asyncio.to_thread(
+                        self.migration_store.checkpoint,
+                        migration_id, COPY, cursor, passes, pass_changes, len(page["ids"])
+                    )
+                phase, cursor = CATCH_UP, 0
+                await asyncio.to_thread(self.migration_store.checkpoint, migration_id, phase, cursor, 0, 0)
+
+            while True:
+                # One reconcile pass, resumable at cursor like the copy
+                cursor, pass_changes = await self._reconcile(
+                    migration_id, phase, source, target, batch_size, reembed, cursor, passes, pass_changes
+                )
+                passes += 1
+                logger.info(f"Migration {migration_id}: pass {passes} ({phase}) changed {pass_changes} chunks")
+
+                if phase == CATCH_UP and (
+                    pass_changes <= options.get("catch_up_threshold", 0)
+                    or passes >= options.get("max_catch_up_passes", 5)
+                ):
+                    await asyncio.to_thread(self.migration_store.switch, migration_id)
+                    phase = FOLLOW
+                    logger.info(f"Migration {migration_id}: {migration['source']} now reads {migration['target']}")
+                    if self.on_switch is not None:
+                        await self.on_switch(migration["source"], migration["target"], migration["model_name"])
+
+                cursor, pass_changes = 0, 0
+                await asyncio.to_thread(
+                    self.migration_store.checkpoint, migration_id, phase, cursor, passes, pass_changes
+                )
+                if phase == FOLLOW:
+                    if not follow:
+                        break
+                    # Ingestion still writes the source; keep the target in step
+                    await asyncio.sleep(self.follow_seconds)
+                    current = await asyncio.to_thread(self.migration_store.get, migration_id)
+                    if current["status"] != SWITCHED:
+                        break  # Replaced by a newer migration of the same collection
+        except Exception as e:
+            logger.error(f"Migration {migration_id} failed: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self.migration_store.set_status, migration_id, FAILED, str(e))
+            raise
+
+        migration = await asyncio.to_thread(self.migration_store.get, migration_id)
+        migration["throttled_seconds"] = round(throttle.throttled_seconds, 1)
+        return migration
+
+    async def _reconcile(
+        self,
+        migration_id: str,
+        phase: str,
+        source: Any,
+        target: Any,
+        batch_size: int,
+        reembed: Callable,
+        cursor: int,
+        passes: int,
+        pass_changes: int
+    ):
+        """Re-embed source chunks that are missing or changed in the target, then delete extras
+
+        Chunks are compared by metadata, which carries each chunk's hash.
+        The source walk is checkpointed; the cheaper sweep of the target for
+        deleted chunks runs once the walk reaches the end.
+        """
+        while True:
+            page = await asyncio.to_thread(source.get, include=["metadatas"], limit=batch_size, offset=cursor)
+            if not page["ids"]:
+                break
+            stored = await asyncio.to_thread(target.get, ids=page["ids"], include=["metadatas"])
+            current = dict(zip(stored["ids"], stored["metadatas"]))
+            changed = [
+                chunk_id for chunk_id, metadata in zip(page["ids"], page["metadatas"])
+                if chunk_id not in current or current[chunk_id] != metadata
+            ]
+            if changed:
+                changed_page = await asyncio.to_thread(source.get, ids=changed, include=["documents", "metadatas"])
+                await reembed(changed_page["ids"], changed_page["documents"], changed_page["metadatas"])
+            cursor += len(page["ids"])
+            pass_changes += len(changed)
+            await asyncio.to_thread(
+                self.migration_store.checkpoint,
+                migration_id, phase, cursor, passes, pass_changes, len(changed)
+            )
+
+        offset = 0
+        while True:
+            page = await asyncio.to_thread(target.get, include=[], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            present = set((await asyncio.to_thread(source.get, ids=page["ids"], include=[]))["ids"])
+            removed = [chunk_id for chunk_id in page["ids"] if chunk_id not in present]
+            if removed:
+                await asyncio.to_thread(target.delete, ids=removed)
+                pass_changes += len(removed)
+                await asyncio.to_thread(
+                    self.migration_store.checkpoint,
+                    migration_id, phase, cursor, passes, pass_changes, 0, len(removed)
+                )
+            offset += len(page["ids"]) - len(removed)
+        return cursor, pass_changes
+
+
+def create_migration(
+    migration_store: MigrationStore,
+    collection: str,
+    model_name: str,
+    target: Optional[str] = None,
+    migration_id: Optional[str] = None,
+    **options: Any
+) -> str:
+    """Register a migration (a no-op if it exists) and return its id"""
+    target = target or target_collection_name(collection, model_name)
+    if target == collection:
+        raise ValueError("The target collection must differ from the source")
+    migration_id = migration_id or target
+    migration_store.create(migration_id, collection, target, model_name, options)
+    return migration_id
+
+
+async def _run_cli(args: argparse.Namespace):
+    from services import ServiceContainer
+
+    services = ServiceContainer()
+    try:
+        migration_id = create_migration(
+            services.migration_store,
+            args.collection,
+            args.model,
+            target=args.target,
+            batch_size=args.batch_size,
+            chunks_per_second=args.chunks_per_second,
+            cpu_fraction=args.cpu_fraction,
+            catch_up_threshold=args.catch_up_threshold,
+            max_catch_up_passes=args.max_catch_up_passes
+        )
+        migrator = CollectionMigrator(
+            services.vector_store,
+            services.migration_store,
+            services.migration_embedding_generator
+        )
+        # Stop after the switch; the API resumes following the source on its next start
+        print(json.dumps(await migrator.run(migration_id, follow=False), indent=2))
+    finally:
+        await services.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("collection")
+    parser.add_argument("--model", required=True, help="Embedding model for the target collection")
+    parser.add_argument("--target", help="Defaults to COLLECTION--MODEL")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--chunks-per-second", type=float, default=0, help="0 for no limit")
+    parser.add_argument("--cpu-fraction", type=float, default=0.5, help="Share of encoder time to use")
+    parser.add_argument("--catch-up-threshold", type=int, default=0, help="Switch once a pass changes this few chunks")
+    parser.add_argument("--max-catch-up-passes", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    main()
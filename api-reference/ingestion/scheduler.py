@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from observability.metrics import record_span
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+StageHandler = Callable[["IngestionJob"], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept more jobs"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Ingestion queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class IngestionJob:
+    task_id: str
+    url: str
+    content_type: str
+    priority: str = "interactive"
+    # Jobs with the same key are the same work: only one is admitted at a time
+    key: Optional[str] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    stage: Optional[str] = None
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    # Intermediate results handed from one stage to the next
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+class IngestionScheduler:
+    """Runs ingestion jobs through bounded, prioritized pipeline stages
+
+    Each stage has its own priority queue and worker count, so a burst of
+    submissions never runs more fetches, encodes or writes at once than the
+    configured limits. Admission is capped by max_queue_size.
+    """
+
+    def __init__(
+        self,
+        stages: List[Tuple[str, StageHandler, int]],
+        max_queue_size: int = 100,
+        on_stage_start: Optional[Callable[[IngestionJob], Awaitable[None]]] = None,
+        on_complete: Optional[Callable[[IngestionJob], Awaitable[None]]] = None,
+        on_failure: Optional[Callable[[IngestionJob, Exception], Awaitable[None]]] = None
+    ):
+        self.stages = stages
+        self.max_queue_size = max_queue_size
+        self.on_stage_start = on_stage_start
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+
+        self._queues: Dict[str, asyncio.PriorityQueue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        # Admitted jobs that have not completed or failed yet, by task id and by key
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._keys: Dict[str, str] = {}
+
+        # Cumulative latency per stage
+        self._stage_seconds: Dict[str, float] = {name: 0.0 for name, _, _ in stages}
+        self._stage_counts: Dict[str, int] = {name: 0 for name, _, _ in stages}
+        self._job_seconds = 0.0
+        self._jobs_finished = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self.running:
+            return
+        for index, (name, handler, workers) in enumerate(self.stages):
+            self._queues[name] = asyncio.PriorityQueue()
+            next_stage = self.stages[index + 1][0] if index + 1 < len(self.stages) else None
+            for worker_index in range(workers):
+                self._workers.append(asyncio.create_task(
+                    self._worker(name, handler, next_stage),
+                    name=f"ingestion-{name}-{worker_index}"
+                ))
+        logger.info(f"Started ingestion scheduler with stages {[(n, w) for n, _, w in self.stages]}")
+
+    async def stop(self, fail_pending: bool = True):
+        """Stop the workers; jobs still queued or running are reported failed unless fail_pending is False"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        pending = list(self._jobs.values())
+        self._jobs.clear()
+        self._keys.clear()
+        if fail_pending:
+            for job in pending:
+                await self._notify(self.on_failure, job, RuntimeError("Ingestion scheduler stopped"))
+        if pending:
+            logger.warning(f"Stopped ingestion scheduler with {len(pending)} unfinished jobs")
+
+    @property
+    def _active_jobs(self) -> int:
+        return len(self._jobs)
+
+    async def _notify(self, callback: Optional[Callable[..., Awaitable[None]]], *args: Any):
+        """Await a job callback; a failing callback is logged and never stops a worker"""
+        if callback is None:
+            return
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.error(f"Ingestion callback {callback.__name__} failed: {str(e)}", exc_info=True)
+
+    def _retry_after(self) -> int:
+        """Estimate how long until a queue slot frees up"""
+        average_job = self._job_seconds / self._jobs_finished if self._jobs_finished else 5.0
+        first_stage_workers = max(self.stages[0][2], 1)
+        return max(1, math.ceil(average_job / first_stage_workers))
+
+    def submit(self, job: IngestionJob) -> str:
+        """Queue a job at its priority, or raise QueueFullError
+
+        Returns the task id doing the work: that of an admitted job with the
+        same key if there is one (job is then dropped), otherwise job's own.
+        """
+        if not self.running:
+            raise RuntimeError("Ingestion scheduler is not running")
+        if job.key is not None and job.key in self._keys:
+            return self._keys[job.key]
+        if self._active_jobs >= self.max_queue_size:
+            raise QueueFullError(self._retry_after())
+
+        self._jobs[job.task_id] = job
+        if job.key is not None:
+            self._keys[job.key] = job.task_id
+        self._enqueue(self.stages[0][0], job)
+        return job.task_id
+
+    def _enqueue(self, stage: str, job: IngestionJob):
+        priority = PRIORITIES.get(job.priority, PRIORITIES["bulk"])
+        self._queues[stage].put_nowait((priority, next(self._sequence), job))
+
+    async def _worker(self, stage: str, handler: StageHandler, next_stage: Optional[str]):
+        queue = self._queues[stage]
+        while True:
+            _, _, job = await queue.get()
+            job.stage = stage
+            await self._notify(self.on_stage_start, job)
+
+            start = time.perf_counter()
+            failed = False
+            try:
+                await handler(job)
+            except Exception as e:
+                failed = True
+                logger.error(f"Ingestion job {job.task_id} failed in {stage} stage: {str(e)}", exc_info=True)
+                self._finish(job)
+                await self._notify(self.on_failure, job, e)
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                job.stage_timings[stage] = round(elapsed * 1000, 1)
+                record_span(stage, elapsed, error=failed)
+                self._stage_seconds[stage] += elapsed
+                self._stage_counts[stage] += 1
+                queue.task_done()
+
+            if next_stage is not None:
+                self._enqueue(next_stage, job)
+            else:
+                self._finish(job)
+                await self._notify(self.on_complete, job)
+
+    def _finish(self, job: IngestionJob):
+        self._jobs.pop(job.task_id, None)
+        if job.key is not None and self._keys.get(job.key) == job.task_id:
+            del self._keys[job.key]
+        self._jobs_finished += 1
+        self._job_seconds += time.monotonic() - job.submitted_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_jobs": self._active_jobs,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": {name: queue.qsize() for name, queue in self._queues.items()},
+            "avg_stage_latency_ms": {
+                name: round(self._stage_seconds[name] / count * 1000, 1) if count else 0.0
+                for name, count in self._stage_counts.items()
+            }
+        }
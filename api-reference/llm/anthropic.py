@@ -0,0 +1,37 @@
+from typing import AsyncIterator, Optional
+import httpx
+from anthropic import AsyncAnthropic
+from llm.base import LLMClient
+
+
+class AnthropicClient(LLMClient):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-5-sonnet-latest",
+        max_tokens: int = 4096,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_retries: int = 2
+    ):
+        # A shared http_client keeps connections pooled across calls;
+        # max_retries=0 leaves retrying to the LLMClientManager
+        self.client = AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=max_retries)
+        self.model = model
+        self.max_tokens = max_tokens
+
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens or self.max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return "".join(block.text for block in response.content if block.type == "text")
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+# Rough English average for the providers' tokenizers; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class LLMClient(ABC):
+    @abstractmethod
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """Complete prompt; max_tokens overrides the client's completion limit for this call"""
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the completion as text deltas
+
+        Providers that support streaming override this; the default yields
+        the full completion as a single delta.
+        """
+        yield await self.generate(prompt)
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from llm.base import LLMClient
+from llm.manager import LLMClientManager
+
+logger = logging.getLogger(__name__)
+
+# Set for the duration of a request that must not be served from the cache
+_bypass_cache: ContextVar[bool] = ContextVar("llm_bypass_cache", default=False)
+
+
+@contextmanager
+def bypass_cache(enabled: bool = True) -> Iterator[None]:
+    """Skip cached responses (but still refresh the cache) inside this block"""
+    token = _bypass_cache.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass_cache.reset(token)
+
+
+class LLMResponseCache:
+    """On-disk LLM response store with size-based LRU eviction and optional TTL"""
+
+    def __init__(
+        self,
+        path: str = "./llm_cache.db",
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _init_db(self):
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)"
+            )
+            # Running total of response sizes, kept by triggers so eviction never scans the table
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM responses"
+            )
+            connection.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses
+                BEGIN UPDATE cache_size SET total = total + NEW.size WHERE id = 0; END
+                """
+            )
+            connection.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses
+                BEGIN UPDATE cache_size SET total = total + NEW.size - OLD.size WHERE id = 0; END
+                """
+            )
+            connection.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses
+                BEGIN UPDATE cache_size SET total = total - OLD.size WHERE id = 0; END
+                """
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row and self.ttl_seconds and row[1] + self.ttl_seconds < now:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row:
+                connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._connect() as connection:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the size triggers
+            connection.execute(
+                "INSERT INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET response = excluded.response, size = excluded.size, "
+                "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (key, response, size, now, now)
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Drop least recently used responses until the store fits max_bytes"""
+        total = connection.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+        logger.debug(f"Evicted {len(stale)} cached LLM responses ({freed} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as connection:
+            entries = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            total = connection.execute("SELECT total FROM cache_size WHERE id = 0").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class CachedLLMClient(LLMClient):
+    """Wraps an LLMClient with a persistent response cache and request coalescing
+
+    Responses are keyed by (provider, model, prompt hash, generation params).
+    Concurrent calls with the same key share one upstream request. In front
+    of an LLMClientManager the key is that of the provider that answered, and
+    lookups use the provider the manager would call first, so a response
+    from a fallback model is never served as the preferred model's.
+    """
+
+    def __init__(self, client: LLMClient, cache: LLMResponseCache, provider: str):
+        self.client = client
+        self.cache = cache
+        self.provider = provider
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped client's attributes (model, max_tokens, ...)
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _key(self, prompt: str, max_tokens: Optional[int] = None, answerer: Optional[LLMClient] = None) -> str:
+        """Cache key of prompt as answered by answerer, one of a manager's providers (self.client by default)"""
+        client = answerer or self.client
+        params = {
+            name: getattr(client, name)
+            for name in ("max_tokens", "temperature")
+            if hasattr(client, name)
+        }
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        payload = json.dumps(
+            {
+                "provider": answerer.provider if answerer is not None else self.provider,
+                "model": getattr(client, "model", None),
+                "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+                "params": params
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup_key(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        if isinstance(self.client, LLMClientManager):
+            return self._key(prompt, max_tokens, self.client.preferred())
+        return self._key(prompt, max_tokens)
+
+    async def _answer(self, prompt: str, max_tokens: Optional[int]) -> Tuple[str, str]:
+        """The response and the cache key of whoever answered it"""
+        if isinstance(self.client, LLMClientManager):
+            response, answerer = await self.client.generate_from(prompt, max_tokens=max_tokens)
+            return response, self._key(prompt, max_tokens, answerer)
+        return await self.client.generate(prompt, max_tokens=max_tokens), self._key(prompt, max_tokens)
+
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        key = self._lookup_key(prompt, max_tokens)
+        if not _bypass_cache.get():
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return (await asyncio.shield(inflight))[0]
+
+        task = asyncio.ensure_future(self._answer(prompt, max_tokens))
+        self._inflight[key] = task
+        try:
+            response, answered_key = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                # Let coalesced callers finish even if this caller was cancelled
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        await asyncio.to_thread(self.cache.set, answered_key, response)
+        return response
+
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Read the bypass flag now; the generator body runs later in the consumer's context
+        return self._stream(prompt, use_cache=not _bypass_cache.get())
+
+    async def _stream(self, prompt: str, use_cache: bool) -> AsyncIterator[str]:
+        if use_cache:
+            cached = await asyncio.to_thread(self.cache.get, self._lookup_key(prompt))
+            if cached is not None:
+                yield cached
+                return
+
+        received = []
+        if isinstance(self.client, LLMClientManager):
+            answerer = None
+            async for delta, answerer in self.client.stream_from(prompt):
+                received.append(delta)
+                yield delta
+            key = self._key(prompt, answerer=answerer)
+        else:
+            async for delta in self.client.stream(prompt):
+                received.append(delta)
+                yield delta
+            key = self._key(prompt)
+        await asyncio.to_thread(self.cache.set, key, "".join(received))
@@ -0,0 +1,76 @@
+from typing import Any, Dict, List, Optional
+import httpx
+from llm.base import LLMClient
+from llm.cache import CachedLLMClient, LLMResponseCache
+from llm.manager import LLMClientManager, ManagedLLMClient
+from llm.anthropic import AnthropicClient
+from llm.openai import OpenAIClient
+
+
+class LLMFactory:
+    _providers = {
+        "anthropic": AnthropicClient,
+        "openai": OpenAIClient
+    }
+
+    @classmethod
+    def register(cls, provider: str, client_class: type):
+        """Register an additional LLMClient implementation"""
+        cls._providers[provider] = client_class
+
+    @classmethod
+    def create_client(
+        cls,
+        provider: str,
+        api_key: str,
+        cache: Optional[LLMResponseCache] = None,
+        **kwargs
+    ) -> LLMClient:
+        if provider not in cls._providers:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+        client = cls._providers[provider](api_key, **kwargs)
+        if cache is not None:
+            client = CachedLLMClient(client, cache, provider)
+        return client
+
+    @classmethod
+    def create_manager(
+        cls,
+        providers: List[Dict[str, Any]],
+        cache: Optional[LLMResponseCache] = None,
+        max_connections: int = 20,
+        **manager_kwargs
+    ) -> LLMClient:
+        """Build a failover LLMClientManager over several providers
+
+        Each entry holds "provider" and "api_key", optional "limits" passed to
+        ManagedLLMClient (requests_per_minute, tokens_per_minute,
+        max_concurrency, max_retries) and any client kwargs. The SDK clients
+        get their own pooled connections and leave retries to the manager.
+        """
+        clients = []
+        for config in providers:
+            config = dict(config)
+            provider = config.pop("provider")
+            if provider not in cls._providers:
+                raise ValueError(f"Unsupported LLM provider: {provider}")
+            api_key = config.pop("api_key", "")
+            limits = config.pop("limits", {})
+            http_client = None
+            if provider in ("anthropic", "openai"):
+                http_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(600, connect=10),
+                    limits=httpx.Limits(
+                        max_connections=max_connections,
+                        max_keepalive_connections=max_connections
+                    )
+                )
+                config.update(http_client=http_client, max_retries=0)
+            client = cls._providers[provider](api_key, **config)
+            clients.append(ManagedLLMClient(provider, client, http_client=http_client, **limits))
+
+        manager = LLMClientManager(clients, **manager_kwargs)
+        if cache is not None:
+            # Keyed by the provider that answered, so fallback responses stay apart
+            return CachedLLMClient(manager, cache, clients[0].provider)
+        return manager
@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+from llm.base import LLMClient, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limits, overload and transient server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class ProviderUnavailableError(RuntimeError):
+    """Raised when every configured provider failed a call"""
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The provider's Retry-After hint, if the error carries a response"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # SDK connection and timeout errors carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class TokenBucket:
+    """Async token bucket; a capacity of 0 disables the limit
+
+    take() may overdraw the bucket, which is how completion tokens that are
+    only known after a call are charged: the debt delays later callers.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        if not self.capacity:
+            return
+        # Never wait for more than a full bucket, or a huge prompt could block forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def take(self, amount: float):
+        if self.capacity:
+            self._refill()
+            self.tokens -= amount
+
+
+class ProviderHealth:
+    """Rolling latency and error rate over a provider's most recent calls"""
+
+    def __init__(self, window: int = 50, min_samples: int = 10):
+        self.min_samples = min_samples
+        self._calls: deque = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool):
+        self._calls.append((seconds, ok))
+
+    def error_rate(self) -> Optional[float]:
+        if len(self._calls) < self.min_samples:
+            return None
+        return sum(1 for _, ok in self._calls if not ok) / len(self._calls)
+
+    def p95_seconds(self) -> Optional[float]:
+        latencies = sorted(seconds for seconds, ok in self._calls if ok)
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+
+class ManagedLLMClient(LLMClient):
+    """One provider's client behind rate limits, a concurrency cap and retries
+
+    Requests per minute and tokens per minute are enforced with token
+    buckets before a call is sent. Prompt tokens are charged up front and
+    completion tokens once they are known. Retryable failures back off
+    exponentially with full jitter, honouring Retry-After when present.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        client: LLMClient,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 20,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        self.provider = provider
+        self.client = client
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.http_client = http_client
+        self.health = ProviderHealth()
+        self.in_flight = 0
+        self.retries = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped client's attributes (model, max_tokens, ...)
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            return min(hint, self.backoff_max_seconds)
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+    async def _admit(self, prompt: str):
+        await self.requests.acquire()
+        await self.tokens.acquire(estimate_tokens(prompt))
+
+    async def _retry_or_raise(self, attempt: int, error: BaseException):
+        if attempt >= self.max_retries or not is_retryable(error):
+            raise error
+        delay = self._backoff(attempt, error)
+        self.retries += 1
+        logger.warning(f"{self.provider} call failed ({str(error)}); retry {attempt + 1} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        attempt = 0
+        while True:
+            await self._admit(prompt)
+            start = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    self.in_flight += 1
+                    try:
+                        response = await self.client.generate(prompt, max_tokens=max_tokens)
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                self.health.record(time.perf_counter() - start, ok=False)
+                await self._retry_or_raise(attempt, e)
+                attempt += 1
+                continue
+            self.health.record(time.perf_counter() - start, ok=True)
+            self.tokens.take(estimate_tokens(response))
+            return response
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        attempt = 0
+        while True:
+            await self._admit(prompt)
+            start = time.perf_counter()
+            received: List[str] = []
+            try:
+                async with self.semaphore:
+                    self.in_flight += 1
+                    try:
+                        async for delta in self.client.stream(prompt):
+                            received.append(delta)
+                            yield delta
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                self.health.record(time.perf_counter() - start, ok=False)
+                if received:
+                    raise  # Deltas already reached the caller, so the call cannot be replayed
+                await self._retry_or_raise(attempt, e)
+                attempt += 1
+                continue
+            self.health.record(time.perf_counter() - start, ok=True)
+            self.tokens.take(estimate_tokens("".join(received)))
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "retries": self.retries,
+            "error_rate": self.health.error_rate(),
+            "p95_seconds": self.health.p95_seconds()
+        }
+
+    async def aclose(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+
+class LLMClientManager(LLMClient):
+    """Long-lived LLM client that fails over between providers
+
+    Providers are tried in preference order. A provider whose recent error
+    rate or p95 latency crosses its threshold is skipped for cooldown_seconds,
+    after which it gets traffic again; a call that fails on one provider
+    after its retries moves on to the next.
+    """
+
+    def __init__(
+        self,
+        clients: List[ManagedLLMClient],
+        max_error_rate: float = 0.5,
+        max_p95_seconds: Optional[float] = None,
+        cooldown_seconds: float = 60
+    ):
+        if not clients:
+            raise ValueError("At least one LLM client is required")
+        self.clients = clients
+        self.max_error_rate = max_error_rate
+        self.max_p95_seconds = max_p95_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._unhealthy_until: Dict[str, float] = {}
+        self.failovers = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # model, max_tokens, ... of the first configured provider
+        if name == "clients":
+            raise AttributeError(name)
+        return getattr(self.clients[0], name)
+
+    @property
+    def provider(self) -> str:
+        return "+".join(client.provider for client in self.clients)
+
+    def _check_health(self, client: ManagedLLMClient):
+        error_rate = client.health.error_rate()
+        p95 = client.health.p95_seconds()
+        reason = None
+        if error_rate is not None and error_rate > self.max_error_rate:
+            reason = f"error rate {error_rate:.0%}"
+        elif self.max_p95_seconds and p95 is not None and p95 > self.max_p95_seconds:
+            reason = f"p95 latency {p95:.1f}s"
+        if reason and client.provider not in self._unhealthy_until:
+            logger.warning(f"Routing around {client.provider} for {self.cooldown_seconds}s: {reason}")
+            self._unhealthy_until[client.provider] = time.monotonic() + self.cooldown_seconds
+
+    def healthy(self, client: ManagedLLMClient) -> bool:
+        until = self._unhealthy_until.get(client.provider)
+        if until is None:
+            return True
+        if time.monotonic() >= until:
+            # Cooldown over: start from a clean window so old failures do not re-trip it
+            del self._unhealthy_until[client.provider]
+            client.health = ProviderHealth(client.health._calls.maxlen, client.health.min_samples)
+            return True
+        return False
+
+    def _ordered(self) -> List[ManagedLLMClient]:
+        healthy = [client for client in self.clients if self.healthy(client)]
+        # With every provider unhealthy, still try them all in preference order
+        return healthy + [client for client in self.clients if client not in healthy]
+
+    def preferred(self) -> ManagedLLMClient:
+        """The provider the next call is sent to first"""
+        return self._ordered()[0]
+
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        return (await self.generate_from(prompt, max_tokens=max_tokens))[0]
+
+    async def generate_from(self, prompt: str, max_tokens: Optional[int] = None) -> Tuple[str, ManagedLLMClient]:
+        """generate(), also returning the provider client that answered"""
+        errors = []
+        for i, client in enumerate(self._ordered()):
+            if i:
+                self.failovers += 1
+            try:
+                return await client.generate(prompt, max_tokens=max_tokens), client
+            except Exception as e:
+                errors.append(f"{client.provider}: {str(e)}")
+                logger.warning(f"LLM provider {client.provider} failed: {str(e)}")
+            finally:
+                self._check_health(client)
+        raise ProviderUnavailableError("; ".join(errors))
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async for delta, _ in self.stream_from(prompt):
+            yield delta
+
+    async def stream_from(self, prompt: str) -> AsyncIterator[Tuple[str, ManagedLLMClient]]:
+        """stream(), pairing each delta with the provider client that produced it"""
+        errors = []
+        for i, client in enumerate(self._ordered()):
+            if i:
+                self.failovers += 1
+            started = False
+            try:
+                async for delta in client.stream(prompt):
+                    started = True
+                    yield delta, client
+                return
+            except Exception as e:
+                if started:
+                    raise
+                errors.append(f"{client.provider}: {str(e)}")
+                logger.warning(f"LLM provider {client.provider} failed: {str(e)}")
+            finally:
+                self._check_health(client)
+        raise ProviderUnavailableError("; ".join(errors))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "failovers": self.failovers,
+            "providers": {
+                client.provider: {**client.stats(), "healthy": client.provider not in self._unhealthy_until}
+                for client in self.clients
+            }
+        }
+
+    async def aclose(self):
+        for client in self.clients:
+            await client.aclose()
@@ -0,0 +1,39 @@
+from typing import AsyncIterator, Optional
+import httpx
+from openai import AsyncOpenAI
+from llm.base import LLMClient
+
+
+class OpenAIClient(LLMClient):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o",
+        max_tokens: int = 4096,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_retries: int = 2
+    ):
+        # A shared http_client keeps connections pooled across calls;
+        # max_retries=0 leaves retrying to the LLMClientManager
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=max_retries)
+        self.model = model
+        self.max_tokens = max_tokens
+
+    async def generate(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            max_tokens=max_tokens or self.max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content or ""
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
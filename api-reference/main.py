@@ -1,18 +1,23 @@
+import time
+
+# Measured from here so the reported import time covers every import below
+_import_started = time.perf_counter()
+
 import asyncio
+import os
 import sys
 import logging
+from contextlib import asynccontextmanager
 
 if sys.platform == "win32":
     # Set up policy for Windows
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routes import content, tutorial, search
-from db.vector_store import VectorStore
-from embeddings.generator import EmbeddingGenerator
-from generators.tutorial import TutorialGenerator
-from search.semantic_search import SemanticSearch
-from llm.factory import LLMFactory
+from services import ServiceContainer
+from observability.metrics import ServerTimingMiddleware, registry
 from config import settings
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -23,35 +28,62 @@ load_dotenv()
 
 # Configure logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    # DEBUG formats a line per chunk and stage; use /metrics for timings instead
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+logger = logging.getLogger(__name__)
+
+# Services are built lazily and warmed by the lifespan, not at import time
+services = ServiceContainer()
+registry.register_collector(services.metrics)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health/live answers while the model loads
+    startup = asyncio.create_task(services.startup())
+    try:
+        yield
+    finally:
+        if not startup.done():
+            startup.cancel()
+        await asyncio.gather(startup, return_exceptions=True)
+        await services.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.state.services = services
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware, path_prefixes=("/api/search",))
 
-# Initialize services
-vector_store = VectorStore()
-embedding_generator = EmbeddingGenerator()
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    """The process is up and serving requests"""
+    return {"status": "ok"}
 
-# Initialize LLM client (choose provider based on available API keys)
-if settings.ANTHROPIC_API_KEY:
-    llm_client = LLMFactory.create_client("anthropic", settings.ANTHROPIC_API_KEY)
-elif settings.OPENAI_API_KEY:
-    llm_client = LLMFactory.create_client("openai", settings.OPENAI_API_KEY)
-else:
-    raise ValueError("No LLM API keys configured")
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    """200 once the model has run its warm-up encode and ingestion has started"""
+    return JSONResponse(services.status(), status_code=200 if services.ready else 503)
 
-tutorial_generator = TutorialGenerator(llm_client, vector_store, embedding_generator)
-semantic_search = SemanticSearch(vector_store, embedding_generator)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of stage histograms and service gauges"""
+    return PlainTextResponse(
+        await asyncio.to_thread(registry.render),
+        media_type="text/plain; version=0.0.4"
+    )
 
 # Include routers
 app.include_router(content.router, prefix="/api/content", tags=["content"])
 app.include_router(tutorial.router, prefix="/api/tutorial")
-app.include_router(search.router, prefix="/api/search", tags=["search"]) 
\ No newline at end of file
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+
+services.import_seconds = round(time.perf_counter() - _import_started, 3)
+logger.info(f"Imported main in {services.import_seconds}s")
@@ -0,0 +1,241 @@
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Seconds; spans range from sub-millisecond cache lookups to minute-long LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Sample(NamedTuple):
+    """One value reported by a collector at scrape time"""
+    name: str
+    kind: str  # "gauge" or "counter"
+    help: str
+    labels: Dict[str, Any]
+    value: float
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three additions under a lock"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format
+
+    Histograms and counters are updated inline. Gauges and externally kept
+    counters (cache hits, queue depths, pool sizes) come from collectors that
+    are only called when /metrics is scraped, so they cost nothing per request.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, help, labelnames)
+        return self._metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help, labelnames, buckets)
+        return self._metrics[name]
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+
+        # Group collected samples so each metric gets one HELP/TYPE header
+        grouped: Dict[str, List[Sample]] = {}
+        for collector in self._collectors:
+            for sample in collector():
+                grouped.setdefault(sample.name, []).append(sample)
+        for name, samples in grouped.items():
+            lines.append(f"# HELP {name} {samples[0].help}")
+            lines.append(f"# TYPE {name} {samples[0].kind}")
+            for sample in samples:
+                lines.append(f"{name}{_format_labels(sample.labels)} {sample.value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "pipeline_stage_duration_seconds",
+    "Time spent in each pipeline stage",
+    ("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "pipeline_stage_errors_total",
+    "Pipeline stage executions that raised",
+    ("stage",)
+)
+
+# Server-Timing descriptions keep to characters that need no quoting or escaping
+UNSAFE_TIMING_CHARS = re.compile(r"[^A-Za-z0-9._:-]")
+MAX_TIMING_DESC = 64
+
+# Spans recorded during the current request, reported as Server-Timing
+_request_spans: ContextVar[Optional[List[Tuple[str, Optional[str], float]]]] = ContextVar(
+    "request_spans", default=None
+)
+
+
+def record_span(stage: str, seconds: float, error: bool = False, detail: Optional[str] = None):
+    """Record an already measured stage duration"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if error:
+        STAGE_ERRORS.inc(stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, detail, seconds))
+
+
+@contextmanager
+def span(stage: str, detail: Optional[str] = None) -> Iterator[None]:
+    """Time a block as one pipeline stage"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_span(stage, time.perf_counter() - start, error, detail)
+
+
+def _timing_token(text: str) -> str:
+    """ASCII header token for a span detail, which may come from user input (a collection name)"""
+    return UNSAFE_TIMING_CHARS.sub("_", text)[:MAX_TIMING_DESC]
+
+
+def _server_timing(spans: List[Tuple[str, Optional[str], float]], total: float) -> bytes:
+    entries = [
+        f'{stage};desc="{_timing_token(detail)}";dur={seconds * 1000:.1f}'
+        if detail else f"{stage};dur={seconds * 1000:.1f}"
+        for stage, detail, seconds in spans
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("ascii")
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header with the spans of each request
+
+    Only paths under one of the prefixes are instrumented. The span list is
+    shared through a context variable, so spans recorded in worker threads
+    started with asyncio.to_thread are included.
+    """
+
+    def __init__(self, app: Any, path_prefixes: Sequence[str] = ("/",)):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, Optional[str], float]] = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(spans, time.perf_counter() - start)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ContextSlot:
+    browser_index: int
+    browser: Browser
+    context: BrowserContext
+    pages_served: int = 0
+
+
+class BrowserPool:
+    """Long-lived pool of Chromium browsers and contexts for article scraping
+
+    Pages are leased from recycled contexts, so scraping an article no longer
+    pays for a browser launch. Contexts are replaced after a fixed number of
+    pages and crashed browsers are restarted on lease or by the monitor.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        contexts_per_browser: int = 4,
+        max_pages_per_context: int = 50,
+        health_check_interval: float = 30.0,
+        headless: bool = True
+    ):
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.max_pages_per_context = max_pages_per_context
+        self.health_check_interval = health_check_interval
+        self.headless = headless
+
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[Optional[Browser]] = []
+        self._browser_locks: List[asyncio.Lock] = []
+        self._slots: Optional[asyncio.Queue] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self.restarts = 0
+        self.recycled_contexts = 0
+
+    async def start(self):
+        if self._playwright is not None:
+            return
+
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Queue()
+        self._browsers = [None] * self.size
+        self._browser_locks = [asyncio.Lock() for _ in range(self.size)]
+
+        for index in range(self.size):
+            browser = await self._launch(index)
+            for _ in range(self.contexts_per_browser):
+                context = await browser.new_context()
+                self._slots.put_nowait(_ContextSlot(index, browser, context))
+
+        self._monitor = asyncio.create_task(self._monitor_browsers())
+        logger.info(f"Started browser pool with {self.size} browsers x {self.contexts_per_browser} contexts")
+
+    async def _launch(self, index: int) -> Browser:
+        browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._browsers[index] = browser
+        return browser
+
+    async def _healthy_browser(self, index: int) -> Browser:
+        """Return a connected browser for the index, relaunching it if it crashed"""
+        async with self._browser_locks[index]:
+            browser = self._browsers[index]
+            if browser is None or not browser.is_connected():
+                logger.warning(f"Browser {index} is disconnected, restarting")
+                self.restarts += 1
+                browser = await self._launch(index)
+            return browser
+
+    async def _refresh_slot(self, slot: _ContextSlot):
+        """Give the slot a fresh context, on a restarted browser if needed"""
+        browser = await self._healthy_browser(slot.browser_index)
+        try:
+            await slot.context.close()
+        except Exception:
+            # The context died with its browser
+            pass
+        slot.browser = browser
+        slot.context = await browser.new_context()
+        slot.pages_served = 0
+
+    async def _recycle_slot(self, slot: _ContextSlot):
+        self.recycled_contexts += 1
+        try:
+            await self._refresh_slot(slot)
+        except Exception as e:
+            logger.error(f"Failed to recycle browser context: {str(e)}", exc_info=True)
+            # Retried when the slot is next leased
+            slot.pages_served = self.max_pages_per_context
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """Lease a page from a pooled browser context
+
+        The context is replaced after max_pages_per_context pages, and also
+        after any failed lease, since a crashed page or a navigation that
+        hung can leave the context unusable.
+        """
+        if self._slots is None:
+            raise RuntimeError("Browser pool is not started")
+
+        slot: _ContextSlot = await self._slots.get()
+        failed = False
+        try:
+            current = self._browsers[slot.browser_index]
+            if (
+                slot.browser is not current
+                or not slot.browser.is_connected()
+                or slot.pages_served >= self.max_pages_per_context
+            ):
+                await self._refresh_slot(slot)
+
+            page = await slot.context.new_page()
+            try:
+                yield page
+            finally:
+                slot.pages_served += 1
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if failed or slot.pages_served >= self.max_pages_per_context:
+                await self._recycle_slot(slot)
+            self._slots.put_nowait(slot)
+
+    async def _monitor_browsers(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for index in range(self.size):
+                try:
+                    await self._healthy_browser(index)
+                except Exception as e:
+                    logger.error(f"Failed to restart browser {index}: {str(e)}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "browsers": self.size,
+            "connected_browsers": sum(
+                1 for browser in self._browsers if browser is not None and browser.is_connected()
+            ),
+            "idle_contexts": self._slots.qsize() if self._slots is not None else 0,
+            "total_contexts": self.size * self.contexts_per_browser,
+            "restarts": self.restarts,
+            "recycled_contexts": self.recycled_contexts
+        }
+
+    async def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for browser in self._browsers:
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+        self._browsers = []
+        self._slots = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
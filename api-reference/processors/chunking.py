@@ -0,0 +1,224 @@
+"""Chunking strategies for extracted content
+
+Every strategy splits plain text with split() and YouTube transcripts, a
+list of {"text", "start", "duration"} caption segments, with
+split_transcript(). The token-aware strategies count tokens with the
+embedding model's own tokenizer and never produce a chunk the model would
+truncate: the sentence-transformers models used here read at most
+max_seq_length tokens (256 for all-MiniLM-L6-v2), two of which are the
+[CLS] and [SEP] markers.
+"""
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ChunkingStrategy = Literal["character", "tokens", "sentences", "paragraphs", "transcript"]
+
+# Tokens the model adds around every input ([CLS] ... [SEP])
+SPECIAL_TOKENS = 2
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=\S)")
+PARAGRAPH_BOUNDARY = re.compile(r"\n\s*\n")
+
+
+class Tokenizer:
+    """The embedding model's tokenizer, used to count and cut text by tokens
+
+    Loaded on its own through transformers, so processes that embed through
+    the shared embedding server do not need the model.
+    """
+
+    def __init__(self, model_name: str):
+        # Imported on first use, like the model itself
+        from transformers import AutoTokenizer
+        repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(repo)
+
+    def count(self, texts: Sequence[str]) -> List[int]:
+        """Token counts of texts, without the special tokens"""
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Character span of every token of text"""
+        return self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+
+
+class Chunker(ABC):
+    """Splits text into chunks; transcripts are joined and split as text by default"""
+
+    name: ChunkingStrategy
+
+    @abstractmethod
+    def split(self, text: str) -> List[str]:
+        pass
+
+    def split_transcript(self, segments: Sequence[Dict[str, Any]]) -> List[str]:
+        return self.split(" ".join(segment["text"] for segment in segments))
+
+
+class CharacterChunker(Chunker):
+    """Fixed-size character windows with overlap, split at natural separators where possible
+
+    Not token-aware: a dense chunk can exceed the model's limit and is then
+    silently truncated by the model.
+    """
+
+    name = "character"
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def split(self, text: str) -> List[str]:
+        return self.text_splitter.split_text(text)
+
+
+class TokenChunker(Chunker):
+    """Fixed windows of the model's tokens with overlap, cut at token boundaries"""
+
+    name = "tokens"
+
+    def __init__(self, tokenizer: Tokenizer, max_tokens: int = 256, overlap_tokens: int = 32):
+        self.tokenizer = tokenizer
+        # Room left for text once the model adds its special tokens
+        self.budget = max_tokens - SPECIAL_TOKENS
+        if not 0 <= overlap_tokens < self.budget:
+            raise ValueError("overlap_tokens must be smaller than the token budget")
+        self.overlap_tokens = overlap_tokens
+
+    def _windows(self, text: str, overlap_tokens: int) -> List[str]:
+        offsets = self.tokenizer.offsets(text)
+        chunks = []
+        start = 0
+        while start < len(offsets):
+            end = min(start + self.budget, len(offsets))
+            chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end == len(offsets):
+                break
+            start = end - overlap_tokens
+        return chunks
+
+    def split(self, text: str) -> List[str]:
+        return self._windows(text, self.overlap_tokens)
+
+
+class PackingChunker(TokenChunker):
+    """Packs whole sentences (or paragraphs) into chunks up to the token budget
+
+    Units are packed greedily in order, which gives the fewest chunks that
+    keep every unit whole and fit the budget. A unit longer than the budget
+    is cut into token windows. overlap_units repeats the last units of a
+    chunk at the start of the next one.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Tokenizer,
+        max_tokens: int = 256,
+        unit: Literal["sentences", "paragraphs"] = "sentences",
+        overlap_units: int = 0
+    ):
+        super().__init__(tokenizer, max_tokens, overlap_tokens=0)
+        self.name = unit
+        self.boundary = SENTENCE_BOUNDARY if unit == "sentences" else PARAGRAPH_BOUNDARY
+        self.overlap_units = overlap_units
+
+    def _units(self, text: str) -> List[str]:
+        return [unit.strip() for unit in self.boundary.split(text) if unit.strip()]
+
+    def _pack(self, units: List[str], breaks: Optional[List[bool]] = None) -> List[str]:
+        """Greedy packing; breaks[i] asks for a new chunk before unit i once the current one is well filled"""
+        breaks = breaks or [False] * len(units)
+        packed: List[Tuple[str, int, bool]] = []
+        for unit, count, pause in zip(units, self.tokenizer.count(units), breaks):
+            if count > self.budget:
+                pieces = self._windows(unit, 0)
+                packed.extend(
+                    (piece, piece_count, pause and j == 0)
+                    for j, (piece, piece_count) in enumerate(zip(pieces, self.tokenizer.count(pieces)))
+                )
+            else:
+                packed.append((unit, count, pause))
+
+        chunks: List[str] = []
+        current: List[Tuple[str, int]] = []
+        size = 0
+        for unit, count, pause in packed:
+            soft_break = pause and size >= self.budget * 0.75
+            if current and (size + count > self.budget or soft_break):
+                chunks.append(" ".join(text for text, _ in current))
+                current = current[-self.overlap_units:] if self.overlap_units else []
+                # Drop overlap that would not leave room for the next unit
+                while current and sum(c for _, c in current) + count > self.budget:
+                    current.pop(0)
+                size = sum(c for _, c in current)
+            current.append((unit, count))
+            size += count
+        if current:
+            chunks.append(" ".join(text for text, _ in current))
+        return self._enforce_budget(chunks)
+
+    def _enforce_budget(self, chunks: List[str]) -> List[str]:
+        """Re-cut the rare chunk whose joined text tokenizes longer than its units did"""
+        fitted = []
+        for chunk, count in zip(chunks, self.tokenizer.count(chunks)):
+            fitted.extend(self._windows(chunk, 0) if count > self.budget else [chunk])
+        return fitted
+
+    def split(self, text: str) -> List[str]:
+        return self._pack(self._units(text))
+
+
+class TranscriptChunker(PackingChunker):
+    """Packs whole caption segments, preferring to break at pauses in speech
+
+    Segments are only cut when one alone exceeds the budget, so chunks map
+    to time ranges of the video. Once a chunk is three-quarters full, a gap of more than
+    pause_seconds before the next segment closes it: pauses tend to mark a
+    change of topic, and this costs at most a few extra chunks.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, max_tokens: int = 256, pause_seconds: float = 2.0):
+        super().__init__(tokenizer, max_tokens, unit="sentences")
+        self.name = "transcript"
+        self.pause_seconds = pause_seconds
+
+    def split_transcript(self, segments: Sequence[Dict[str, Any]]) -> List[str]:
+        segments = [segment for segment in segments if segment["text"].strip()]
+        breaks = [False]
+        for previous, segment in zip(segments, segments[1:]):
+            gap = segment["start"] - (previous["start"] + previous.get("duration", 0))
+            breaks.append(gap > self.pause_seconds)
+        return self._pack([segment["text"].strip() for segment in segments], breaks)
+
+
+def build_chunker(
+    strategy: ChunkingStrategy = "character",
+    model_name: str = "all-MiniLM-L6-v2",
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    tokenizer: Optional[Tokenizer] = None
+) -> Chunker:
+    """Chunker for a strategy name; token-aware strategies use model_name's tokenizer"""
+    if strategy == "character":
+        return CharacterChunker(chunk_size, chunk_overlap)
+    if strategy not in ("tokens", "sentences", "paragraphs", "transcript"):
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+    tokenizer = tokenizer or Tokenizer(model_name)
+    if strategy == "tokens":
+        return TokenChunker(tokenizer, max_tokens, overlap_tokens)
+    if strategy == "transcript":
+        return TranscriptChunker(tokenizer, max_tokens)
+    return PackingChunker(tokenizer, max_tokens, unit=strategy)
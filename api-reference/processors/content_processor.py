@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+import requests
+from playwright.async_api import Page, async_playwright
+from pydantic import BaseModel
+from youtube_transcript_api import YouTubeTranscriptApi
+from embeddings.generator import EmbeddingGenerator
+from processors.browser_pool import BrowserPool
+from processors.chunking import CharacterChunker, Chunker
+from observability.metrics import span
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_VIDEOS_API = "https://www.googleapis.com/youtube/v3/videos"
+
+YOUTUBE_ID_PATTERN = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|embed/|shorts/|live/|v/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+# Prefer the main article element and fall back to the whole body
+ARTICLE_TEXT_SCRIPT = """
+() => {
+    const root = document.querySelector('article') || document.querySelector('main') || document.body;
+    return root ? root.innerText : '';
+}
+"""
+
+
+class ContentMetadata(BaseModel):
+    title: Optional[str] = None
+    author: Optional[str] = None
+    source_url: str
+    content_type: str
+    duration: Optional[str] = None
+    published_date: Optional[str] = None
+    view_count: Optional[int] = None
+
+
+def extract_video_id(url: str) -> str:
+    match = YOUTUBE_ID_PATTERN.search(url)
+    if not match:
+        raise ValueError(f"Could not extract YouTube video ID from URL: {url}")
+    return match.group(1)
+
+
+class ContentProcessor:
+    """Extracts and chunks article and YouTube content
+
+    When a BrowserPool and shared HTTP client are supplied (the application
+    owns both), pages and connections are leased from them. Without them the
+    processor launches its own browser and client for the lifetime of the
+    ``async with`` block. Transcripts are fetched through transcript_session,
+    a shared requests.Session, since the transcript client is synchronous;
+    without one the transcript library opens its own.
+
+    Chunking is delegated to a Chunker (processors/chunking.py); without
+    one, text is split into chunk_size-character windows.
+    generate_embeddings() loads its own model unless an EmbeddingGenerator
+    is supplied; the ingestion pipeline encodes through the shared batcher
+    instead.
+    """
+
+    def __init__(
+        self,
+        youtube_api_key: Optional[str] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        transcript_session: Optional[requests.Session] = None,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        chunker: Optional[Chunker] = None,
+        embedding_generator: Optional[EmbeddingGenerator] = None
+    ):
+        self.youtube_api_key = youtube_api_key
+        self.browser_pool = browser_pool
+        self.http_client = http_client
+        self.transcript_session = transcript_session
+        self.chunker = chunker or CharacterChunker(chunk_size, chunk_overlap)
+        self.embedding_generator = embedding_generator
+        self._playwright = None
+        self._browser = None
+        self._owns_http_client = False
+
+    async def __aenter__(self):
+        if self.browser_pool is None:
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch()
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(timeout=30)
+            self._owns_http_client = True
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        if self._owns_http_client:
+            await self.http_client.aclose()
+            self.http_client = None
+            self._owns_http_client = False
+
+    @asynccontextmanager
+    async def _page(self) -> AsyncIterator[Page]:
+        if self.browser_pool is not None:
+            async with self.browser_pool.page() as page:
+                yield page
+        else:
+            page = await self._browser.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
+
+    async def process_content(self, url: str, content_type: str) -> Tuple[ContentMetadata, List[str]]:
+        """Extract content from a URL and split it into chunks"""
+        if content_type == "youtube":
+            # Transcript-aware chunkers use the caption timings
+            metadata, transcript = await self.process_youtube_transcript(url)
+            chunks = self.chunk_transcript(transcript)
+        elif content_type == "article":
+            metadata, text = await self.process_article(url)
+            chunks = self.chunk_text(text)
+        else:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
+        if not chunks:
+            raise ValueError(f"No content extracted from {url}")
+        return metadata, chunks
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Split already extracted text; needs no browser or HTTP client"""
+        with span("chunk", detail=self.chunker.name):
+            return self.chunker.split(text)
+
+    def chunk_transcript(self, transcript: List[Dict[str, Any]]) -> List[str]:
+        """Split caption segments ({"text", "start", "duration"})"""
+        with span("chunk", detail=self.chunker.name):
+            return self.chunker.split_transcript(transcript)
+
+    def generate_embeddings(self, chunks: List[str]) -> List[List[float]]:
+        if self.embedding_generator is None:
+            self.embedding_generator = EmbeddingGenerator()
+        return self.embedding_generator.generate(chunks)
+
+    async def process_article(self, url: str) -> Tuple[ContentMetadata, str]:
+        async with self._page() as page:
+            await page.goto(url, wait_until="domcontentloaded")
+            title = await page.title()
+            author = await self._meta_content(page, 'meta[name="author"]')
+            published_date = await self._meta_content(page, 'meta[property="article:published_time"]')
+            text = await page.evaluate(ARTICLE_TEXT_SCRIPT)
+
+        metadata = ContentMetadata(
+            title=title,
+            author=author,
+            source_url=url,
+            content_type="article",
+            published_date=published_date
+        )
+        return metadata, text
+
+    @staticmethod
+    async def _meta_content(page: Page, selector: str) -> Optional[str]:
+        element = await page.query_selector(selector)
+        return await element.get_attribute("content") if element else None
+
+    async def process_youtube(self, url: str) -> Tuple[ContentMetadata, str]:
+        metadata, transcript = await self.process_youtube_transcript(url)
+        return metadata, " ".join(segment["text"] for segment in transcript)
+
+    async def process_youtube_transcript(self, url: str) -> Tuple[ContentMetadata, List[Dict[str, Any]]]:
+        video_id = extract_video_id(url)
+
+        response = await self.http_client.get(
+            YOUTUBE_VIDEOS_API,
+            params={
+                "part": "snippet,contentDetails,statistics",
+                "id": video_id,
+                "key": self.youtube_api_key
+            }
+        )
+        response.raise_for_status()
+        items = response.json().get("items", [])
+        if not items:
+            raise ValueError(f"YouTube video not found: {video_id}")
+        video = items[0]
+
+        # The transcript client is synchronous
+        transcript = await asyncio.to_thread(self._fetch_transcript, video_id)
+
+        metadata = ContentMetadata(
+            title=video["snippet"].get("title"),
+            author=video["snippet"].get("channelTitle"),
+            source_url=url,
+            content_type="youtube",
+            duration=video.get("contentDetails", {}).get("duration"),
+            published_date=video["snippet"].get("publishedAt"),
+            view_count=int(video.get("statistics", {}).get("viewCount", 0))
+        )
+        return metadata, transcript
+
+    def _fetch_transcript(self, video_id: str) -> List[Dict[str, Any]]:
+        transcript_api = YouTubeTranscriptApi(http_client=self.transcript_session)
+        return transcript_api.fetch(video_id).to_raw_data()
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
-from search.semantic_search import SemanticSearch
+from pydantic import BaseModel, Field
+from db.migration_store import FAILED, RUNNING, SWITCHED, MigrationStore
+from ingestion.migration import CollectionMigrator, create_migration
+from search.semantic_search import SearchFilters, SemanticSearch
 
 router = APIRouter()
 
@@ -15,28 +18,93 @@ class SearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
 
+class MergedSearchResult(SearchResult):
+    collection: str
+
 class MultiCollectionSearchResponse(BaseModel):
     query: str
     collections: Dict[str, List[SearchResult]]
+    errors: Dict[str, str] = {}
+    merged: Optional[List[MergedSearchResult]] = None
+    # Collections left out of merged because another embedding model serves them
+    unmerged: List[str] = []
+
+class MigrationRequest(BaseModel):
+    collection: str
+    model_name: str
+    # Defaults to "{collection}--{model}"; also the migration id
+    target: Optional[str] = None
+    batch_size: int = Field(128, ge=1, le=5000)
+    # 0 leaves the throughput unlimited
+    chunks_per_second: float = Field(0, ge=0)
+    # Share of the encoder's time the migration may use
+    cpu_fraction: float = Field(0.5, gt=0, le=1)
+    # Switch once a reconcile pass changes at most this many chunks
+    catch_up_threshold: int = Field(0, ge=0)
+    max_catch_up_passes: int = Field(5, ge=1)
+
+class MigrationStatus(BaseModel):
+    migration_id: str
+    source: str
+    target: str
+    model_name: str
+    status: str
+    phase: str
+    cursor: int
+    passes: int
+    embedded: int
+    deleted: int
+    switched_at: Optional[float] = None
+    error: Optional[str] = None
+
+# How long a request waits for the model warm-up before giving up with 503
+SEARCH_WARM_TIMEOUT_SECONDS = 10
+
+def get_search_filters(
+    author: Optional[str] = None,
+    content_type: Optional[str] = None,
+    published_after: Optional[str] = None,
+    published_before: Optional[str] = None
+) -> SearchFilters:
+    """Document filters pushed down into the vector-store query"""
+    return SearchFilters(author, content_type, published_after, published_before)
 
-def get_semantic_search():
-    # This should be properly initialized with dependencies
-    from main import semantic_search
-    return semantic_search
+async def get_semantic_search(request: Request) -> SemanticSearch:
+    services = request.app.state.services
+    if not await services.wait_for_search(SEARCH_WARM_TIMEOUT_SECONDS):
+        raise HTTPException(
+            status_code=503,
+            detail="Search is warming up",
+            headers={"Retry-After": "5"}
+        )
+    return services.semantic_search
+
+def get_migration_store(request: Request) -> MigrationStore:
+    return request.app.state.services.migration_store
+
+def get_collection_migrator(request: Request) -> CollectionMigrator:
+    return request.app.state.services.collection_migrator
 
 @router.get("/single", response_model=SearchResponse)
 async def search_single_collection(
     query: str,
     collection: str,
     limit: int = 5,
+    collapse: bool = False,
+    filters: SearchFilters = Depends(get_search_filters),
     semantic_search: SemanticSearch = Depends(get_semantic_search)
 ):
-    """Search within a single collection"""
+    """Search within a single collection
+
+    With collapse=true only the best-matching chunk of each document is returned.
+    """
     try:
         results = await semantic_search.search(
             query=query,
             collection=collection,
-            limit=limit
+            limit=limit,
+            filters=filters,
+            collapse=collapse
         )
         return SearchResponse(query=query, results=results["results"])
         
@@ -48,6 +116,9 @@ async def search_multiple_collections(
     query: str,
     collections: List[str] = Query(...),
     limit_per_collection: int = 3,
+    merged_limit: Optional[int] = None,
+    collapse: bool = False,
+    filters: SearchFilters = Depends(get_search_filters),
     semantic_search: SemanticSearch = Depends(get_semantic_search)
 ):
     """Search across multiple collections"""
@@ -55,16 +126,63 @@ async def search_multiple_collections(
         results = await semantic_search.search_multi(
             query=query,
             collections=collections,
-            limit_per_collection=limit_per_collection
+            limit_per_collection=limit_per_collection,
+            merged_limit=merged_limit,
+            filters=filters,
+            collapse=collapse
         )
         return MultiCollectionSearchResponse(
             query=query,
-            collections=results["collections"]
+            collections=results["collections"],
+            errors=results["errors"],
+            merged=results.get("merged"),
+            unmerged=results.get("unmerged", [])
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/cache/stats")
+async def get_cache_stats(
+    semantic_search: SemanticSearch = Depends(get_semantic_search)
+):
+    """Hit and miss counters for the query embedding and result caches"""
+    return semantic_search.cache_stats()
+
+@router.get("/index/stats")
+async def get_index_stats(
+    recall_samples: int = 0,
+    k: int = 10,
+    semantic_search: SemanticSearch = Depends(get_semantic_search)
+):
+    """Memory footprint of the in-process index, and optionally its recall against Chroma"""
+    ann_index = semantic_search.ann_index
+    if ann_index is None:
+        raise HTTPException(status_code=404, detail="In-process index is not enabled")
+
+    stats = ann_index.stats()
+    if recall_samples > 0:
+        stats["recall"] = {
+            collection: await asyncio.to_thread(
+                ann_index.evaluate_recall,
+                semantic_search.vector_store,
+                collection,
+                recall_samples,
+                k
+            )
+            for collection in stats["collections"]
+        }
+    return stats
+
+@router.get("/related/stats")
+async def get_related_stats(
+    semantic_search: SemanticSearch = Depends(get_semantic_search)
+):
+    """Size and freshness of the related-content index"""
+    if semantic_search.related_index is None:
+        raise HTTPException(status_code=404, detail="Related-content index is not enabled")
+    return semantic_search.related_index.stats()
+
 @router.get("/similar/{content_id}")
 async def find_similar_content(
     content_id: str,
@@ -72,30 +190,68 @@ async def find_similar_content(
     limit: int = 5,
     semantic_search: SemanticSearch = Depends(get_semantic_search)
 ):
-    """Find content similar to a given item"""
+    """Find documents related to a given item, from the precomputed related-content index"""
     try:
-        # Get original content
-        content_data = semantic_search.vector_store.get_by_id(collection, content_id)
-        if not content_data or not content_data["documents"]:
-            raise HTTPException(status_code=404, detail="Content not found")
-        
-        # Use content as query
-        results = await semantic_search.search(
-            query=content_data["documents"][0],
-            collection=collection,
-            limit=limit + 1  # Add 1 to account for the original document
-        )
-        
-        # Remove the original document from results if present
-        filtered_results = [
-            r for r in results["results"]
-            if r["id"] != content_id
-        ][:limit]
-        
-        return {
-            "content_id": content_id,
-            "similar_items": filtered_results
-        }
-        
+        similar_items = await semantic_search.similar(collection, content_id, limit)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    if similar_items is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    return {
+        "content_id": content_id,
+        "similar_items": similar_items
+    }
+
+@router.post("/migrations", response_model=MigrationStatus)
+async def start_migration(
+    migration: MigrationRequest,
+    migrator: CollectionMigrator = Depends(get_collection_migrator),
+    migration_store: MigrationStore = Depends(get_migration_store)
+):
+    """Re-embed a collection into a shadow collection, switching search to it once caught up
+
+    Submitting the same collection and model again returns the existing migration.
+    """
+    options = migration.model_dump(exclude={"collection", "model_name", "target"})
+    try:
+        migration_id = await asyncio.to_thread(
+            create_migration,
+            migration_store,
+            migration.collection,
+            migration.model_name,
+            target=migration.target,
+            **options
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    status = await asyncio.to_thread(migration_store.get, migration_id)
+    # Resubmitting may find the migration already running in another worker
+    if status["status"] in (RUNNING, SWITCHED) and await migrator.claim(migration_id):
+        migrator.start(migration_id)
+    return MigrationStatus(**status)
+
+@router.get("/migrations/{migration_id}", response_model=MigrationStatus)
+async def get_migration(migration_id: str, migration_store: MigrationStore = Depends(get_migration_store)):
+    """Get re-embedding progress"""
+    migration = await asyncio.to_thread(migration_store.get, migration_id)
+    if migration is None:
+        raise HTTPException(status_code=404, detail="Migration not found")
+    return MigrationStatus(**migration)
+
+@router.post("/migrations/{migration_id}/resume", response_model=MigrationStatus)
+async def resume_migration(
+    migration_id: str,
+    migrator: CollectionMigrator = Depends(get_collection_migrator),
+    migration_store: MigrationStore = Depends(get_migration_store)
+):
+    """Resume a failed or interrupted migration from its last checkpoint"""
+    migration = await asyncio.to_thread(migration_store.get, migration_id)
+    if migration is None:
+        raise HTTPException(status_code=404, detail="Migration not found")
+    if migration["status"] not in (RUNNING, SWITCHED, FAILED):
+        raise HTTPException(status_code=409, detail=f"Migration is {migration['status']}")
+    if not await migrator.claim(migration_id):
+        raise HTTPException(status_code=409, detail="Migration is running in another worker")
+    migrator.start(migration_id)
+    return MigrationStatus(**migration)
@@ -0,0 +1,538 @@
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+IndexDtype = Literal["int8", "float16"]
+
+# Rows scanned per block; bounds the float32 scratch space a query needs
+SCAN_BLOCK_ROWS = 16384
+
+
+def _lock_file(lock_file, shared: bool):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return
+    # msvcrt has no shared locks, so readers take the first byte exclusively too;
+    # LK_LOCK gives up after about ten seconds, so keep retrying
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def directory_lock(directory: str, shared: bool = False) -> Iterator[None]:
+    """Lock an index directory across processes through a {directory}.lock file"""
+    os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+    with open(f"{directory}.lock", "a+") as lock_file:
+        _lock_file(lock_file, shared)
+        try:
+            yield
+        finally:
+            _unlock_file(lock_file)
+
+
+def _saved_generation(directory: str) -> Optional[int]:
+    try:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            return json.load(f).get("generation")
+    except (OSError, ValueError):
+        return None
+
+
+def write_index_directory(directory: str, arrays: Dict[str, np.ndarray], manifest: Dict[str, Any]) -> bool:
+    """Write arrays and a manifest as a complete copy, then swap it in for the old directory
+
+    Every process writes into its own temporary directory, and the swap runs
+    under the directory lock that loads take shared, so API workers saving
+    the same index neither mix their files nor read a half-swapped copy.
+    A crash mid-swap leaves no index, which load_or_build rebuilds. When the
+    manifest carries a write generation, a copy older than the saved one is
+    discarded instead; returns whether the copy was swapped in.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_directory = tempfile.mkdtemp(prefix=f"{os.path.basename(directory)}.tmp-", dir=parent)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_directory, f"{name}.npy"), array)
+        with open(os.path.join(tmp_directory, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        with directory_lock(directory):
+            generation, saved = manifest.get("generation"), _saved_generation(directory)
+            if generation is not None and saved is not None and saved > generation:
+                logger.info(f"Kept the index in {directory}: generation {saved} is newer than {generation}")
+                return False
+            old_directory = f"{directory}.old"
+            shutil.rmtree(old_directory, ignore_errors=True)
+            if os.path.exists(directory):
+                os.replace(directory, old_directory)
+            os.replace(tmp_directory, directory)
+            shutil.rmtree(old_directory, ignore_errors=True)
+        return True
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+class QuantizedIndex:
+    """Quantized vectors for one collection in contiguous NumPy arrays
+
+    int8 rows are scaled per vector (symmetric, max-abs / 127); float16 rows
+    are stored as-is. Squared norms of the original float32 vectors are kept
+    so approximate distances match the collection's space. Queries are a
+    blocked brute-force scan; callers rerank the candidates exactly.
+    """
+
+    def __init__(self, dtype: IndexDtype = "int8", space: str = "l2"):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unknown index dtype: {dtype}")
+        if space not in ("l2", "cosine", "ip"):
+            raise ValueError(f"Unsupported distance space: {space}")
+
+        self.dtype = dtype
+        self.space = space
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.size = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.dirty = False
+        # Shared write generation of the collection these rows reflect
+        self.generation: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def _quantize(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.dtype == "float16":
+            return embeddings.astype(np.float16), np.ones(len(embeddings), dtype=np.float32)
+        max_abs = np.abs(embeddings).max(axis=1)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        quantized = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales
+
+    def _reserve(self, rows: int, dim: int):
+        """Grow the arrays geometrically so appends stay amortized O(1)"""
+        capacity = 0 if self.vectors is None else len(self.vectors)
+        if self.vectors is not None and self.size + rows <= capacity and self.vectors.flags.writeable:
+            return
+
+        new_capacity = max(self.size + rows, int(capacity * 1.5), 1024)
+        vectors = np.zeros((new_capacity, dim), dtype=np.int8 if self.dtype == "int8" else np.float16)
+        scales = np.zeros(new_capacity, dtype=np.float32)
+        norms = np.zeros(new_capacity, dtype=np.float32)
+        alive = np.zeros(new_capacity, dtype=bool)
+        if self.size:
+            # Copies memory-mapped arrays into memory on the first write
+            vectors[:self.size] = self.vectors[:self.size]
+            scales[:self.size] = self.scales[:self.size]
+            norms[:self.size] = self.norms[:self.size]
+            alive[:self.size] = self.alive[:self.size]
+        self.vectors, self.scales, self.norms, self.alive = vectors, scales, norms, alive
+
+    def upsert(self, ids: Sequence[str], embeddings: Any):
+        if not len(ids):
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        quantized, scales = self._quantize(embeddings)
+        norms = np.einsum("ij,ij->i", embeddings, embeddings)
+
+        with self._lock:
+            self._reserve(len(ids), embeddings.shape[1])
+            for i, item_id in enumerate(ids):
+                row = self.rows.get(item_id)
+                if row is None:
+                    row = self.size
+                    self.size += 1
+                    self.ids.append(item_id)
+                    self.rows[item_id] = row
+                self.vectors[row] = quantized[i]
+                self.scales[row] = scales[i]
+                self.norms[row] = norms[i]
+                self.alive[row] = True
+            self.dirty = True
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            for item_id in ids:
+                row = self.rows.pop(item_id, None)
+                if row is None:
+                    continue
+                self.alive[row] = False
+                self.ids[row] = None
+                self.dirty = True
+
+    def search(self, query: Sequence[float], k: int) -> List[str]:
+        """Return up to k candidate ids ordered by approximate distance"""
+        if k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        query_norm = float(query @ query)
+
+        with self._lock:
+            if not self.rows:
+                return []
+            best_ids: List[str] = []
+            best_scores = np.zeros(0, dtype=np.float32)
+            for start in range(0, self.size, SCAN_BLOCK_ROWS):
+                stop = min(start + SCAN_BLOCK_ROWS, self.size)
+                dots = (self.vectors[start:stop].astype(np.float32) @ query) * self.scales[start:stop]
+                if self.space == "l2":
+                    scores = self.norms[start:stop] + query_norm - 2 * dots
+                elif self.space == "cosine":
+                    scores = 1 - dots / np.sqrt(np.maximum(self.norms[start:stop] * query_norm, 1e-12))
+                else:
+                    scores = 1 - dots
+                scores = np.where(self.alive[start:stop], scores, np.inf)
+
+                top = min(k, len(scores))
+                candidates = np.argpartition(scores, top - 1)[:top]
+                candidates = candidates[np.isfinite(scores[candidates])]
+                best_scores = np.concatenate([best_scores, scores[candidates]])
+                best_ids.extend(self.ids[start + row] for row in candidates)
+                if len(best_ids) > k:
+                    keep = np.argpartition(best_scores, k - 1)[:k]
+                    best_scores = best_scores[keep]
+                    best_ids = [best_ids[i] for i in keep]
+
+        order = np.argsort(best_scores, kind="stable")
+        return [best_ids[i] for i in order]
+
+    def nbytes(self) -> int:
+        if self.vectors is None:
+            return 0
+        return int(
+            self.vectors[:self.size].nbytes + self.scales[:self.size].nbytes
+            + self.norms[:self.size].nbytes + self.alive[:self.size].nbytes
+        )
+
+    def save(self, directory: str):
+        """Write the live rows to directory, dropping deleted ones"""
+        with self._lock:
+            live = np.flatnonzero(self.alive[:self.size]) if self.size else np.zeros(0, dtype=np.int64)
+            arrays = {
+                "vectors": self.vectors[live] if self.vectors is not None else np.zeros((0, 0), dtype=np.int8),
+                "scales": self.scales[live],
+                "norms": self.norms[live]
+            }
+            ids = [self.ids[row] for row in live]
+            self.dirty = False
+
+        manifest = {
+            "dtype": self.dtype,
+            "space": self.space,
+            "count": len(ids),
+            "generation": self.generation,
+            "ids": ids
+        }
+        write_index_directory(directory, arrays, manifest)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> Optional["QuantizedIndex"]:
+        """Load a saved index, or return None if it is missing or inconsistent"""
+        try:
+            with directory_lock(directory, shared=True):
+                with open(os.path.join(directory, "manifest.json")) as f:
+                    manifest = json.load(f)
+                mmap_mode = "r" if mmap else None
+                vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mmap_mode)
+                scales = np.load(os.path.join(directory, "scales.npy"))
+                norms = np.load(os.path.join(directory, "norms.npy"))
+        except (OSError, ValueError) as e:
+            logger.info(f"No usable index in {directory}: {str(e)}")
+            return None
+
+        count = manifest["count"]
+        if not (len(vectors) == len(scales) == len(norms) == len(manifest["ids"]) == count):
+            logger.warning(f"Index in {directory} is inconsistent, ignoring it")
+            return None
+
+        index = cls(manifest["dtype"], manifest["space"])
+        index.ids = list(manifest["ids"])
+        index.rows = {item_id: row for row, item_id in enumerate(index.ids)}
+        index.size = count
+        index.vectors = vectors if count else None
+        index.scales = scales
+        index.norms = norms
+        index.alive = np.ones(count, dtype=bool)
+        index.generation = manifest.get("generation")
+        return index
+
+
+class ANNIndex:
+    """Compact in-process search indexes, one QuantizedIndex per collection
+
+    Indexes are loaded from disk on startup, or rebuilt from the embeddings
+    Chroma already stores when the saved copy is missing or its row count
+    no longer matches the collection. Writes are applied incrementally and
+    persisted by save().
+
+    Every API worker keeps its own copy. With generation_for (the shared
+    write generation of a collection, DocumentStore.generation), each index
+    records the generation it reflects: writes this process applies advance
+    it, and refresh() rebuilds an index that another worker's writes have
+    left behind. Only an index that is current is saved.
+    """
+
+    def __init__(
+        self,
+        directory: str = "./ann_index",
+        dtype: IndexDtype = "int8",
+        mmap: bool = True,
+        rerank_factor: int = 4,
+        page_size: int = 1000,
+        generation_for: Optional[Callable[[str], int]] = None
+    ):
+        self.directory = directory
+        self.dtype = dtype
+        self.mmap = mmap
+        self.rerank_factor = rerank_factor
+        self.page_size = page_size
+        self.generation_for = generation_for
+        self.indexes: Dict[str, QuantizedIndex] = {}
+        self.load_ms: Dict[str, float] = {}
+
+    def _path(self, collection: str) -> str:
+        return os.path.join(self.directory, collection)
+
+    def __contains__(self, collection: str) -> bool:
+        return collection in self.indexes
+
+    @staticmethod
+    def _space(chroma_collection: Any) -> str:
+        return (getattr(chroma_collection, "metadata", None) or {}).get("hnsw:space", "l2")
+
+    def load_or_build(self, vector_store: Any, collections: Iterable[str]):
+        for collection in collections:
+            start = time.perf_counter()
+            # Read before Chroma, so writes racing the build show up as a newer generation
+            generation = self._generation(collection)
+            chroma_collection = vector_store.get_collection(collection)
+            expected = chroma_collection.count()
+
+            index = QuantizedIndex.load(self._path(collection), self.mmap)
+            if index is not None and (
+                len(index) != expected or index.dtype != self.dtype or index.generation != generation
+            ):
+                logger.info(
+                    f"Saved index for {collection} is stale ({len(index)} rows, {expected} expected, "
+                    f"generation {index.generation}, {generation} expected)"
+                )
+                index = None
+            if index is None:
+                index = self._build(chroma_collection)
+                index.generation = generation
+                index.save(self._path(collection))
+
+            self.indexes[collection] = index
+            self.load_ms[collection] = round((time.perf_counter() - start) * 1000, 1)
+            logger.info(f"Loaded {self.dtype} index for {collection}: {len(index)} rows in {self.load_ms[collection]}ms")
+
+    def _generation(self, collection: str) -> Optional[int]:
+        return self.generation_for(collection) if self.generation_for is not None else None
+
+    def refresh(self, vector_store: Any, collections: Iterable[str]) -> List[str]:
+        """Rebuild the indexes that miss writes made by other processes
+
+        A stale index is dropped before its rebuild, so queries go to Chroma
+        until the replacement is swapped in. Returns the rebuilt collections.
+        """
+        if self.generation_for is None:
+            return []
+        rebuilt = []
+        for collection in collections:
+            generation = self.generation_for(collection)
+            index = self.indexes.get(collection)
+            if index is not None and index.generation == generation:
+                continue
+            self.drop(collection)
+            start = time.perf_counter()
+            index = self._build(vector_store.get_collection(collection))
+            index.generation = generation
+            self.indexes[collection] = index
+            self.load_ms[collection] = round((time.perf_counter() - start) * 1000, 1)
+            logger.info(f"Rebuilt stale {self.dtype} index for {collection} at generation {generation}")
+            rebuilt.append(collection)
+        return rebuilt
+
+    def _build(self, chroma_collection: Any) -> QuantizedIndex:
+        """Quantize the embeddings Chroma already stores; nothing is re-embedded"""
+        index = QuantizedIndex(self.dtype, self._space(chroma_collection))
+        offset = 0
+        while True:
+            page = chroma_collection.get(include=["embeddings"], limit=self.page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            index.upsert(page["ids"], page["embeddings"])
+            offset += len(page["ids"])
+        return index
+
+    def upsert(self, collection: str, ids: Sequence[str], embeddings: Any):
+        index = self.indexes.get(collection)
+        if index is not None:
+            index.upsert(ids, embeddings)
+
+    def delete(self, collection: str, ids: Iterable[str]):
+        index = self.indexes.get(collection)
+        if index is not None:
+            index.delete(ids)
+
+    def advance(self, collection: str, generation: int):
+        """Note that this process applied the write that produced generation
+
+        A gap means another process wrote in between, so the index stays
+        behind and the next refresh() rebuilds it.
+        """
+        index = self.indexes.get(collection)
+        if index is not None and index.generation is not None and generation == index.generation + 1:
+            index.generation = generation
+
+    def drop(self, collection: str):
+        """Stop serving a collection from the in-process index"""
+        self.indexes.pop(collection, None)
+        self.load_ms.pop(collection, None)
+
+
+    def rerank(
+        self,
+        chroma_collection: Any,
+        collection: str,
+        embedding: Sequence[float],
+        limit: int
+    ) -> Optional[Dict[str, Any]]:
+        """Exact float32 rerank of the candidates, shaped like a Chroma query result
+
+        None when the collection is not indexed (or was just dropped for a
+        rebuild); the caller then queries Chroma.
+        """
+        index = self.indexes.get(collection)
+        if index is None:
+            return None
+        candidate_ids = index.search(embedding, limit * self.rerank_factor)
+        if not candidate_ids:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+        stored = chroma_collection.get(
+            ids=candidate_ids,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        vectors = np.asarray(stored["embeddings"], dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        dots = vectors @ query
+        if index.space == "l2":
+            distances = np.einsum("ij,ij->i", vectors, vectors) + query @ query - 2 * dots
+        elif index.space == "cosine":
+            distances = 1 - dots / np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12)
+        else:
+            distances = 1 - dots
+
+        order = np.argsort(distances, kind="stable")[:limit]
+        return {
+            "ids": [[stored["ids"][i] for i in order]],
+            "documents": [[stored["documents"][i] for i in order]],
+            "metadatas": [[stored["metadatas"][i] for i in order]],
+            "distances": [[float(distances[i]) for i in order]]
+        }
+
+    def save(self):
+        for collection, index in list(self.indexes.items()):
+            if not index.dirty:
+                continue
+            generation = self._generation(collection)
+            if index.generation != generation:
+                # Another worker wrote since; a copy that saw those writes is rebuilt on load
+                logger.info(f"Not saving stale index for {collection} (generation {index.generation}, now {generation})")
+                continue
+            index.save(self._path(collection))
+
+    def stats(self) -> Dict[str, Any]:
+        collections = {}
+        for collection, index in self.indexes.items():
+            dim = index.dim or 0
+            collections[collection] = {
+                "rows": len(index),
+                "dim": dim,
+                "dtype": index.dtype,
+                "space": index.space,
+                "memory_bytes": index.nbytes(),
+                "float32_bytes": len(index) * dim * 4,
+                "memory_mapped": isinstance(index.vectors, np.memmap),
+                "load_ms": self.load_ms.get(collection)
+            }
+        return {"rerank_factor": self.rerank_factor, "collections": collections}
+
+    def evaluate_recall(
+        self,
+        vector_store: Any,
+        collection: str,
+        samples: int = 20,
+        k: int = 10
+    ) -> Dict[str, Any]:
+        """Recall@k of the quantized scan (before rerank) against Chroma's own query
+
+        Stored chunk embeddings are used as queries, so nothing is encoded.
+        """
+        index = self.indexes[collection]
+        chroma_collection = vector_store.get_collection(collection)
+        live_ids = list(index.rows)
+        if not live_ids:
+            return {"collection": collection, "samples": 0, "k": k, "recall": None}
+
+        sample_ids = random.sample(live_ids, min(samples, len(live_ids)))
+        stored = chroma_collection.get(ids=sample_ids, include=["embeddings"])
+        queries = np.asarray(stored["embeddings"], dtype=np.float32)
+
+        quantized_hits = 0
+        reranked_hits = 0
+        total = 0
+        for query in queries:
+            expected = chroma_collection.query(query_embeddings=[query.tolist()], n_results=k)["ids"][0]
+            expected_set = set(expected)
+            quantized = index.search(query, k)
+            reranked = self.rerank(chroma_collection, collection, query, k)["ids"][0]
+            quantized_hits += len(expected_set.intersection(quantized))
+            reranked_hits += len(expected_set.intersection(reranked))
+            total += len(expected)
+
+        return {
+            "collection": collection,
+            "samples": len(queries),
+            "k": k,
+            "recall": round(quantized_hits / total, 4) if total else None,
+            "recall_after_rerank": round(reranked_hits / total, 4) if total else None
+        }
@@ -0,0 +1,380 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from search.ann_index import directory_lock, write_index_directory
+
+logger = logging.getLogger(__name__)
+
+# Documents per block when computing all neighbour lists; bounds the
+# (block x documents) similarity matrix a rebuild holds at once
+BUILD_BLOCK_ROWS = 1024
+
+
+def content_id_of(chunk_id: str) -> str:
+    """Document id of a chunk id (content_id_<index>); other ids are their own document"""
+    prefix, _, suffix = chunk_id.rpartition("_")
+    return prefix if prefix and suffix.isdigit() else chunk_id
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def document_vector(chroma_collection: Any, content_id: str) -> Optional[List[float]]:
+    """Normalized mean of a document's stored chunk embeddings"""
+    stored = chroma_collection.get(where={"content_id": content_id}, include=["embeddings"])
+    if not stored or not len(stored["ids"]):
+        # Single-record documents such as tutorials are stored under their own id
+        stored = chroma_collection.get(ids=[content_id], include=["embeddings"])
+    if not stored or not len(stored["ids"]):
+        return None
+    return _normalize(np.asarray(stored["embeddings"], dtype=np.float32).mean(axis=0)).tolist()
+
+
+class RelatedGraph:
+    """Document vectors and top-N neighbour lists for one collection
+
+    A document is represented by the normalized mean of its chunk
+    embeddings, and neighbours are ranked by cosine similarity. Each row's
+    list is kept sorted, best first, with -1 marking unused slots.
+    """
+
+    def __init__(self, neighbours: int = 20):
+        self.neighbours = neighbours
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.size = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.neighbour_rows = np.zeros((0, neighbours), dtype=np.int32)
+        self.similarities = np.zeros((0, neighbours), dtype=np.float32)
+        self.dirty = False
+        # Shared write generation of the collection when this graph was built
+        self.generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, rows: int, dim: int):
+        capacity = 0 if self.vectors is None else len(self.vectors)
+        if self.size + rows <= capacity:
+            return
+        capacity = max(self.size + rows, capacity * 2, 64)
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        neighbour_rows = np.full((capacity, self.neighbours), -1, dtype=np.int32)
+        similarities = np.full((capacity, self.neighbours), -np.inf, dtype=np.float32)
+        if self.size:
+            vectors[:self.size] = self.vectors[:self.size]
+            neighbour_rows[:self.size] = self.neighbour_rows[:self.size]
+            similarities[:self.size] = self.similarities[:self.size]
+        self.vectors, self.neighbour_rows, self.similarities = vectors, neighbour_rows, similarities
+
+    def _resort(self, rows: np.ndarray):
+        order = np.argsort(-self.similarities[rows], axis=1, kind="stable")
+        self.similarities[rows] = np.take_along_axis(self.similarities[rows], order, axis=1)
+        self.neighbour_rows[rows] = np.take_along_axis(self.neighbour_rows[rows], order, axis=1)
+
+    def _top(self, similarities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Best N columns of each row of a similarity matrix, sorted; -1 pads short rows"""
+        count, columns = similarities.shape
+        k = min(self.neighbours, columns)
+        rows = np.full((count, self.neighbours), -1, dtype=np.int32)
+        values = np.full((count, self.neighbours), -np.inf, dtype=np.float32)
+        if k:
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_values = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_values, axis=1, kind="stable")
+            rows[:, :k] = np.take_along_axis(top, order, axis=1)
+            values[:, :k] = np.take_along_axis(top_values, order, axis=1)
+        rows[~np.isfinite(values)] = -1
+        return rows, values
+
+    def build(self, documents: Dict[str, np.ndarray]):
+        """Replace the graph with all neighbour lists of the given document vectors"""
+        ids = list(documents)
+        if not ids:
+            return
+        vectors = _normalize(np.asarray([documents[doc_id] for doc_id in ids], dtype=np.float32))
+        neighbour_rows = np.full((len(ids), self.neighbours), -1, dtype=np.int32)
+        similarities = np.full((len(ids), self.neighbours), -np.inf, dtype=np.float32)
+        for start in range(0, len(ids), BUILD_BLOCK_ROWS):
+            stop = min(start + BUILD_BLOCK_ROWS, len(ids))
+            block = vectors[start:stop] @ vectors.T
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # Not its own neighbour
+            neighbour_rows[start:stop], similarities[start:stop] = self._top(block)
+
+        with self._lock:
+            self.ids = ids
+            self.rows = {doc_id: row for row, doc_id in enumerate(ids)}
+            self.size = len(ids)
+            self.vectors, self.neighbour_rows, self.similarities = vectors, neighbour_rows, similarities
+            self.dirty = True
+
+    def add(self, documents: Dict[str, np.ndarray]):
+        """Insert or update documents, patching the lists they now belong in"""
+        for doc_id, vector in documents.items():
+            vector = _normalize(np.asarray(vector, dtype=np.float32))
+            with self._lock:
+                self._reserve(1, len(vector))
+                row = self.rows.get(doc_id)
+                if row is None:
+                    row = self.size
+                    self.size += 1
+                    self.ids.append(doc_id)
+                    self.rows[doc_id] = row
+                else:
+                    # Its vector changed, so drop it from every list it was in;
+                    # those lists are one short until the next rebuild
+                    stale = np.flatnonzero((self.neighbour_rows[:self.size] == row).any(axis=1))
+                    if len(stale):
+                        mask = self.neighbour_rows[stale] == row
+                        self.neighbour_rows[stale] = np.where(mask, -1, self.neighbour_rows[stale])
+                        self.similarities[stale] = np.where(mask, -np.inf, self.similarities[stale])
+                        self._resort(stale)
+                self.vectors[row] = vector
+
+                similarities = self.vectors[:self.size] @ vector
+                similarities[row] = -np.inf
+                self.neighbour_rows[row], self.similarities[row] = (
+                    part[0] for part in self._top(similarities[None, :])
+                )
+
+                better = np.flatnonzero(similarities > self.similarities[:self.size, -1])
+                if len(better):
+                    self.neighbour_rows[better, -1] = row
+                    self.similarities[better, -1] = similarities[better]
+                    self._resort(better)
+                self.dirty = True
+
+    def get(self, doc_id: str, k: int) -> Optional[List[Tuple[str, float]]]:
+        """Up to k (content_id, cosine distance) pairs, or None if the document is unknown"""
+        with self._lock:
+            row = self.rows.get(doc_id)
+            if row is None:
+                return None
+            return [
+                (self.ids[neighbour], round(1 - float(similarity), 6))
+                for neighbour, similarity in zip(self.neighbour_rows[row][:k], self.similarities[row][:k])
+                if neighbour >= 0
+            ]
+
+    def nbytes(self) -> int:
+        if self.vectors is None:
+            return 0
+        return int(
+            self.vectors[:self.size].nbytes + self.neighbour_rows[:self.size].nbytes
+            + self.similarities[:self.size].nbytes
+        )
+
+    def save(self, directory: str):
+        with self._lock:
+            arrays = {
+                "vectors": self.vectors[:self.size] if self.vectors is not None else np.zeros((0, 0), dtype=np.float32),
+                "neighbours": self.neighbour_rows[:self.size],
+                "similarities": self.similarities[:self.size]
+            }
+            arrays = {name: array.copy() for name, array in arrays.items()}
+            manifest = {
+                "neighbours": self.neighbours,
+                "count": self.size,
+                "generation": self.generation,
+                "ids": list(self.ids)
+            }
+            self.dirty = False
+
+        # Same locked swap as the ANN index: a complete copy replaces the old directory
+        write_index_directory(directory, arrays, manifest)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["RelatedGraph"]:
+        try:
+            with directory_lock(directory, shared=True):
+                with open(os.path.join(directory, "manifest.json")) as f:
+                    manifest = json.load(f)
+                vectors = np.load(os.path.join(directory, "vectors.npy"))
+                neighbour_rows = np.load(os.path.join(directory, "neighbours.npy"))
+                similarities = np.load(os.path.join(directory, "similarities.npy"))
+        except (OSError, ValueError) as e:
+            logger.info(f"No usable related-content index in {directory}: {str(e)}")
+            return None
+
+        count = manifest["count"]
+        if not (len(vectors) == len(neighbour_rows) == len(similarities) == len(manifest["ids"]) == count):
+            logger.warning(f"Related-content index in {directory} is inconsistent, ignoring it")
+            return None
+
+        graph = cls(manifest["neighbours"])
+        graph.ids = list(manifest["ids"])
+        graph.rows = {doc_id: row for row, doc_id in enumerate(graph.ids)}
+        graph.size = count
+        graph.generation = manifest.get("generation")
+        if count:
+            graph.vectors, graph.neighbour_rows, graph.similarities = vectors, neighbour_rows, similarities
+        return graph
+
+
+class RelatedIndex:
+    """Precomputed related documents per content_id, one RelatedGraph per collection
+
+    Graphs are built from the chunk embeddings Chroma already stores, loaded
+    from disk on later starts, and patched incrementally as content is
+    ingested. Incremental inserts only ever add a new document to existing
+    lists, so a periodic rebuild() restores exact lists; writes that land
+    while a rebuild runs are replayed onto the new graph.
+
+    Only writes made in this process are patched in. With generation_for
+    (the shared write generation of a collection, DocumentStore.generation),
+    needs_rebuild() also reports graphs that writes from other worker
+    processes have left behind.
+    """
+
+    def __init__(
+        self,
+        directory: str = "./related_index",
+        neighbours: int = 20,
+        page_size: int = 1000,
+        generation_for: Optional[Callable[[str], int]] = None
+    ):
+        self.directory = directory
+        self.neighbours = neighbours
+        self.generation_for = generation_for
+        self.page_size = page_size
+        self.graphs: Dict[str, RelatedGraph] = {}
+        self.updates_since_rebuild: Dict[str, int] = {}
+        self.build_ms: Dict[str, float] = {}
+        # collection -> writes seen while that collection is being rebuilt
+        self._replay: Dict[str, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, collection: str) -> str:
+        return os.path.join(self.directory, collection)
+
+    def __contains__(self, collection: str) -> bool:
+        return collection in self.graphs
+
+    def _document_vectors(self, chroma_collection: Any) -> Dict[str, np.ndarray]:
+        """Mean chunk embedding per document, read page by page from Chroma"""
+        sums: Dict[str, np.ndarray] = {}
+        offset = 0
+        while True:
+            page = chroma_collection.get(include=["embeddings"], limit=self.page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            for chunk_id, embedding in zip(page["ids"], embeddings):
+                doc_id = content_id_of(chunk_id)
+                if doc_id in sums:
+                    sums[doc_id] += embedding
+                else:
+                    sums[doc_id] = embedding.copy()
+            offset += len(page["ids"])
+        # The graph normalizes, so sums rank the same as means
+        return sums
+
+    def load_or_build(self, vector_store: Any, collections: Iterable[str]):
+        for collection in collections:
+            graph = RelatedGraph.load(self._path(collection))
+            if graph is not None and graph.neighbours == self.neighbours:
+                self.graphs[collection] = graph
+                self.updates_since_rebuild.setdefault(collection, 0)
+                logger.info(f"Loaded related-content index for {collection}: {len(graph)} documents")
+            else:
+                self.rebuild(vector_store, collection)
+
+    def needs_rebuild(self, collection: str) -> bool:
+        """Whether a collection has no graph or has been written to since its graph was built"""
+        graph = self.graphs.get(collection)
+        if graph is None or self.updates_since_rebuild.get(collection):
+            return True
+        # Writes by other processes never reach this graph's incremental updates
+        return self.generation_for is not None and graph.generation != self.generation_for(collection)
+
+    def rebuild(self, vector_store: Any, collection: str):
+        """Recompute every neighbour list of a collection, then swap it in"""
+        start = time.perf_counter()
+        with self._lock:
+            self._replay[collection] = {}
+            self.updates_since_rebuild[collection] = 0
+        try:
+            # Read before Chroma, so writes racing the build show up as a newer generation
+            generation = self.generation_for(collection) if self.generation_for is not None else None
+            graph = RelatedGraph(self.neighbours)
+            graph.generation = generation
+            graph.build(self._document_vectors(vector_store.get_collection(collection)))
+        except Exception:
+            with self._lock:
+                # Still out of date, so the next maintenance round retries it
+                self.updates_since_rebuild[collection] += 1
+            raise
+        finally:
+            with self._lock:
+                replay = self._replay.pop(collection)
+        if replay:
+            graph.add(replay)
+        with self._lock:
+            self.graphs[collection] = graph
+        graph.save(self._path(collection))
+        self.build_ms[collection] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Built related-content index for {collection}: {len(graph)} documents in {self.build_ms[collection]}ms")
+
+    def update(self, collection: str, ids: Sequence[str], embeddings: Any):
+        """Add or refresh the documents whose chunks were just written
+
+        ids must cover every chunk of each document, as ingestion writes them.
+        """
+        sums: Dict[str, np.ndarray] = {}
+        for chunk_id, embedding in zip(ids, np.asarray(embeddings, dtype=np.float32)):
+            doc_id = content_id_of(chunk_id)
+            sums[doc_id] = sums[doc_id] + embedding if doc_id in sums else embedding.copy()
+        if not sums:
+            return
+
+        with self._lock:
+            graph = self.graphs.get(collection)
+            if collection in self._replay:
+                self._replay[collection].update(sums)
+            self.updates_since_rebuild[collection] = self.updates_since_rebuild.get(collection, 0) + len(sums)
+        if graph is not None:
+            graph.add(sums)
+
+    def get(self, collection: str, content_id: str, k: int) -> Optional[List[Tuple[str, float]]]:
+        graph = self.graphs.get(collection)
+        return graph.get(content_id, k) if graph is not None else None
+
+    def add_from_store(self, chroma_collection: Any, collection: str, content_id: str) -> bool:
+        """Add one document missing from the graph using its stored chunk vectors
+
+        Its neighbour list is computed in-process, so nothing is re-encoded.
+        Returns False if the collection has no graph or the document no vectors.
+        """
+        if collection not in self.graphs:
+            return False
+        vector = document_vector(chroma_collection, content_id)
+        if vector is None:
+            return False
+        self.update(collection, [content_id], [vector])
+        return True
+
+    def save(self):
+        for collection, graph in list(self.graphs.items()):
+            if graph.dirty:
+                graph.save(self._path(collection))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "neighbours": self.neighbours,
+            "collections": {
+                collection: {
+                    "documents": len(graph),
+                    "memory_bytes": graph.nbytes(),
+                    "updates_since_rebuild": self.updates_since_rebuild.get(collection, 0),
+                    "build_ms": self.build_ms.get(collection)
+                }
+                for collection, graph in self.graphs.items()
+            }
+        }
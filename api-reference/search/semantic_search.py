@@ -0,0 +1,479 @@
+from typing import List, Optional, Dict, Any, Set, Tuple
+from dataclasses import asdict, dataclass
+import asyncio
+from db.vector_store import VectorStore
+from embeddings.generator import EmbeddingGenerator
+from embeddings.batcher import EmbeddingBatcher
+from search.cache import TTLCache
+from db.document_store import DocumentStore
+from search.ann_index import ANNIndex
+from search.related_index import RelatedIndex, content_id_of, document_vector
+from observability.metrics import span
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Collapsed searches fetch this many chunks per requested document, doubling
+# until enough distinct documents are found or COLLAPSE_MAX_FETCH is reached
+COLLAPSE_OVERFETCH = 4
+COLLAPSE_MAX_FETCH = 256
+
+# Filters matching more documents than this are applied to an over-fetched
+# query instead of as a content_id $in clause, over-fetching the same way
+FILTER_MAX_IDS = 500
+FILTER_OVERFETCH = 8
+FILTER_MAX_FETCH = 1024
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Document-level filters, resolved to content_ids through the DocumentStore
+
+    Dates compare as ISO-8601 strings, so "2024" and "2024-06-01" both work.
+    """
+    author: Optional[str] = None
+    content_type: Optional[str] = None
+    published_after: Optional[str] = None
+    published_before: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return any(value is not None for value in asdict(self).values())
+
+
+class SemanticSearch:
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embedding_generator: EmbeddingGenerator,
+        embedding_batcher: Optional[EmbeddingBatcher] = None,
+        embedding_cache_size: int = 2048,
+        result_cache_size: int = 1024,
+        cache_ttl_seconds: Optional[float] = 600,
+        query_timeout_seconds: float = 5.0,
+        document_store: Optional[DocumentStore] = None,
+        ann_index: Optional[ANNIndex] = None,
+        related_index: Optional[RelatedIndex] = None
+    ):
+        self.vector_store = vector_store
+        self.embedding_generator = embedding_generator
+        self.embedding_batcher = embedding_batcher
+        # Level 1: (model, normalized query) -> embedding
+        self.embedding_cache = TTLCache(embedding_cache_size, cache_ttl_seconds)
+        # Level 2: (normalized query, collection, limit, filters, collapse, target, generation)
+        # -> formatted results; the shared write generation retires entries after a write in any worker
+        self.result_cache = TTLCache(result_cache_size, cache_ttl_seconds)
+        self.query_timeout_seconds = query_timeout_seconds
+        self.document_store = document_store
+        # Collections indexed here are queried in-process instead of through Chroma
+        self.ann_index = ann_index
+        # Precomputed related documents served by similar()
+        self.related_index = related_index
+        # collection -> (Chroma collection, query encoder) for collections switched
+        # to a re-embedded copy; replaced whole, so readers never see half a switch
+        self.routes: Dict[str, Tuple[str, EmbeddingGenerator]] = {}
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        # Tokenizers split on whitespace, so spacing never changes the embedding;
+        # case is kept because cased models (and migration targets) encode it
+        return " ".join(query.split())
+
+    async def _embed_query(self, query: str, embedding_generator: Optional[EmbeddingGenerator] = None) -> List[float]:
+        """Encode a query, sharing encode batches with other requests when possible"""
+        embedding_generator = embedding_generator or self.embedding_generator
+        normalized = self._normalize_query(query)
+        key = (embedding_generator.model_name, normalized)
+        embedding = self.embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+
+        with span("query-embed"):
+            if self.embedding_batcher is not None and embedding_generator is self.embedding_generator:
+                embedding = (await self.embedding_batcher.generate([normalized]))[0]
+            else:
+                embedding = (await embedding_generator.agenerate([normalized]))[0]
+        self.embedding_cache.set(key, embedding)
+        return embedding
+
+    def _route(self, collection: str) -> Tuple[str, EmbeddingGenerator]:
+        """The Chroma collection that serves a collection's reads, and its query encoder"""
+        return self.routes.get(collection, (collection, self.embedding_generator))
+
+    def read_collection(self, collection: str) -> str:
+        """Name of the Chroma collection that currently holds a collection's chunks"""
+        return self._route(collection)[0]
+
+    def switch_collection(self, collection: str, target: str, embedding_generator: EmbeddingGenerator):
+        """Serve a collection's reads from target, a copy re-embedded by embedding_generator
+
+        Queries already running finish against the old collection; cached
+        results are keyed by target, so none of them are served after the switch.
+        """
+        if self.routes.get(collection, (None, None))[0] == target:
+            return
+        routes = dict(self.routes)
+        routes[collection] = (target, embedding_generator)
+        self.routes = routes
+        if self.ann_index is not None:
+            # The in-process index holds the old model's vectors
+            self.ann_index.drop(collection)
+        self.invalidate_collection(collection)
+        logger.info(f"Collection {collection} now reads {target} ({embedding_generator.model_name})")
+
+    async def _generation(self, collection: str) -> Optional[int]:
+        """Shared write generation of a collection, read before querying it
+
+        Results cached under an older generation are never looked up again,
+        including those a query that raced the write stores afterwards.
+        """
+        if self.document_store is None:
+            return None
+        return await asyncio.to_thread(self.document_store.generation, collection)
+
+    def invalidate_collection(self, collection: str) -> int:
+        """Drop cached results for a collection after it has been written to (frees them early)"""
+        removed = self.result_cache.invalidate(lambda key: key[1] == collection)
+        logger.debug(f"Invalidated {removed} cached results for collection {collection}")
+        return removed
+
+    def update_index(
+        self,
+        collection: str,
+        ids: List[str],
+        embeddings: List[List[float]],
+        deleted_ids: Optional[List[str]] = None,
+        generation: Optional[int] = None
+    ):
+        """Apply a collection write to the in-process indexes that are configured
+
+        generation is the shared write generation the writer's bump returned
+        (DocumentStore.put_many / bump_generation); it lets the ANN index tell
+        this write from writes made by other processes.
+        """
+        if self.related_index is not None:
+            self.related_index.update(collection, ids, embeddings)
+        if self.ann_index is None or collection in self.routes:
+            return
+        self.ann_index.upsert(collection, ids, embeddings)
+        if deleted_ids:
+            self.ann_index.delete(collection, deleted_ids)
+        if generation is not None:
+            self.ann_index.advance(collection, generation)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "query_embeddings": self.embedding_cache.stats(),
+            "results": self.result_cache.stats()
+        }
+
+    def _format_results(self, results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flatten a Chroma query response into a list of search results"""
+        if not results or not results.get("ids"):
+            return []
+
+        distances = results.get("distances") or [[None] * len(results["ids"][0])]
+        metadatas = results["metadatas"][0]
+        if self.document_store is not None:
+            metadatas = self.document_store.hydrate(metadatas)
+        return [
+            {
+                "id": result_id,
+                "content": document,
+                "metadata": metadata or {},
+                "distance": distance
+            }
+            for result_id, document, metadata, distance in zip(
+                results["ids"][0],
+                results["documents"][0],
+                metadatas,
+                distances[0]
+            )
+        ]
+
+    def _where(
+        self, collection: str, filters: Optional[SearchFilters]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Set[str]]]:
+        """Translate filters into a where clause on the chunks' content_id
+
+        Returns (where, content_ids): where is {} when no document matches, so
+        the vector query can be skipped. Past FILTER_MAX_IDS documents an $in
+        clause gets slow, so where is None and the matching content_ids are
+        returned instead, for the caller to post-filter an over-fetched query.
+        """
+        if not filters:
+            return None, None
+        if self.document_store is None:
+            raise ValueError("Search filters need a document store")
+        content_ids = self.document_store.find_content_ids(collection, **asdict(filters))
+        if not content_ids:
+            return {}, None
+        if len(content_ids) > FILTER_MAX_IDS:
+            return None, set(content_ids)
+        return {"content_id": {"$in": content_ids}}, None
+
+    @staticmethod
+    def _keep(
+        results: Dict[str, Any],
+        limit: int,
+        collapse: bool = False,
+        content_ids: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
+        """Keep the best-ranked limit chunks, of content_ids only and one per content_id with collapse"""
+        seen = set()
+        keep = []
+        for i, metadata in enumerate(results["metadatas"][0]):
+            content_id = (metadata or {}).get("content_id", results["ids"][0][i])
+            if content_ids is not None and content_id not in content_ids:
+                continue
+            if not collapse or content_id not in seen:
+                seen.add(content_id)
+                keep.append(i)
+                if len(keep) == limit:
+                    break
+        return {
+            key: [[values[0][i] for i in keep]]
+            for key, values in results.items()
+            if key in ("ids", "documents", "metadatas", "distances") and values
+        }
+
+    def _query_collection(
+        self,
+        embedding: List[float],
+        collection: str,
+        limit: int,
+        filters: Optional[SearchFilters] = None,
+        collapse: bool = False,
+        target: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Query target, the Chroma collection serving collection (itself by default)"""
+        target = target or collection
+        chroma_collection = self.vector_store.get_collection(target)
+        where, content_ids = self._where(collection, filters)
+        if where == {}:
+            return []
+
+        fetch = limit * COLLAPSE_OVERFETCH if collapse else limit
+        max_fetch = COLLAPSE_MAX_FETCH
+        if content_ids is not None:
+            fetch, max_fetch = limit * FILTER_OVERFETCH, FILTER_MAX_FETCH
+        while True:
+            with span("vector-query", detail=collection):
+                # The in-process index cannot apply a where clause, so those queries go to Chroma
+                results = None
+                if where is None and target == collection and self.ann_index is not None:
+                    results = self.ann_index.rerank(chroma_collection, collection, embedding, fetch)
+                if results is None:
+                    results = chroma_collection.query(
+                        query_embeddings=[embedding],
+                        n_results=fetch,
+                        where=where
+                    )
+            if not (collapse or content_ids is not None) or not results or not results.get("ids"):
+                break
+            returned = len(results["ids"][0])
+            results = self._keep(results, limit, collapse, content_ids)
+            if len(results["ids"][0]) >= limit or returned < fetch or fetch >= max_fetch:
+                break
+            fetch = min(fetch * 2, max_fetch)
+        # Only the final top-k is hydrated and returned
+        return self._format_results(results)
+
+    async def _cached_query(
+        self,
+        query: str,
+        collection: str,
+        limit: int,
+        filters: Optional[SearchFilters] = None,
+        collapse: bool = False
+    ) -> List[Dict[str, Any]]:
+        # Resolved once, so the query is encoded by the model its collection was embedded with
+        target, embedding_generator = self._route(collection)
+        generation = await self._generation(collection)
+        key = (self._normalize_query(query), collection, limit, filters, collapse, target, generation)
+        results = self.result_cache.get(key)
+        if results is None:
+            embedding = await self._embed_query(query, embedding_generator)
+            results = await self._query_with_timeout(embedding, collection, limit, filters, collapse, target)
+            self.result_cache.set(key, results)
+        return results
+
+    async def search(
+        self,
+        query: str,
+        collection: str,
+        limit: int = 5,
+        filters: Optional[SearchFilters] = None,
+        collapse: bool = False
+    ) -> Dict[str, Any]:
+        """Search a single collection
+
+        filters narrow the query inside the vector store; collapse returns
+        only the best chunk of each document.
+        """
+        return {"results": await self._cached_query(query, collection, limit, filters, collapse)}
+
+    async def _query_with_timeout(
+        self,
+        embedding: List[float],
+        collection: str,
+        limit: int,
+        filters: Optional[SearchFilters] = None,
+        collapse: bool = False,
+        target: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Run a blocking Chroma query in a worker thread, bounded by the query timeout"""
+        return await asyncio.wait_for(
+            asyncio.to_thread(self._query_collection, embedding, collection, limit, filters, collapse, target),
+            timeout=self.query_timeout_seconds
+        )
+
+    def _related_metadata(self, collection: str, content_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = self.document_store.get_many(content_ids) if self.document_store is not None else {}
+        missing = [content_id for content_id in content_ids if content_id not in found]
+        if missing:
+            # Single-record documents (tutorials) keep their metadata in Chroma
+            stored = self.vector_store.get_collection(collection).get(ids=missing, include=["metadatas"])
+            found.update(zip(stored["ids"], stored["metadatas"]))
+        return found
+
+    def _similar(self, collection: str, content_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        content_id = content_id_of(content_id)
+        related = None
+        if self.related_index is not None:
+            related = self.related_index.get(collection, content_id, limit)
+            if related is None and self.related_index.add_from_store(
+                self.vector_store.get_collection(collection), collection, content_id
+            ):
+                related = self.related_index.get(collection, content_id, limit)
+
+        if related is None:
+            # No graph for this collection yet: query Chroma with the stored
+            # vector, one hit per document, instead of re-encoding the text
+            target, _ = self._route(collection)
+            vector = document_vector(self.vector_store.get_collection(target), content_id)
+            if vector is None:
+                return None
+            results = self._query_collection(vector, collection, limit + 1, collapse=True, target=target)
+            related = [
+                (result["metadata"].get("content_id") or content_id_of(result["id"]), result["distance"])
+                for result in results
+            ]
+            related = [(related_id, distance) for related_id, distance in related if related_id != content_id][:limit]
+
+        metadata = self._related_metadata(collection, [related_id for related_id, _ in related])
+        return [
+            {"content_id": related_id, "metadata": metadata.get(related_id) or {}, "distance": distance}
+            for related_id, distance in related
+        ]
+
+    async def similar(self, collection: str, content_id: str, limit: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Documents related to a content_id, or None if it has no stored vectors
+
+        Served from the precomputed related-content index when possible.
+        """
+        return await asyncio.wait_for(
+            asyncio.to_thread(self._similar, collection, content_id, limit),
+            timeout=self.query_timeout_seconds
+        )
+
+    async def search_multi(
+        self,
+        query: str,
+        collections: List[str],
+        limit_per_collection: int = 3,
+        merged_limit: Optional[int] = None,
+        filters: Optional[SearchFilters] = None,
+        collapse: bool = False
+    ) -> Dict[str, Any]:
+        """Search several collections concurrently with a single query embedding
+
+        Collections that fail or time out come back empty and are listed in
+        "errors" so the remaining results are still returned. When
+        merged_limit is set, "merged" holds the global top-k ranked by
+        distance. Distances are only comparable within one embedding model,
+        so after a migration has switched some collections to another model
+        the merge covers only the collections encoded like the first one;
+        the rest are listed in "unmerged".
+        """
+        normalized = self._normalize_query(query)
+        collection_results: Dict[str, List[Dict[str, Any]]] = {}
+        errors: Dict[str, str] = {}
+        # The global top-k can come from a single collection, so each one is
+        # queried deep enough for the merge and trimmed to its own limit afterwards
+        query_limit = max(limit_per_collection, merged_limit or 0)
+
+        pending = []
+        routes = {collection: self._route(collection) for collection in dict.fromkeys(collections)}
+        generations = dict(zip(routes, await asyncio.gather(*(self._generation(c) for c in routes))))
+        for collection, (target, _) in routes.items():
+            cached = self.result_cache.get(
+                (normalized, collection, query_limit, filters, collapse, target, generations[collection])
+            )
+            if cached is not None:
+                collection_results[collection] = cached
+            else:
+                pending.append(collection)
+
+        if pending:
+            # Encode once per model and share the embedding across every collection query
+            embeddings: Dict[str, List[float]] = {}
+            for collection in pending:
+                embedding_generator = routes[collection][1]
+                if embedding_generator.model_name not in embeddings:
+                    embeddings[embedding_generator.model_name] = await self._embed_query(query, embedding_generator)
+            outcomes = await asyncio.gather(
+                *(
+                    self._query_with_timeout(
+                        embeddings[routes[collection][1].model_name],
+                        collection,
+                        query_limit,
+                        filters,
+                        collapse,
+                        routes[collection][0]
+                    )
+                    for collection in pending
+                ),
+                return_exceptions=True
+            )
+
+            for collection, outcome in zip(pending, outcomes):
+                if isinstance(outcome, BaseException):
+                    if isinstance(outcome, asyncio.TimeoutError):
+                        errors[collection] = f"Timed out after {self.query_timeout_seconds}s"
+                    else:
+                        errors[collection] = str(outcome)
+                    logger.warning(f"Search in collection {collection} failed: {errors[collection]}")
+                    collection_results[collection] = []
+                else:
+                    collection_results[collection] = outcome
+                    self.result_cache.set(
+                        (
+                            normalized, collection, query_limit, filters, collapse,
+                            routes[collection][0], generations[collection]
+                        ),
+                        outcome
+                    )
+
+        response: Dict[str, Any] = {
+            "collections": {
+                collection: results[:limit_per_collection]
+                for collection, results in collection_results.items()
+            },
+            "errors": errors
+        }
+
+        if merged_limit:
+            merge_model = routes[next(iter(routes))][1].model_name
+            mergeable = [c for c, (_, generator) in routes.items() if generator.model_name == merge_model]
+            merged = [
+                {**result, "collection": collection}
+                for collection in mergeable
+                for result in collection_results[collection]
+            ]
+            merged.sort(
+                key=lambda r: r["distance"] if r["distance"] is not None else float("inf")
+            )
+            response["merged"] = merged[:merged_limit]
+            response["unmerged"] = [collection for collection in routes if collection not in mergeable]
+
+        return response
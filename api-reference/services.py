@@ -0,0 +1,606 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from functools import cached_property
+from typing import Any, Dict, Iterator, List, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from db.vector_store import VectorStore
+from db.task_store import SQLiteTaskStore
+from db.document_store import DocumentStore
+from db.tutorial_store import TutorialStore
+from db.bulk_job_store import BulkJobStore
+from db.migration_store import MigrationStore
+from embeddings.generator import EmbeddingGenerator
+from embeddings.batcher import EmbeddingBatcher
+from processors.browser_pool import BrowserPool
+from processors.chunking import Chunker, build_chunker
+from ingestion.dedup import ChunkEmbeddingCache
+from ingestion.scheduler import IngestionScheduler
+from ingestion.bulk import BulkIngestor
+from ingestion.migration import CollectionMigrator, RouteWriter
+from generators.tutorial import TutorialGenerator
+from search.semantic_search import SemanticSearch
+from search.ann_index import ANNIndex
+from search.related_index import RelatedIndex
+from llm.base import LLMClient
+from llm.factory import LLMFactory
+from llm.cache import CachedLLMClient, LLMResponseCache
+from llm.manager import LLMClientManager
+from observability.metrics import Sample
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMNotConfiguredError(RuntimeError):
+    """Raised when a route needs the LLM but no provider or API key is set"""
+
+
+class ServiceContainer:
+    """Owns every long-lived service of the API process
+
+    Services are built on first access rather than at import time, so
+    importing main.py is cheap and a missing LLM key only disables the
+    tutorial routes. startup() builds and warms the services in the order
+    requests need them: search becomes usable once the model has run a
+    warm-up encode, and the container is ready once ingestion has started.
+    """
+
+    def __init__(self):
+        self._background: List[asyncio.Task] = []
+        # Encoders for re-embedded collections, by model name
+        self._migration_generators: Dict[str, EmbeddingGenerator] = {}
+        self._migration_generators_lock = threading.Lock()
+        self.created_at = time.perf_counter()
+        self.search_warm = asyncio.Event()
+        self.ready = False
+        self.import_seconds: Optional[float] = None
+        self.startup_seconds: Dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+        self.startup_error: Optional[str] = None
+
+    def _built(self, name: str) -> bool:
+        # cached_property stores the value in the instance dict once built
+        return name in self.__dict__
+
+    @cached_property
+    def vector_store(self) -> VectorStore:
+        return VectorStore()
+
+    @cached_property
+    def content_task_store(self) -> SQLiteTaskStore:
+        return SQLiteTaskStore(self._task_store_path, namespace="content", ttl_seconds=self._task_ttl_seconds)
+
+    @cached_property
+    def tutorial_task_store(self) -> SQLiteTaskStore:
+        return SQLiteTaskStore(self._task_store_path, namespace="tutorial", ttl_seconds=self._task_ttl_seconds)
+
+    @property
+    def _task_store_path(self) -> str:
+        return os.getenv("TASK_STORE_PATH", "./tasks.db")
+
+    @property
+    def _task_ttl_seconds(self) -> float:
+        return float(os.getenv("TASK_TTL_SECONDS", str(24 * 3600)))
+
+    @cached_property
+    def document_store(self) -> DocumentStore:
+        return DocumentStore(os.getenv("DOCUMENT_STORE_PATH", "./documents.db"))
+
+    @cached_property
+    def tutorial_store(self) -> TutorialStore:
+        return TutorialStore(
+            os.getenv("TUTORIAL_STORE_PATH", "./tutorials.db"),
+            cache_size=int(os.getenv("TUTORIAL_CACHE_SIZE", "256"))
+        )
+
+    @cached_property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        # Unset: the default model, or with the remote backend whatever the server runs
+        return self._new_embedding_generator(os.getenv("EMBEDDING_MODEL") or None)
+
+    def _new_embedding_generator(self, model_name: Optional[str]) -> EmbeddingGenerator:
+        return EmbeddingGenerator(
+            model_name,
+            backend=os.getenv("EMBEDDING_BACKEND", "thread"),
+            max_workers=int(os.getenv("EMBEDDING_WORKERS", "1")),
+            # Used by the "remote" backend, shared by every uvicorn worker
+            socket_path=os.getenv("EMBEDDING_SOCKET", "./embeddings.sock")
+        )
+
+    @cached_property
+    def embedding_batcher(self) -> EmbeddingBatcher:
+        return EmbeddingBatcher(
+            self.embedding_generator,
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64")),
+            max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+        )
+
+    @cached_property
+    def llm_cache(self) -> LLMResponseCache:
+        ttl = os.getenv("LLM_CACHE_TTL_SECONDS")
+        return LLMResponseCache(
+            os.getenv("LLM_CACHE_PATH", "./llm_cache.db"),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            ttl_seconds=float(ttl) if ttl else None
+        )
+
+    @property
+    def llm_configured(self) -> bool:
+        return bool(os.getenv("LLM_PROVIDER") or settings.ANTHROPIC_API_KEY or settings.OPENAI_API_KEY)
+
+    def _llm_provider_config(self, provider: str, api_key: str) -> Dict[str, Any]:
+        prefix = f"LLM_{provider.upper()}"
+        return {
+            "provider": provider,
+            "api_key": api_key,
+            "limits": {
+                # 0 leaves a limit off; set these to the account's provider quotas
+                "requests_per_minute": float(os.getenv(f"{prefix}_RPM", "0")),
+                "tokens_per_minute": float(os.getenv(f"{prefix}_TPM", "0")),
+                "max_concurrency": int(os.getenv(f"{prefix}_MAX_CONCURRENCY", os.getenv("LLM_MAX_CONCURRENCY", "8"))),
+                "max_retries": int(os.getenv("LLM_MAX_RETRIES", "3"))
+            }
+        }
+
+    @cached_property
+    def llm_manager(self) -> LLMClientManager:
+        """Rate-limited provider clients with failover, shared by every LLM call"""
+        provider = os.getenv("LLM_PROVIDER")
+        if provider:
+            # Any provider registered with LLMFactory (e.g. the benchmark stub)
+            providers = [self._llm_provider_config(provider, os.getenv("LLM_API_KEY", ""))]
+        else:
+            keys = {"anthropic": settings.ANTHROPIC_API_KEY, "openai": settings.OPENAI_API_KEY}
+            primary = os.getenv("LLM_PRIMARY_PROVIDER", "anthropic")
+            # Preferred provider first; the other one, if it has a key, is the fallback
+            order = sorted(keys, key=lambda name: name != primary)
+            providers = [self._llm_provider_config(name, keys[name]) for name in order if keys[name]]
+        if not providers:
+            raise LLMNotConfiguredError("No LLM API keys configured")
+
+        p95 = os.getenv("LLM_FAILOVER_P95_SECONDS")
+        return LLMFactory.create_manager(
+            providers,
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_error_rate=float(os.getenv("LLM_FAILOVER_MAX_ERROR_RATE", "0.5")),
+            max_p95_seconds=float(p95) if p95 else None,
+            cooldown_seconds=float(os.getenv("LLM_FAILOVER_COOLDOWN_SECONDS", "60"))
+        )
+
+    @cached_property
+    def llm_client(self) -> LLMClient:
+        manager = self.llm_manager
+        return CachedLLMClient(manager, self.llm_cache, manager.clients[0].provider)
+
+    @cached_property
+    def ann_index(self) -> Optional[ANNIndex]:
+        # Optional in-process quantized index; unset ANN_INDEX_DTYPE keeps every query in Chroma
+        dtype = os.getenv("ANN_INDEX_DTYPE")
+        if not dtype:
+            return None
+        return ANNIndex(
+            os.getenv("ANN_INDEX_PATH", "./ann_index"),
+            dtype=dtype,
+            mmap=os.getenv("ANN_INDEX_MMAP", "true").lower() == "true",
+            rerank_factor=int(os.getenv("ANN_INDEX_RERANK_FACTOR", "4")),
+            # Shared across workers, so each one notices chunks the others wrote
+            generation_for=self.document_store.generation
+        )
+
+    @property
+    def _ann_collections(self) -> List[str]:
+        return os.getenv("ANN_INDEX_COLLECTIONS", "article,youtube,tutorial").split(",")
+
+    async def _refresh_ann_index(self):
+        """Rebuild ANN indexes that writes from other worker processes have left behind"""
+        interval = float(os.getenv("ANN_INDEX_REFRESH_SECONDS", "10"))
+        while True:
+            await asyncio.sleep(interval)
+            # Routed collections are served from their migration target, never the index
+            collections = [c for c in self._ann_collections if c not in self.semantic_search.routes]
+            try:
+                await asyncio.to_thread(self.ann_index.refresh, self.vector_store, collections)
+            except Exception as e:
+                logger.error(f"Refreshing the ANN index failed: {str(e)}", exc_info=True)
+
+    @cached_property
+    def related_index(self) -> RelatedIndex:
+        return RelatedIndex(
+            os.getenv("RELATED_INDEX_PATH", "./related_index"),
+            neighbours=int(os.getenv("RELATED_INDEX_NEIGHBOURS", "20")),
+            # Shared across workers, so each one also rebuilds after the others' writes
+            generation_for=self.document_store.generation
+        )
+
+    @property
+    def _related_collections(self) -> List[str]:
+        return os.getenv("RELATED_INDEX_COLLECTIONS", "article,youtube,tutorial").split(",")
+
+    async def _maintain_related_index(self):
+        """Load or build the related-content index, then rebuild collections that changed
+
+        A collection that fails to load or rebuild is logged and retried on the
+        next round; the others are maintained as usual.
+        """
+        interval = float(os.getenv("RELATED_INDEX_REBUILD_SECONDS", "3600"))
+        for collection in self._related_collections:
+            try:
+                await asyncio.to_thread(self.related_index.load_or_build, self.vector_store, [collection])
+            except Exception as e:
+                logger.error(f"Loading the related-content index for {collection} failed: {str(e)}", exc_info=True)
+        while True:
+            await asyncio.sleep(interval)
+            for collection in self._related_collections:
+                index = self.related_index
+                try:
+                    if not await asyncio.to_thread(index.needs_rebuild, collection):
+                        continue
+                    await asyncio.to_thread(index.rebuild, self.vector_store, collection)
+                except Exception as e:
+                    logger.error(f"Rebuilding the related index for {collection} failed: {str(e)}", exc_info=True)
+
+    @cached_property
+    def tutorial_generator(self) -> TutorialGenerator:
+        return TutorialGenerator(
+            self.llm_client,
+            self.vector_store,
+            self.embedding_generator,
+            self.document_store,
+            window_tokens=int(os.getenv("TUTORIAL_WINDOW_TOKENS", "3000")),
+            map_concurrency=int(os.getenv("TUTORIAL_MAP_CONCURRENCY", "4")),
+            max_total_tokens=int(os.getenv("TUTORIAL_MAX_TOTAL_TOKENS", "60000")),
+            semantic_search=self.semantic_search,
+            tutorial_store=self.tutorial_store
+        )
+
+    @cached_property
+    def semantic_search(self) -> SemanticSearch:
+        return SemanticSearch(
+            self.vector_store,
+            self.embedding_generator,
+            self.embedding_batcher,
+            embedding_cache_size=int(os.getenv("SEARCH_EMBEDDING_CACHE_SIZE", "2048")),
+            result_cache_size=int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024")),
+            cache_ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600")),
+            query_timeout_seconds=float(os.getenv("SEARCH_QUERY_TIMEOUT_SECONDS", "5")),
+            document_store=self.document_store,
+            ann_index=self.ann_index,
+            related_index=self.related_index
+        )
+
+    # Scraping resources owned by the application and leased per article/video
+    @cached_property
+    def browser_pool(self) -> BrowserPool:
+        return BrowserPool(
+            size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+            contexts_per_browser=int(os.getenv("BROWSER_CONTEXTS_PER_BROWSER", "4")),
+            max_pages_per_context=int(os.getenv("BROWSER_MAX_PAGES_PER_CONTEXT", "50"))
+        )
+
+    @cached_property
+    def http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        )
+
+    @cached_property
+    def transcript_session(self) -> requests.Session:
+        # The transcript client is synchronous, so it gets its own keep-alive pool
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @cached_property
+    def chunker(self) -> Chunker:
+        # "character" keeps the original 1000-character windows; the token-aware
+        # strategies size chunks with the embedding model's tokenizer
+        return build_chunker(
+            os.getenv("CHUNKING_STRATEGY", "character"),
+            model_name=self.embedding_generator.model_name,
+            max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", "256")),
+            overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+        )
+
+    @cached_property
+    def chunk_cache(self) -> ChunkEmbeddingCache:
+        return ChunkEmbeddingCache(max_size=int(os.getenv("CHUNK_EMBEDDING_CACHE_SIZE", "50000")))
+
+    @cached_property
+    def ingestion_scheduler(self) -> IngestionScheduler:
+        from routes.content import build_ingestion_scheduler
+        return build_ingestion_scheduler(
+            self.vector_store,
+            self.embedding_batcher,
+            self.semantic_search,
+            self.content_task_store,
+            self.document_store,
+            browser_pool=self.browser_pool,
+            http_client=self.http_client,
+            transcript_session=self.transcript_session,
+            chunk_cache=self.chunk_cache,
+            chunker=self.chunker,
+            route_writer=self.route_writer,
+            fetch_workers=int(os.getenv("INGESTION_FETCH_WORKERS", "4")),
+            embed_workers=int(os.getenv("INGESTION_EMBED_WORKERS", "2")),
+            store_workers=int(os.getenv("INGESTION_STORE_WORKERS", "2")),
+            max_queue_size=int(os.getenv("INGESTION_MAX_QUEUE_SIZE", "100"))
+        )
+
+    @cached_property
+    def bulk_job_store(self) -> BulkJobStore:
+        return BulkJobStore(os.getenv("BULK_JOB_STORE_PATH", "./bulk_jobs.db"))
+
+    @cached_property
+    def bulk_ingestor(self) -> BulkIngestor:
+        return BulkIngestor(
+            self.vector_store,
+            self.document_store,
+            self.bulk_job_store,
+            self.embedding_generator.agenerate,
+            model_name=self.embedding_generator.model_name,
+            chunk_cache=self.chunk_cache,
+            semantic_search=self.semantic_search,
+            route_writer=self.route_writer,
+            browser_pool=self.browser_pool,
+            http_client=self.http_client,
+            transcript_session=self.transcript_session,
+            youtube_api_key=settings.YOUTUBE_API_KEY,
+            chunker=self.chunker,
+            fetch_workers=int(os.getenv("BULK_FETCH_WORKERS", "8")),
+            embed_batch_size=int(os.getenv("BULK_EMBED_BATCH_SIZE", "256")),
+            store_batch_size=int(os.getenv("BULK_STORE_BATCH_SIZE", "1024"))
+        )
+
+    @cached_property
+    def migration_store(self) -> MigrationStore:
+        return MigrationStore(os.getenv("MIGRATION_STORE_PATH", "./migrations.db"))
+
+    def migration_embedding_generator(self, model_name: str) -> EmbeddingGenerator:
+        """Encoder for a migration target; the serving model is shared, others are created once
+
+        Uses the configured backend, so with the remote backend the embedding
+        server must also serve model_name (embeddings.server --extra-model).
+        """
+        if model_name == self.embedding_generator.model_name:
+            return self.embedding_generator
+        with self._migration_generators_lock:
+            if model_name not in self._migration_generators:
+                self._migration_generators[model_name] = self._new_embedding_generator(model_name)
+            return self._migration_generators[model_name]
+
+    async def _switch_collection(self, collection: str, target: str, model_name: str):
+        # Loading the target model blocks; the switch itself touches loop-owned caches and indexes
+        embedding_generator = await asyncio.to_thread(self.migration_embedding_generator, model_name)
+        self.semantic_search.switch_collection(collection, target, embedding_generator)
+
+    @cached_property
+    def route_writer(self) -> RouteWriter:
+        return RouteWriter(self.vector_store, self.migration_store, self.migration_embedding_generator)
+
+    @cached_property
+    def collection_migrator(self) -> CollectionMigrator:
+        return CollectionMigrator(
+            self.vector_store,
+            self.migration_store,
+            self.migration_embedding_generator,
+            on_switch=self._switch_collection,
+            follow_seconds=float(os.getenv("MIGRATION_FOLLOW_SECONDS", "300"))
+        )
+
+    async def _watch_collection_routes(self):
+        """Apply collection switches made by migrations running in other processes"""
+        interval = float(os.getenv("COLLECTION_ROUTES_REFRESH_SECONDS", "10"))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                for collection, (target, model_name) in (await asyncio.to_thread(self.migration_store.routes)).items():
+                    await self._switch_collection(collection, target, model_name)
+            except Exception as e:
+                logger.error(f"Refreshing collection routes failed: {str(e)}", exc_info=True)
+
+    async def _adopt_jobs(self):
+        """Resume bulk jobs and migrations that no live process holds the lease of
+
+        Runs at startup and then every lease period, so jobs of a worker that
+        died are picked up by one of the others once its lease expires.
+        """
+        while True:
+            try:
+                # Bulk imports pick up their pending items
+                for job_id in await asyncio.to_thread(self.bulk_job_store.running_jobs):
+                    if not self.bulk_ingestor.is_running(job_id) and await self.bulk_ingestor.claim(job_id):
+                        logger.info(f"Resuming bulk job {job_id}")
+                        self.bulk_ingestor.start(job_id)
+                # Migrations continue from their checkpoints, or keep following their source
+                for migration_id in await asyncio.to_thread(self.migration_store.active):
+                    if (
+                        not self.collection_migrator.is_running(migration_id)
+                        and await self.collection_migrator.claim(migration_id)
+                    ):
+                        logger.info(f"Resuming migration {migration_id}")
+                        self.collection_migrator.start(migration_id)
+            except Exception as e:
+                logger.error(f"Resuming bulk jobs and migrations failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.bulk_ingestor.lease_seconds)
+
+    async def _timed(self, step: str, awaitable) -> Any:
+        start = time.perf_counter()
+        result = await awaitable
+        self.startup_seconds[step] = round(time.perf_counter() - start, 3)
+        return result
+
+    async def startup(self):
+        """Build and warm services; search is usable before ingestion is up"""
+        try:
+            # Constructors block (Chroma, model load), so keep them off the event loop
+            await self._timed("stores", asyncio.to_thread(
+                lambda: (
+                    self.vector_store,
+                    self.document_store,
+                    self.tutorial_store,
+                    self.content_task_store,
+                    self.tutorial_task_store
+                )
+            ))
+            await self._timed("model_load", asyncio.to_thread(lambda: self.embedding_generator))
+            await self._timed("model_warm_up", self.embedding_generator.warm_up())
+            if self.ann_index is not None:
+                # Loads saved indexes, or quantizes the embeddings already stored in Chroma
+                await self._timed("ann_index", asyncio.to_thread(
+                    self.ann_index.load_or_build, self.vector_store, self._ann_collections
+                ))
+            # Build these now rather than inside the first request
+            self.semantic_search
+            # Collections switched by a migration read their re-embedded copy from the first query
+            for collection, (target, model_name) in (await asyncio.to_thread(self.migration_store.routes)).items():
+                await self._timed(f"route_{collection}", self._switch_collection(collection, target, model_name))
+            self._background.append(asyncio.create_task(self._watch_collection_routes()))
+            if self.ann_index is not None:
+                self._background.append(asyncio.create_task(self._refresh_ann_index()))
+            self.search_warm.set()
+            # /similar queries Chroma with stored vectors until the index is loaded
+            self._background.append(asyncio.create_task(self._maintain_related_index()))
+
+            if self.llm_configured:
+                self.tutorial_generator
+            else:
+                logger.warning("No LLM API keys configured; tutorial routes are disabled")
+
+            await self._timed("browser_pool", self.browser_pool.start())
+            await self._timed("ingestion", self.ingestion_scheduler.start())
+            # Interrupted bulk imports and migrations resume in whichever worker claims them
+            self._background.append(asyncio.create_task(self._adopt_jobs()))
+        except Exception as e:
+            self.startup_error = str(e)
+            logger.error(f"Service startup failed: {str(e)}", exc_info=True)
+            raise
+
+        self.ready = True
+        self.ready_seconds = round(time.perf_counter() - self.created_at, 3)
+        logger.info(
+            f"Ready in {self.ready_seconds}s (import {self.import_seconds}s, steps {self.startup_seconds})"
+        )
+
+    async def shutdown(self):
+        """Close only the services that were actually built"""
+        self.ready = False
+        if self._built("bulk_ingestor"):
+            await self.bulk_ingestor.close()
+        if self._built("collection_migrator"):
+            await self.collection_migrator.close()
+        if self._built("ingestion_scheduler"):
+            await self.ingestion_scheduler.stop()
+        if self._built("browser_pool"):
+            await self.browser_pool.close()
+        if self._built("http_client"):
+            await self.http_client.aclose()
+        if self._built("transcript_session"):
+            self.transcript_session.close()
+        if self._built("llm_manager"):
+            await self.llm_manager.aclose()
+        if self._built("embedding_batcher"):
+            await self.embedding_batcher.close()
+        if self._built("embedding_generator"):
+            self.embedding_generator.close()
+        for generator in self._migration_generators.values():
+            generator.close()
+        if self._built("ann_index") and self.ann_index is not None:
+            await asyncio.to_thread(self.ann_index.save)
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        if self._built("related_index"):
+            await asyncio.to_thread(self.related_index.save)
+
+    async def wait_for_search(self, timeout: float) -> bool:
+        """Wait until the search services are warm; False if they are not by the timeout"""
+        if self.search_warm.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self.search_warm.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "search_ready": self.search_warm.is_set(),
+            "llm_configured": self.llm_configured,
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "startup_seconds": self.startup_seconds,
+            "error": self.startup_error
+        }
+
+    def metrics(self) -> Iterator[Sample]:
+        """Cache, queue and pool gauges, read from each built service's stats() at scrape time"""
+        if self.import_seconds is not None:
+            yield Sample("app_import_seconds", "gauge", "Time to import main.py", {}, self.import_seconds)
+        if self.ready_seconds is not None:
+            yield Sample("app_ready_seconds", "gauge", "Time from import to readiness", {}, self.ready_seconds)
+
+        caches: Dict[str, Dict[str, Any]] = {}
+        if self._built("semantic_search"):
+            caches["query_embeddings"] = self.semantic_search.embedding_cache.stats()
+            caches["search_results"] = self.semantic_search.result_cache.stats()
+        if self._built("document_store"):
+            caches["documents"] = self.document_store.cache.stats()
+        if self._built("tutorial_store"):
+            caches["tutorials"] = self.tutorial_store.cache.stats()
+        if self._built("chunk_cache"):
+            caches["chunk_embeddings"] = self.chunk_cache.stats()
+        for cache, stats in caches.items():
+            labels = {"cache": cache}
+            yield Sample("cache_entries", "gauge", "Entries held by an in-memory cache", labels, stats["size"])
+            yield Sample("cache_hits_total", "counter", "Cache lookups that hit", labels, stats["hits"])
+            yield Sample("cache_misses_total", "counter", "Cache lookups that missed", labels, stats["misses"])
+            yield Sample("cache_evictions_total", "counter", "Entries evicted for space", labels, stats["evictions"])
+
+        if self._built("llm_cache"):
+            llm_stats = self.llm_cache.stats()
+            yield Sample("llm_cache_entries", "gauge", "Responses in the LLM response cache", {}, llm_stats["entries"])
+            yield Sample("llm_cache_bytes", "gauge", "Size of cached LLM responses", {}, llm_stats["bytes"])
+            yield Sample("llm_cache_hits_total", "counter", "LLM calls served from the cache", {}, llm_stats["hits"])
+            yield Sample("llm_cache_misses_total", "counter", "LLM calls sent to the provider", {}, llm_stats["misses"])
+
+        if self._built("llm_manager"):
+            llm_stats = self.llm_manager.stats()
+            yield Sample("llm_failovers_total", "counter", "LLM calls moved to a fallback provider", {}, llm_stats["failovers"])
+            for provider, stats in llm_stats["providers"].items():
+                labels = {"provider": provider}
+                yield Sample("llm_in_flight", "gauge", "LLM calls in progress", labels, stats["in_flight"])
+                yield Sample("llm_retries_total", "counter", "LLM calls retried after a retryable error", labels, stats["retries"])
+                yield Sample("llm_provider_healthy", "gauge", "1 unless the provider is being routed around", labels, int(stats["healthy"]))
+                if stats["error_rate"] is not None:
+                    yield Sample("llm_provider_error_rate", "gauge", "Error rate over recent calls", labels, stats["error_rate"])
+                if stats["p95_seconds"] is not None:
+                    yield Sample("llm_provider_p95_seconds", "gauge", "p95 latency over recent calls", labels, stats["p95_seconds"])
+
+        if self._built("ingestion_scheduler"):
+            scheduler_stats = self.ingestion_scheduler.stats()
+            yield Sample("ingestion_active_jobs", "gauge", "Ingestion jobs queued or running", {}, scheduler_stats["active_jobs"])
+            for stage, depth in scheduler_stats["queue_depth"].items():
+                yield Sample("ingestion_queue_depth", "gauge", "Jobs waiting for a pipeline stage", {"stage": stage}, depth)
+
+        if self._built("browser_pool"):
+            pool_stats = self.browser_pool.stats()
+            yield Sample("browser_pool_connected_browsers", "gauge", "Browsers currently connected", {}, pool_stats["connected_browsers"])
+            yield Sample("browser_pool_idle_contexts", "gauge", "Browser contexts free to lease", {}, pool_stats["idle_contexts"])
+            yield Sample("browser_pool_contexts", "gauge", "Browser contexts in the pool", {}, pool_stats["total_contexts"])
+            yield Sample("browser_pool_restarts_total", "counter", "Browsers restarted after failing a health check", {}, pool_stats["restarts"])
+
+        if self._built("embedding_batcher"):
+            embedding_stats = self.embedding_batcher.stats()
+            yield Sample("embedding_pending_requests", "gauge", "Requests waiting in the embedding batcher", {}, embedding_stats["pending_requests"])
+            yield Sample("embedding_queue_depth", "gauge", "Encode calls waiting for the executor", {}, embedding_stats["queue_depth"])
+            yield Sample("embedding_encoded_texts_total", "counter", "Texts encoded by the model", {}, embedding_stats["encoded_texts"])
+            yield Sample("embedding_encode_seconds_total", "counter", "Time spent in model encode calls", {}, embedding_stats["encode_seconds"])
@@ -1,39 +1,121 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, status
-from typing import Optional, Dict, Any, List, Literal
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request, status
+from fastapi.responses import Response, StreamingResponse
+from typing import Optional, Dict, Any, List, Literal, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 import uuid
-from generators.tutorial import TutorialGenerator, ProcessedTutorial
+import json
+import asyncio
+import logging
+from generators.tutorial import TutorialGenerator, ProcessedTutorial, TutorialMetadata, TutorialSection
 from db.vector_store import VectorStore
-from embeddings.generator import EmbeddingGenerator
-from llm.factory import LLMFactory
-from config import settings
+from search.semantic_search import SemanticSearch
+from db.task_store import TaskStore
+from db.tutorial_store import TutorialStore
 from app_types.tutorial import TutorialSectionType
+from services import LLMNotConfiguredError
 
 router = APIRouter(tags=["tutorials"])
 
+logger = logging.getLogger(__name__)
+
+
+# How long a request waits for search to warm up before answering 503
+SEARCH_WARM_TIMEOUT_SECONDS = 10
 
 # Add dependency injection functions
-def get_tutorial_generator() -> TutorialGenerator:
+def get_tutorial_generator(request: Request) -> TutorialGenerator:
     """Dependency injection for TutorialGenerator"""
-    vector_store = VectorStore()
-    embedding_generator = EmbeddingGenerator()
-    if settings.ANTHROPIC_API_KEY:
-        llm_client = LLMFactory.create_client("anthropic", settings.ANTHROPIC_API_KEY)
-    elif settings.OPENAI_API_KEY:
-        llm_client = LLMFactory.create_client("openai", settings.OPENAI_API_KEY)
-    else:
-        raise ValueError("No LLM API keys configured")
-    
-    return TutorialGenerator(llm_client, vector_store, embedding_generator)
+    services = request.app.state.services
+    if not services.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tutorial generation is starting",
+            headers={"Retry-After": "5"}
+        )
+    try:
+        return services.tutorial_generator
+    except LLMNotConfiguredError as e:
+        # Search and ingestion keep working without an LLM
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
 
-def get_vector_store() -> VectorStore:
+def get_vector_store(request: Request) -> VectorStore:
     """Dependency injection for VectorStore"""
-    return VectorStore()
+    return request.app.state.services.vector_store
+
+async def get_semantic_search(request: Request) -> SemanticSearch:
+    """Dependency injection for SemanticSearch, once it is warm"""
+    services = request.app.state.services
+    if not await services.wait_for_search(SEARCH_WARM_TIMEOUT_SECONDS):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search is warming up",
+            headers={"Retry-After": "5"}
+        )
+    return services.semantic_search
+
+def get_task_store(request: Request) -> TaskStore:
+    """Dependency injection for the tutorial TaskStore"""
+    return request.app.state.services.tutorial_task_store
+
+def get_tutorial_store(request: Request) -> TutorialStore:
+    """Dependency injection for the TutorialStore"""
+    return request.app.state.services.tutorial_store
+
+# Stored tutorials never change, since regenerating creates a new ID
+TUTORIAL_CACHE_CONTROL = "public, max-age=86400, immutable"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def backfill_tutorial(
+    tutorial_id: str,
+    vector_store: VectorStore,
+    tutorial_store: TutorialStore
+) -> Optional[Tuple[str, bytes]]:
+    """Rebuild a tutorial that only exists in the Chroma tutorial collection
+
+    Stored sections are used when the metadata carries them; otherwise the
+    stored text becomes a single overview section. The result is written to
+    the TutorialStore, so later reads get it with an ETag like any other.
+    """
+    tutorial_data = vector_store.get_by_id("tutorial", tutorial_id)
+    if not tutorial_data or not tutorial_data["documents"]:
+        return None
+
+    document = tutorial_data["documents"][0] or ""
+    metadata = tutorial_data["metadatas"][0] or {}
+    sections = []
+    try:
+        sections = [TutorialSection(**section) for section in json.loads(metadata.get("sections") or "[]")]
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable sections stored for tutorial {tutorial_id}: {str(e)}")
+    if not sections:
+        sections = [TutorialSection(id=str(uuid.uuid4()), type="summary", title="Overview", content=document)]
+
+    tutorial = ProcessedTutorial(
+        metadata=TutorialMetadata(
+            title=metadata.get("title", ""),
+            content_id=metadata.get("content_id", ""),
+            source_url=metadata.get("source_url", ""),
+            content_type=metadata.get("content_type", "article"),
+            generated_date=metadata.get("generated_date") or datetime.now(),
+            tutorial_id=tutorial_id
+        ),
+        sections=sections
+    )
+    body = tutorial.model_dump_json().encode("utf-8")
+    etag = tutorial_store.put(tutorial_id, tutorial.metadata.content_id, body)
+    return etag, body
 
 class TutorialGenerationRequest(BaseModel):
     content_id: str
     content_type: Literal["article", "youtube"]  # Add type validation
+    force_regenerate: bool = False  # Skip cached LLM responses
 
 class TutorialGenerationResponse(BaseModel):
     tutorial_id: str
@@ -49,9 +131,6 @@ class TutorialStatus(BaseModel):
 # In-memory status tracking (consider using Redis for production)
 generation_status: Dict[str, TutorialStatus] = {}
 
-# In-memory task storage (replace with proper database in production)
-tutorial_tasks = {}
-
 class TutorialGenerationStatus(BaseModel):
     task_id: str
     status: str
@@ -62,43 +141,55 @@ async def generate_tutorial_task(
     content_id: str,
     collection_name: str,
     task_id: str,
-    tutorial_generator: TutorialGenerator
+    tutorial_generator: TutorialGenerator,
+    semantic_search: SemanticSearch,
+    task_store: TaskStore,
+    force_regenerate: bool = False
 ):
     """Background task for tutorial generation"""
-    tutorial_tasks[task_id] = {"status": "processing"}
+    await task_store.aset(task_id, {"status": "processing"})
     
     try:
         tutorial = await tutorial_generator.generate_tutorial(
             content_id,
-            collection_name
+            collection_name,
+            force_regenerate=force_regenerate
         )
+        # add_tutorial wrote to the tutorial collection
+        semantic_search.invalidate_collection("tutorial")
         
-        tutorial_tasks[task_id] = {
+        await task_store.aset(task_id, {
             "status": "completed",
-            "tutorial": tutorial
-        }
+            "tutorial": tutorial.model_dump(mode="json")
+        })
         
     except Exception as e:
-        tutorial_tasks[task_id] = {
+        await task_store.aset(task_id, {
             "status": "failed",
             "error": str(e)
-        }
+        })
 
 @router.post("/generate", response_model=TutorialGenerationStatus)
 async def generate_tutorial(
     request: TutorialGenerationRequest,
     background_tasks: BackgroundTasks,
-    tutorial_generator: TutorialGenerator = Depends(get_tutorial_generator)
+    tutorial_generator: TutorialGenerator = Depends(get_tutorial_generator),
+    semantic_search: SemanticSearch = Depends(get_semantic_search),
+    task_store: TaskStore = Depends(get_task_store)
 ):
     """Start tutorial generation"""
     task_id = str(uuid.uuid4())
+    await task_store.aset(task_id, {"status": "processing"})
     
     background_tasks.add_task(
         generate_tutorial_task,
         request.content_id,
         request.content_type,
         task_id,
-        tutorial_generator
+        tutorial_generator,
+        semantic_search,
+        task_store,
+        request.force_regenerate
     )
     
     return TutorialGenerationStatus(
@@ -106,13 +197,53 @@ async def generate_tutorial(
         status="processing"
     )
 
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/generate/stream")
+async def stream_tutorial(
+    request: TutorialGenerationRequest,
+    tutorial_generator: TutorialGenerator = Depends(get_tutorial_generator),
+    semantic_search: SemanticSearch = Depends(get_semantic_search)
+):
+    """Generate a tutorial, streaming each section as a server-sent event"""
+
+    async def event_stream():
+        try:
+            async for event, payload in tutorial_generator.stream_tutorial(
+                request.content_id,
+                request.content_type,
+                force_regenerate=request.force_regenerate
+            ):
+                if event == "section":
+                    yield format_sse("section", payload.model_dump(mode="json"))
+                else:
+                    # add_tutorial wrote to the tutorial collection
+                    semantic_search.invalidate_collection("tutorial")
+                    yield format_sse("complete", {
+                        "tutorial_id": payload["tutorial_id"],
+                        "tutorial": payload["tutorial"].model_dump(mode="json")
+                    })
+        except Exception as e:
+            logger.error(f"Error streaming tutorial for {request.content_id}: {str(e)}", exc_info=True)
+            yield format_sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/status/{task_id}", response_model=TutorialGenerationStatus)
-async def get_tutorial_status(task_id: str):
+async def get_tutorial_status(
+    task_id: str,
+    task_store: TaskStore = Depends(get_task_store)
+):
     """Get tutorial generation status"""
-    if task_id not in tutorial_tasks:
+    task = await task_store.aget(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = tutorial_tasks[task_id]
     return TutorialGenerationStatus(
         task_id=task_id,
         status=task["status"],
@@ -123,26 +254,26 @@ async def get_tutorial_status(task_id: str):
 @router.get("/content/{tutorial_id}", response_model=ProcessedTutorial)
 async def get_tutorial_content(
     tutorial_id: str,
+    request: Request,
+    tutorial_store: TutorialStore = Depends(get_tutorial_store),
     vector_store: VectorStore = Depends(get_vector_store)
 ):
-    """Get a specific tutorial by ID"""
-    try:
-        tutorial_data = vector_store.get_by_id("tutorial", tutorial_id)
-        if not tutorial_data or not tutorial_data["documents"]:
-            raise HTTPException(status_code=404, detail="Tutorial not found")
-            
-        # Convert stored data back to ProcessedTutorial
-        # This is a simplified example - you'll need to adjust based on your storage format
-        metadata = tutorial_data["metadatas"][0]
-        return ProcessedTutorial(
-            title=metadata["title"],
-            summary=["Summary from stored data"],
-            key_points=["Key points from stored data"],
-            code_examples=[],  # Parse from stored data
-            practice_exercises=[],  # Parse from stored data
-            source_url=metadata["source_url"],
-            content_type=metadata["content_type"]
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+    """Get a specific tutorial by ID
+
+    The stored JSON is returned as is, with a strong ETag; a matching
+    If-None-Match gets 304 Not Modified.
+    """
+    stored = tutorial_store.get_cached(tutorial_id)
+    if stored is None:
+        stored = await asyncio.to_thread(tutorial_store.get, tutorial_id)
+    if stored is None:
+        # Generated before tutorials were stored whole; only Chroma has them
+        stored = await asyncio.to_thread(backfill_tutorial, tutorial_id, vector_store, tutorial_store)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Tutorial not found")
+
+    etag, body = stored
+    headers = {"ETag": etag, "Cache-Control": TUTORIAL_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)